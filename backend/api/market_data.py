@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
+from backend.core.events import websocket_manager
 from backend.core.security import get_current_user
 from backend.services.data_streamer import DataStreamer
 from backend.schemas.market_data import Quote, Bar, OptionChain, TickData
 
 router = APIRouter()
-data_streamer = DataStreamer()
+data_streamer = DataStreamer(
+    quotes=websocket_manager.latest_quotes,
+    received_at=websocket_manager.quote_received_at
+)
 
 @router.get("/quote/{symbol}", response_model=Quote)
 async def get_quote(
@@ -1,17 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from typing import List, Dict, Any, Optional
 from backend.core.security import get_current_user
-from backend.services.execution_engine import ExecutionEngine
-from backend.schemas.orders import OrderCreate, Order, OrderUpdate, OrderCancel
+from backend.services.execution_engine import execution_engine
+from backend.core.config import settings
+from backend.core.metrics import mark_stage
+from backend.schemas.orders import OrderCreate, Order, OrderUpdate, OrderCancel, BasketOrderCreate, BasketOrderResult
 
 router = APIRouter()
-execution_engine = ExecutionEngine()
 
 @router.post("/", response_model=Order, status_code=status.HTTP_201_CREATED)
 async def place_order(
     order_data: OrderCreate,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
+    mark_stage("validation")
     try:
         order = await execution_engine.place_order(
             user_id=current_user["user_id"],
@@ -28,23 +30,68 @@ async def place_order(
             take_profit=order_data.take_profit,
             stop_loss=order_data.stop_loss,
             trail_price=order_data.trail_price,
-            trail_percent=order_data.trail_percent
+            trail_percent=order_data.trail_percent,
+            algo_params=order_data.algo_params
         )
         return order
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
+@router.post("/batch", response_model=BasketOrderResult)
+async def place_basket(
+    basket: BasketOrderCreate,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    if len(basket.orders) > settings.BASKET_MAX_LEGS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Basket exceeds {settings.BASKET_MAX_LEGS} legs"
+        )
+    
+    legs = [
+        {
+            "symbol": order.symbol,
+            "qty": order.qty,
+            "side": order.side,
+            "order_type": order.type,
+            "limit_price": order.limit_price,
+            "stop_price": order.stop_price,
+            "time_in_force": order.time_in_force,
+            "extended_hours": order.extended_hours,
+            "client_order_id": order.client_order_id,
+            "order_class": order.order_class,
+            "take_profit": order.take_profit,
+            "stop_loss": order.stop_loss,
+            "trail_price": order.trail_price,
+            "trail_percent": order.trail_percent,
+            "algo_params": order.algo_params
+        }
+        for order in basket.orders
+    ]
+    results = await execution_engine.place_orders(current_user["user_id"], legs)
+    submitted = sum(1 for result in results if result["status"] == "submitted")
+    return {
+        "submitted": submitted,
+        "rejected": len(results) - submitted,
+        "results": results
+    }
+
 @router.get("/", response_model=List[Order])
 async def get_orders(
+    response: Response,
     status_filter: Optional[str] = None,
     limit: int = 100,
+    before: Optional[str] = None,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     orders = await execution_engine.get_orders(
         user_id=current_user["user_id"],
         status=status_filter,
-        limit=limit
+        limit=limit,
+        before=before
     )
+    if len(orders) == limit:
+        response.headers["X-Next-Cursor"] = orders[-1]["client_order_id"]
     return orders
 
 @router.get("/{order_id}", response_model=Order)
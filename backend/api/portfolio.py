@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import Dict, Any
+from backend.core.config import settings
 from backend.core.security import get_current_user
 from backend.services.risk_engine import RiskEngine
-from backend.schemas.portfolio import Portfolio, AccountInfo, PortfolioAnalytics
+from backend.schemas.portfolio import Portfolio, AccountInfo, PortfolioAnalytics, StressTestRequest
 
 router = APIRouter()
 risk_engine = RiskEngine()
@@ -41,3 +42,21 @@ async def get_portfolio_greeks(
 ):
     greeks = await risk_engine.calculate_portfolio_greeks(current_user["user_id"])
     return greeks
+
+@router.post("/stress")
+async def run_stress_test(
+    request: StressTestRequest,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    if len(request.scenarios) > settings.STRESS_MAX_SCENARIOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Stress test exceeds {settings.STRESS_MAX_SCENARIOS} scenarios"
+        )
+    user_id = current_user["user_id"]
+    result = await risk_engine.run_stress_test(
+        [scenario.model_dump() for scenario in request.scenarios],
+        [user_id],
+        request.include_predefined
+    )
+    return {"scenarios": result["scenarios"], **result["accounts"][user_id]}
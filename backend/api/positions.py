@@ -1,11 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List, Dict, Any
 from backend.core.security import get_current_user
-from backend.services.execution_engine import ExecutionEngine
+from backend.services.execution_engine import execution_engine
 from backend.schemas.positions import Position
 
 router = APIRouter()
-execution_engine = ExecutionEngine()
 
 @router.get("/", response_model=List[Position])
 async def get_positions(
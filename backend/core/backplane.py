@@ -0,0 +1,133 @@
+from typing import Any, Awaitable, Callable, List, Optional
+import asyncio
+import time
+import uuid
+import redis.asyncio as aioredis
+from backend.core.config import settings
+
+MessageHandler = Callable[[str, bytes], Awaitable[None]]
+
+RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class LocalBackplane:
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        self.handler: Optional[MessageHandler] = None
+
+    async def start(self, channels: List[str], handler: MessageHandler):
+        self.handler = handler
+
+    async def stop(self):
+        self.handler = None
+
+    async def publish(self, channel: str, payload: bytes):
+        if self.handler:
+            await self.handler(channel, payload)
+
+    async def acquire_leadership(self) -> bool:
+        return True
+
+    async def release_leadership(self):
+        pass
+
+    def holds_lease(self) -> bool:
+        return True
+
+class RedisBackplane:
+    def __init__(self, client: Optional[Any] = None, url: Optional[str] = None, prefix: str = "apex:ws:"):
+        self.node_id = uuid.uuid4().hex
+        self.redis = client or aioredis.from_url(
+            url or settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS
+        )
+        self.prefix = prefix
+        self.leader_key = f"{prefix}leader"
+        self.leader_ttl_ms = int(settings.WEBSOCKET_LEADER_TTL * 1000)
+        self.lease_until = 0.0
+        self.handler: Optional[MessageHandler] = None
+        self.pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._renew = self.redis.register_script(RENEW_LEASE_SCRIPT)
+        self._release = self.redis.register_script(RELEASE_LEASE_SCRIPT)
+
+    async def start(self, channels: List[str], handler: MessageHandler):
+        self.handler = handler
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(*[self.prefix + channel for channel in channels])
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+        if self.pubsub:
+            await self.pubsub.unsubscribe()
+            await self.pubsub.aclose()
+            self.pubsub = None
+        await self.release_leadership()
+
+    async def publish(self, channel: str, payload: bytes):
+        await self.redis.publish(self.prefix + channel, payload)
+
+    async def acquire_leadership(self) -> bool:
+        started = time.monotonic()
+        try:
+            acquired = (
+                await self.redis.set(self.leader_key, self.node_id, nx=True, px=self.leader_ttl_ms)
+                or await self._renew(keys=[self.leader_key], args=[self.node_id, self.leader_ttl_ms])
+            )
+        except Exception as e:
+            print(f"Backplane leadership check failed: {e}")
+            acquired = False
+        if acquired:
+            self.lease_until = started + self.leader_ttl_ms / 1000
+            return True
+        self.lease_until = 0.0
+        return False
+
+    async def release_leadership(self):
+        self.lease_until = 0.0
+        try:
+            await self._release(keys=[self.leader_key], args=[self.node_id])
+        except Exception:
+            pass
+
+    def holds_lease(self) -> bool:
+        return time.monotonic() < self.lease_until
+
+    async def _listen(self):
+        prefix_len = len(self.prefix)
+        while True:
+            try:
+                async for message in self.pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    try:
+                        await self.handler(channel[prefix_len:], message["data"])
+                    except Exception as e:
+                        print(f"Backplane handler error on {channel}: {e!r}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Backplane connection error: {e}")
+                await asyncio.sleep(1)
+
+def create_backplane():
+    if settings.WEBSOCKET_BACKPLANE == "redis":
+        return RedisBackplane()
+    return LocalBackplane()
@@ -1,7 +1,9 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Any, Dict, List
+from functools import lru_cache
 import os
 from pathlib import Path
+import yaml
 
 class Settings(BaseSettings):
     APP_NAME: str = "Apex Trading Platform"
@@ -10,6 +12,7 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "1"))
     
     SECRET_KEY: str = os.getenv("SECRET_KEY", "change-this-in-production")
     ALGORITHM: str = "HS256"
@@ -26,6 +29,9 @@ class Settings(BaseSettings):
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://:apex_redis_password@localhost:6379/0")
     REDIS_MAX_CONNECTIONS: int = 50
     
+    WEBSOCKET_BACKPLANE: str = os.getenv("WEBSOCKET_BACKPLANE", "local")
+    WEBSOCKET_LEADER_TTL: float = 5.0
+    
     CORS_ORIGINS: List[str] = [
         "http://localhost:3000",
         "http://localhost:5173",
@@ -33,26 +39,85 @@ class Settings(BaseSettings):
     ]
     
     POLYGON_API_KEY: str = os.getenv("POLYGON_API_KEY", "")
+    POLYGON_WS_URL: str = os.getenv("POLYGON_WS_URL", "wss://socket.polygon.io/stocks")
     ALPACA_API_KEY: str = os.getenv("ALPACA_API_KEY", "")
     ALPACA_SECRET_KEY: str = os.getenv("ALPACA_SECRET_KEY", "")
     ALPACA_BASE_URL: str = "https://paper-api.alpaca.markets"
+    ALPACA_STREAM_URL: str = os.getenv("ALPACA_STREAM_URL", "")
+    
+    BROKER_EXECUTOR_WORKERS: int = 64
+    BROKER_CALL_TIMEOUT: float = 10.0
+    BROKER_RATE_LIMIT: float = 3.0
+    BROKER_RATE_BURST: int = 3
+    BROKER_RATE_BACKEND: str = os.getenv("BROKER_RATE_BACKEND", os.getenv("WEBSOCKET_BACKPLANE", "local"))
+    BROKER_RATE_SHARES: int = int(os.getenv("BROKER_RATE_SHARES", os.getenv("WEB_CONCURRENCY", "1")))
+    BROKER_RECONCILE_INTERVAL: float = 60.0
+    IB_RATE_LIMIT: float = 45.0
+    IDEMPOTENCY_TTL: float = 86400.0
+    BASKET_MAX_LEGS: int = 1000
+    BASKET_MAX_CONCURRENCY: int = 32
+    ALGO_TICK_INTERVAL: float = 0.1
+    ALGO_DEFAULT_DURATION: float = 1800.0
+    ALGO_DEFAULT_INTERVAL: float = 60.0
+    ALGO_DEFAULT_PARTICIPATION: float = 0.1
+    ALGO_VOLUME_BUCKET_MINUTES: int = 5
+    COVARIANCE_BAR_SECONDS: float = 60.0
+    COVARIANCE_DECAY: float = 0.998
+    COVARIANCE_BENCHMARK: str = "SPY"
+    COVARIANCE_SAVE_INTERVAL: int = 15
+    COVARIANCE_PATH: Path = Path(os.getenv("COVARIANCE_PATH", "data/covariance.npz"))
+    RISK_FREE_RATE: float = float(os.getenv("RISK_FREE_RATE", "0.04"))
+    STRESS_MAX_SCENARIOS: int = 5000
     
     IB_HOST: str = os.getenv("IB_HOST", "127.0.0.1")
     IB_PORT: int = int(os.getenv("IB_PORT", "7497"))
     IB_CLIENT_ID: int = int(os.getenv("IB_CLIENT_ID", "1"))
+    IB_ENABLED: bool = os.getenv("IB_ENABLED", "false").lower() == "true"
+    IB_CLIENT_ID_POOL_SIZE: int = 8
+    IB_CONNECT_TIMEOUT: float = 10.0
+    IB_HEARTBEAT_INTERVAL: float = 10.0
+    IB_HEARTBEAT_TIMEOUT: float = 5.0
+    IB_RECONNECT_MIN_DELAY: float = 1.0
+    IB_RECONNECT_MAX_DELAY: float = 60.0
+    IB_MARKET_DATA: bool = os.getenv("IB_MARKET_DATA", "true").lower() == "true"
+    IB_MARKET_DATA_POLL_INTERVAL: float = 0.1
     
     BINANCE_API_KEY: str = os.getenv("BINANCE_API_KEY", "")
     BINANCE_SECRET_KEY: str = os.getenv("BINANCE_SECRET_KEY", "")
     
     ENABLE_LIVE_TRADING: bool = os.getenv("ENABLE_LIVE_TRADING", "false").lower() == "true"
     ENABLE_PAPER_TRADING: bool = True
+    PAPER_STARTING_CASH: float = 100000.0
     
     MAX_WEBSOCKET_CONNECTIONS: int = 10000
     WEBSOCKET_MESSAGE_QUEUE_SIZE: int = 1000
+    WEBSOCKET_FLUSH_INTERVAL_MS: int = 100
+    WEBSOCKET_MAX_FRAME_MESSAGES: int = 500
+    WEBSOCKET_KEYFRAME_INTERVAL: float = 5.0
+    WEBSOCKET_SEND_TIMEOUT: float = 5.0
+    WEBSOCKET_SLOW_CONSUMER_TIMEOUT: float = 10.0
+    
+    JOURNAL_ENABLED: bool = os.getenv("JOURNAL_ENABLED", "true").lower() == "true"
+    JOURNAL_PATH: Path = Path(os.getenv("JOURNAL_PATH", "data/journal"))
+    JOURNAL_FLUSH_INTERVAL_MS: int = 5
+    JOURNAL_SNAPSHOT_INTERVAL: int = 500000
+    JOURNAL_FSYNC: bool = True
+    JOURNAL_MAX_WRITERS: int = 64
+    
+    MARKET_DATA_QUEUE_SIZE: int = 10000
+    MARKET_DATA_BATCH_SIZE: int = 512
+    MARKET_DATA_RECONNECT_MIN_DELAY: float = 1.0
+    MARKET_DATA_RECONNECT_MAX_DELAY: float = 30.0
+    MARKET_DATA_QUOTE_MAX_AGE: float = 10.0
     
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FILE: str = "logs/apex.log"
     
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    LATENCY_DEBUG_HEADER: bool = os.getenv("LATENCY_DEBUG_HEADER", "false").lower() == "true"
+    
+    CONFIG_FILE: Path = Path(os.getenv("APEX_CONFIG_FILE", "config.yaml"))
+    
     AI_MODELS_PATH: Path = Path("backend/models/saved_models")
     DATA_PATH: Path = Path("data")
     
@@ -61,3 +126,17 @@ class Settings(BaseSettings):
         env_file = ".env"
 
 settings = Settings()
+
+@lru_cache()
+def load_config_file() -> Dict[str, Any]:
+    try:
+        with open(settings.CONFIG_FILE) as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
+    except yaml.YAMLError as e:
+        print(f"Invalid config file {settings.CONFIG_FILE}: {e}")
+        return {}
+
+def get_config_section(name: str) -> Dict[str, Any]:
+    return load_config_file().get(name) or {}
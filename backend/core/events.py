@@ -1,36 +1,293 @@
-from typing import Dict, Set, Any
-from fastapi import WebSocket
+from typing import Awaitable, Callable, Deque, Dict, List, Set, Any, Optional
+from fastapi import WebSocket, WebSocketDisconnect
 import asyncio
-import json
-from collections import defaultdict
+import time
+from collections import defaultdict, deque
+from itertools import islice
+import msgpack
+import orjson
+from backend.core.backplane import create_backplane
+from backend.core.config import settings
 from backend.services.data_streamer import DataStreamer
 
+BACKPLANE_CHANNELS = ["quotes", "control", "user_events", "orders", "signals"]
+
+QUOTE_FIELDS = [
+    "bid", "ask", "bid_size", "ask_size", "last", "last_size",
+    "volume", "vwap", "timestamp", "open", "high", "low", "close"
+]
+TIMESTAMP_FIELD = QUOTE_FIELDS.index("timestamp")
+
+QuoteListener = Callable[[Dict[str, Dict]], Awaitable[None]]
+
+MSG_SYMBOL = 0
+MSG_KEYFRAME = 1
+MSG_DELTA = 2
+
+def encode_message(message: Dict[str, Any]) -> str:
+    return orjson.dumps(message).decode()
+
+class ClientConnection:
+    binary = False
+
+    def __init__(self, manager: "WebSocketManager", websocket: WebSocket, channel: str, user_id: Optional[str] = None):
+        self.manager = manager
+        self.websocket = websocket
+        self.channel = channel
+        self.user_id = user_id
+        self.max_queue_size = settings.WEBSOCKET_MESSAGE_QUEUE_SIZE
+        self.max_frame_messages = settings.WEBSOCKET_MAX_FRAME_MESSAGES
+        self.messages: Deque[str] = deque()
+        self.pending_quotes: Dict[str, str] = {}
+        self.behind_since: Optional[float] = None
+        self.stats: Dict[str, float] = {
+            "sent": 0,
+            "frames": 0,
+            "bytes": 0,
+            "dropped": 0,
+            "conflated": 0,
+            "max_lag_ms": 0.0,
+        }
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, payload: Any) -> bool:
+        if self._closed:
+            return False
+        if len(self.messages) >= self.max_queue_size:
+            self.messages.popleft()
+            self.stats["dropped"] += 1
+        self.messages.append(payload)
+        return self._mark_pending()
+
+    def enqueue_quote(self, symbol: str, payload: Any) -> bool:
+        if self._closed:
+            return False
+        if symbol in self.pending_quotes:
+            self.stats["conflated"] += 1
+        self.pending_quotes[symbol] = payload
+        return self._mark_pending()
+
+    def _mark_pending(self) -> bool:
+        now = time.monotonic()
+        if self.behind_since is None:
+            self.behind_since = now
+        elif now - self.behind_since > settings.WEBSOCKET_SLOW_CONSUMER_TIMEOUT:
+            return False
+        self._ready.set()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        lag_ms = (time.monotonic() - self.behind_since) * 1000 if self.behind_since else 0.0
+        return {
+            **self.stats,
+            "channel": self.channel,
+            "queue_depth": len(self.messages) + len(self.pending_quotes),
+            "lag_ms": lag_ms,
+        }
+
+    def close(self):
+        self._closed = True
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+    async def _write_loop(self):
+        messages = self.messages
+        pending_quotes = self.pending_quotes
+        max_frame_messages = self.max_frame_messages
+        stats = self.stats
+        
+        while not self._closed:
+            await self._ready.wait()
+            self._ready.clear()
+            
+            try:
+                while messages or pending_quotes:
+                    batch = []
+                    while messages and len(batch) < max_frame_messages:
+                        batch.append(messages.popleft())
+                    quotes = []
+                    room = max_frame_messages - len(batch)
+                    if pending_quotes and room > 0:
+                        if len(pending_quotes) <= room:
+                            quotes.extend(pending_quotes.values())
+                            pending_quotes.clear()
+                        else:
+                            for symbol in list(islice(pending_quotes, room)):
+                                quotes.append(pending_quotes.pop(symbol))
+                    
+                    if not messages and not pending_quotes and self.behind_since is not None:
+                        lag_ms = (time.monotonic() - self.behind_since) * 1000
+                        if lag_ms > stats["max_lag_ms"]:
+                            stats["max_lag_ms"] = lag_ms
+                        self.behind_since = None
+                    
+                    frame = self._encode_frame(batch, quotes)
+                    if frame is not None:
+                        await asyncio.wait_for(self._send_frame(frame), timeout=settings.WEBSOCKET_SEND_TIMEOUT)
+                        stats["frames"] += 1
+                        stats["bytes"] += len(frame)
+                    stats["sent"] += len(batch) + len(quotes)
+            except asyncio.CancelledError:
+                raise
+            except (OSError, WebSocketDisconnect):
+                await self.manager.disconnect(self.websocket, self.channel)
+                return
+            except Exception as e:
+                if not self._closed:
+                    print(f"WebSocket send failed on {self.channel}: {e!r}")
+                await self.manager.disconnect(self.websocket, self.channel)
+                return
+
+    def _encode_frame(self, messages: List[str], quotes: List[str]) -> Optional[str]:
+        batch = messages + quotes if quotes else messages
+        if len(batch) == 1:
+            return batch[0]
+        return "[" + ",".join(batch) + "]"
+
+    async def _send_frame(self, frame: Any):
+        await self.websocket.send_text(frame)
+
+class MsgpackConnection(ClientConnection):
+    binary = True
+
+    def __init__(self, manager: "WebSocketManager", websocket: WebSocket, channel: str, user_id: Optional[str] = None):
+        super().__init__(manager, websocket, channel, user_id)
+        self.packer = msgpack.Packer()
+        self.known_symbols: Set[int] = set()
+        self.baselines: Dict[str, Dict[str, Any]] = {}
+        self.keyframe_interval = settings.WEBSOCKET_KEYFRAME_INTERVAL
+        self.next_keyframe = time.monotonic() + self.keyframe_interval
+
+    def _encode_frame(self, messages: List[bytes], quotes: List[Dict[str, Any]]) -> Optional[bytes]:
+        items: List[Any] = []
+        now = time.monotonic()
+        if now >= self.next_keyframe:
+            self.baselines.clear()
+            self.next_keyframe = now + self.keyframe_interval
+        
+        symbol_ids = self.manager.symbol_ids
+        baselines = self.baselines
+        for quote in quotes:
+            symbol = quote["symbol"]
+            symbol_id = symbol_ids.get(symbol)
+            if symbol_id is None:
+                symbol_id = symbol_ids[symbol] = len(symbol_ids)
+            if symbol_id not in self.known_symbols:
+                self.known_symbols.add(symbol_id)
+                items.append([MSG_SYMBOL, symbol_id, symbol])
+            
+            baseline = baselines.get(symbol)
+            fields = {}
+            if baseline is None:
+                for index, name in enumerate(QUOTE_FIELDS):
+                    value = quote.get(name)
+                    if value is not None:
+                        fields[index] = value
+                items.append([MSG_KEYFRAME, symbol_id, fields])
+            else:
+                for index, name in enumerate(QUOTE_FIELDS):
+                    value = quote.get(name)
+                    if value is not None and value != baseline.get(name):
+                        fields[index] = value
+                if not fields:
+                    continue
+                if TIMESTAMP_FIELD in fields and baseline.get("timestamp"):
+                    fields[TIMESTAMP_FIELD] = fields[TIMESTAMP_FIELD] - baseline["timestamp"]
+                items.append([MSG_DELTA, symbol_id, fields])
+            baselines[symbol] = quote
+        
+        if not messages and not items:
+            return None
+        # Messages arrive packed once by the manager and are shared by every connection.
+        packer = self.packer
+        body = b"".join([packer.pack(item) for item in items])
+        return packer.pack_array_header(len(messages) + len(items)) + b"".join(messages) + body
+
+    async def _send_frame(self, frame: Any):
+        await self.websocket.send_bytes(frame)
+
 class WebSocketManager:
     def __init__(self):
         self.active_connections: Dict[str, Set[WebSocket]] = defaultdict(set)
+        self.connections: Dict[WebSocket, ClientConnection] = {}
+        self.user_connections: Dict[str, Set[WebSocket]] = {}
         self.subscriptions: Dict[WebSocket, Set[str]] = defaultdict(set)
+        self.symbol_subscribers: Dict[str, Set[WebSocket]] = {}
+        self.latest_quotes: Dict[str, Dict] = {}
+        self.quote_received_at: Dict[str, float] = {}
+        self.symbol_ids: Dict[str, int] = {}
+        self.streamer_factory = DataStreamer
         self.data_streamer: Optional[DataStreamer] = None
+        self.backplane = None
+        self.is_leader = False
+        self.symbol_interest: Dict[str, Set[str]] = {}
+        self.watched_symbols: Dict[str, int] = {}
+        self.quote_listeners: List[QuoteListener] = []
+        self._tasks: List[asyncio.Task] = []
         self._running = False
 
     async def start(self):
-        self.data_streamer = DataStreamer()
-        await self.data_streamer.start()
+        if self.backplane is None:
+            self.backplane = create_backplane()
+        await self.backplane.start(BACKPLANE_CHANNELS, self._on_backplane_message)
         self._running = True
-        asyncio.create_task(self._broadcast_loop())
+        self._tasks.append(asyncio.create_task(self._leadership_loop()))
+        self._tasks.append(asyncio.create_task(self._broadcast_loop()))
 
     async def stop(self):
         self._running = False
-        if self.data_streamer:
-            await self.data_streamer.stop()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        await self._resign_leadership()
+        if self.backplane:
+            await self.backplane.stop()
 
-    async def connect(self, websocket: WebSocket, channel: str):
+    async def connect(
+        self,
+        websocket: WebSocket,
+        channel: str,
+        encoding: str = "json",
+        user_id: Optional[str] = None
+    ) -> bool:
+        if len(self.connections) >= settings.MAX_WEBSOCKET_CONNECTIONS:
+            await websocket.close(code=1013)
+            return False
         await websocket.accept()
         self.active_connections[channel].add(websocket)
+        if user_id is not None:
+            self.user_connections.setdefault(user_id, set()).add(websocket)
+        if encoding == "msgpack":
+            self.connections[websocket] = MsgpackConnection(self, websocket, channel, user_id)
+            await self.send_to_websocket(websocket, {
+                "status": "connected",
+                "encoding": "msgpack",
+                "fields": QUOTE_FIELDS
+            })
+        else:
+            self.connections[websocket] = ClientConnection(self, websocket, channel, user_id)
+        return True
 
     async def disconnect(self, websocket: WebSocket, channel: str):
         self.active_connections[channel].discard(websocket)
-        if websocket in self.subscriptions:
-            del self.subscriptions[websocket]
+        symbols = self.subscriptions.pop(websocket, None)
+        if symbols:
+            await self._remove_subscribers(websocket, symbols)
+        connection = self.connections.pop(websocket, None)
+        if connection:
+            if connection.user_id is not None:
+                user_sockets = self.user_connections.get(connection.user_id)
+                if user_sockets is not None:
+                    user_sockets.discard(websocket)
+                    if not user_sockets:
+                        del self.user_connections[connection.user_id]
+            connection.close()
+            try:
+                await websocket.close()
+            except Exception:
+                pass
 
     async def handle_message(self, websocket: WebSocket, data: Dict[str, Any], channel: str):
         action = data.get("action")
@@ -38,47 +295,265 @@ class WebSocketManager:
         if action == "subscribe" and channel == "market_data":
             symbols = data.get("symbols", [])
             self.subscriptions[websocket].update(symbols)
-            if self.data_streamer:
-                await self.data_streamer.subscribe(symbols)
-            await websocket.send_json({"status": "subscribed", "symbols": symbols})
+            added = []
+            for symbol in symbols:
+                subscribers = self.symbol_subscribers.get(symbol)
+                if subscribers is None:
+                    subscribers = self.symbol_subscribers[symbol] = set()
+                    if symbol not in self.watched_symbols:
+                        added.append(symbol)
+                subscribers.add(websocket)
+            await self.send_to_websocket(websocket, {"status": "subscribed", "symbols": symbols})
+            for symbol in symbols:
+                quote = self.latest_quotes.get(symbol)
+                if quote is not None:
+                    await self.send_quote(websocket, symbol, quote)
+            if added:
+                await self._publish_control("subscribe", added)
         
         elif action == "unsubscribe" and channel == "market_data":
             symbols = data.get("symbols", [])
             self.subscriptions[websocket].difference_update(symbols)
-            await websocket.send_json({"status": "unsubscribed", "symbols": symbols})
+            await self._remove_subscribers(websocket, symbols)
+            await self.send_to_websocket(websocket, {"status": "unsubscribed", "symbols": symbols})
+
+    async def _remove_subscribers(self, websocket: WebSocket, symbols: List[str]):
+        orphaned = []
+        for symbol in symbols:
+            subscribers = self.symbol_subscribers.get(symbol)
+            if subscribers is None:
+                continue
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.symbol_subscribers[symbol]
+                if symbol not in self.watched_symbols:
+                    orphaned.append(symbol)
+        if orphaned:
+            self._evict_quotes(orphaned)
+            await self._publish_control("unsubscribe", orphaned)
+
+    def add_quote_listener(self, listener: QuoteListener):
+        self.quote_listeners.append(listener)
+
+    def remove_quote_listener(self, listener: QuoteListener):
+        if listener in self.quote_listeners:
+            self.quote_listeners.remove(listener)
+
+    async def watch_symbols(self, symbols: List[str]):
+        added = []
+        for symbol in symbols:
+            count = self.watched_symbols.get(symbol, 0)
+            self.watched_symbols[symbol] = count + 1
+            if count == 0 and symbol not in self.symbol_subscribers:
+                added.append(symbol)
+        if added and self.backplane:
+            await self._publish_control("subscribe", added)
+
+    async def unwatch_symbols(self, symbols: List[str]):
+        orphaned = []
+        for symbol in symbols:
+            count = self.watched_symbols.get(symbol)
+            if count is None:
+                continue
+            if count > 1:
+                self.watched_symbols[symbol] = count - 1
+                continue
+            del self.watched_symbols[symbol]
+            if symbol not in self.symbol_subscribers:
+                orphaned.append(symbol)
+        self._evict_quotes(orphaned)
+        if orphaned and self.backplane:
+            await self._publish_control("unsubscribe", orphaned)
+
+    def _evict_quotes(self, symbols: List[str]):
+        for symbol in symbols:
+            self.latest_quotes.pop(symbol, None)
+            self.quote_received_at.pop(symbol, None)
 
     async def broadcast_to_channel(self, channel: str, message: Dict[str, Any]):
-        if channel not in self.active_connections:
+        await self.backplane.publish(channel, orjson.dumps(message))
+
+    async def publish_to_user(self, channel: str, user_id: str, message: Dict[str, Any]):
+        if self.backplane is None:
             return
-        
-        disconnected = set()
-        for websocket in self.active_connections[channel]:
+        await self.backplane.publish("user_events", orjson.dumps({
+            "channel": channel,
+            "user_id": user_id,
+            "message": message
+        }))
+
+    async def send_to_websocket(self, websocket: WebSocket, message: Dict[str, Any]):
+        await self.send_payload(websocket, encode_message(message))
+
+    async def send_payload(self, websocket: WebSocket, payload: str, packed: Optional[bytes] = None) -> Optional[bytes]:
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return packed
+        if connection.binary:
+            if packed is None:
+                packed = msgpack.packb(orjson.loads(payload))
+            queued = connection.enqueue(packed)
+        else:
+            queued = connection.enqueue(payload)
+        if not queued:
+            await self._drop_slow_consumer(connection)
+        return packed
+
+    async def send_quote(self, websocket: WebSocket, symbol: str, quote: Dict[str, Any], payload: Optional[str] = None) -> Optional[str]:
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return payload
+        if connection.binary:
+            queued = connection.enqueue_quote(symbol, quote)
+        else:
+            if payload is None:
+                payload = encode_message({
+                    "type": "quote",
+                    "symbol": symbol,
+                    "data": quote
+                })
+            queued = connection.enqueue_quote(symbol, payload)
+        if not queued:
+            await self._drop_slow_consumer(connection)
+        return payload
+
+    async def _drop_slow_consumer(self, connection: ClientConnection):
+        print(f"Disconnecting slow WebSocket consumer on {connection.channel}: {connection.get_stats()}")
+        await self.disconnect(connection.websocket, connection.channel)
+
+    def get_stats(self) -> Dict[str, Any]:
+        connections = [connection.get_stats() for connection in self.connections.values()]
+        return {
+            "node_id": self.backplane.node_id if self.backplane else None,
+            "is_leader": self.is_leader,
+            "connections": len(connections),
+            "symbols": len(self.symbol_subscribers),
+            "dropped": sum(stats["dropped"] for stats in connections),
+            "conflated": sum(stats["conflated"] for stats in connections),
+            "max_lag_ms": max((stats["lag_ms"] for stats in connections), default=0.0),
+            "data_streamer": self.data_streamer.get_stats() if self.data_streamer else None,
+            "per_connection": connections,
+        }
+
+    async def _publish_control(self, action: str, symbols: Optional[List[str]] = None):
+        await self.backplane.publish("control", orjson.dumps({
+            "action": action,
+            "node": self.backplane.node_id,
+            "symbols": symbols or []
+        }))
+
+    async def _on_backplane_message(self, channel: str, data: bytes):
+        if channel == "quotes":
+            await self._fan_out_quotes(orjson.loads(data))
+        elif channel == "control":
+            await self._on_control(orjson.loads(data))
+        elif channel == "user_events":
+            event = orjson.loads(data)
+            user_sockets = self.user_connections.get(event["user_id"])
+            if not user_sockets:
+                return
+            payload = encode_message(event["message"])
+            packed = None
+            for websocket in list(user_sockets):
+                connection = self.connections.get(websocket)
+                if connection and connection.channel == event["channel"]:
+                    packed = await self.send_payload(websocket, payload, packed)
+        else:
+            subscribers = self.active_connections.get(channel)
+            if not subscribers:
+                return
+            payload = data.decode()
+            packed = None
+            for websocket in list(subscribers):
+                packed = await self.send_payload(websocket, payload, packed)
+
+    async def _fan_out_quotes(self, updates: Dict[str, Dict]):
+        self.latest_quotes.update(updates)
+        now = time.time()
+        received_at = self.quote_received_at
+        for symbol in updates:
+            received_at[symbol] = now
+        for listener in self.quote_listeners:
             try:
-                await websocket.send_json(message)
-            except Exception:
-                disconnected.add(websocket)
+                await listener(updates)
+            except Exception as e:
+                print(f"Quote listener error: {e!r}")
+        for symbol, quote in updates.items():
+            subscribers = self.symbol_subscribers.get(symbol)
+            if not subscribers:
+                continue
+            payload = None
+            for websocket in list(subscribers):
+                payload = await self.send_quote(websocket, symbol, quote, payload)
+
+    async def _on_control(self, message: Dict[str, Any]):
+        action = message.get("action")
+        
+        if action == "resync":
+            symbols = set(self.symbol_subscribers).union(self.watched_symbols)
+            if symbols:
+                await self._publish_control("subscribe", list(symbols))
+            return
+        
+        if not self.is_leader or not self.data_streamer:
+            return
+        
+        node = message.get("node")
+        symbols = message.get("symbols", [])
+        if action == "subscribe":
+            added = []
+            for symbol in symbols:
+                nodes = self.symbol_interest.get(symbol)
+                if nodes is None:
+                    nodes = self.symbol_interest[symbol] = set()
+                    added.append(symbol)
+                nodes.add(node)
+            if added:
+                await self.data_streamer.subscribe(added)
         
-        for websocket in disconnected:
-            await self.disconnect(websocket, channel)
+        elif action == "unsubscribe":
+            orphaned = []
+            for symbol in symbols:
+                nodes = self.symbol_interest.get(symbol)
+                if nodes is None:
+                    continue
+                nodes.discard(node)
+                if not nodes:
+                    del self.symbol_interest[symbol]
+                    orphaned.append(symbol)
+            if orphaned:
+                await self.data_streamer.unsubscribe(orphaned)
 
-    async def send_to_websocket(self, websocket: WebSocket, message: Dict[str, Any]):
-        try:
-            await websocket.send_json(message)
-        except Exception:
-            pass
+    async def _leadership_loop(self):
+        interval = settings.WEBSOCKET_LEADER_TTL / 3
+        while self._running:
+            is_leader = await self.backplane.acquire_leadership()
+            if is_leader and not self.is_leader:
+                await self._become_leader()
+            elif not is_leader and self.is_leader:
+                await self._resign_leadership()
+            await asyncio.sleep(interval)
+
+    async def _become_leader(self):
+        self.symbol_interest = {}
+        self.data_streamer = self.streamer_factory()
+        await self.data_streamer.start()
+        self.is_leader = True
+        await self._publish_control("resync")
+
+    async def _resign_leadership(self):
+        self.is_leader = False
+        if self.data_streamer:
+            await self.data_streamer.stop()
+            self.data_streamer = None
 
     async def _broadcast_loop(self):
+        interval = settings.WEBSOCKET_FLUSH_INTERVAL_MS / 1000
         while self._running:
-            if self.data_streamer:
-                quotes = await self.data_streamer.get_latest_quotes()
-                for symbol, quote in quotes.items():
-                    for websocket, symbols in self.subscriptions.items():
-                        if symbol in symbols:
-                            await self.send_to_websocket(websocket, {
-                                "type": "quote",
-                                "symbol": symbol,
-                                "data": quote
-                            })
-            await asyncio.sleep(0.1)
+            if self.is_leader and self.data_streamer and self.backplane.holds_lease():
+                updates = await self.data_streamer.get_updated_quotes()
+                if updates:
+                    await self.backplane.publish("quotes", orjson.dumps(updates))
+            await asyncio.sleep(interval)
 
 websocket_manager = WebSocketManager()
@@ -0,0 +1,109 @@
+from typing import Any, Dict, List, Optional, Tuple
+from contextvars import ContextVar
+import time
+from prometheus_client import Histogram
+from backend.core.config import settings
+
+LATENCY_BUCKETS = tuple(
+    round(mantissa * 10 ** exponent, 9)
+    for exponent in range(-5, 1)
+    for mantissa in (1, 1.5, 2, 3, 5, 7)
+) + (10.0,)
+
+ORDER_STAGE_SECONDS = Histogram(
+    "apex_order_stage_seconds",
+    "Time spent in each stage of order placement",
+    ["stage", "broker", "order_type"],
+    buckets=LATENCY_BUCKETS
+)
+
+ORDER_LATENCY_SECONDS = Histogram(
+    "apex_order_latency_seconds",
+    "Time from order request arrival to response",
+    ["broker", "order_type"],
+    buckets=LATENCY_BUCKETS
+)
+
+_stage_children: Dict[Tuple[str, str, str], Any] = {}
+_total_children: Dict[Tuple[str, str], Any] = {}
+_current_trace: ContextVar[Optional["LatencyTrace"]] = ContextVar("latency_trace", default=None)
+
+class LatencyTrace:
+    __slots__ = ("started", "last", "stages", "broker", "order_type")
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+        self.broker: Optional[str] = None
+        self.order_type: Optional[str] = None
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def observe(self):
+        labels = (self.broker, self.order_type)
+        for stage, seconds in self.stages:
+            key = (stage, *labels)
+            child = _stage_children.get(key)
+            if child is None:
+                child = _stage_children[key] = ORDER_STAGE_SECONDS.labels(*key)
+            child.observe(seconds)
+        child = _total_children.get(labels)
+        if child is None:
+            child = _total_children[labels] = ORDER_LATENCY_SECONDS.labels(*labels)
+        child.observe(self.last - self.started)
+
+    def server_timing(self) -> str:
+        timings = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages]
+        timings.append(f"total;dur={(self.last - self.started) * 1000:.3f}")
+        return ", ".join(timings)
+
+def mark_stage(stage: str):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mark(stage)
+
+def label_trace(broker: str, order_type: str):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.broker = broker
+        trace.order_type = order_type
+
+class OrderLatencyMiddleware:
+    def __init__(self, app: Any, path: str = "/api/v1/orders"):
+        self.app = app
+        self.paths = {path.rstrip("/"), path.rstrip("/") + "/"}
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any):
+        if (
+            not settings.METRICS_ENABLED
+            or scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        trace = LatencyTrace()
+        debug = settings.LATENCY_DEBUG_HEADER and any(
+            name == b"x-debug-latency" for name, _ in scope["headers"]
+        )
+
+        async def send_with_timing(message: Dict[str, Any]):
+            if message["type"] == "http.response.start":
+                trace.mark("respond")
+                if debug:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing().encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+        if trace.broker is not None:
+            trace.observe()
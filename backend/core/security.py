@@ -5,6 +5,7 @@ from passlib.context import CryptContext
 from fastapi import HTTPException, Security, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from backend.core.config import settings
+from backend.core.metrics import mark_stage
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
@@ -30,18 +31,24 @@ def create_refresh_token(data: Dict[str, Any]) -> str:
     to_encode.update({"exp": expire, "type": "refresh"})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)) -> Dict[str, Any]:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def decode_access_token(token: str) -> Optional[Dict[str, Any]]:
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None or payload.get("type") != "access":
-            raise credentials_exception
-        return {"user_id": user_id, "username": payload.get("username")}
     except JWTError:
-        raise credentials_exception
+        return None
+    user_id: str = payload.get("sub")
+    if user_id is None or payload.get("type") != "access":
+        return None
+    return {"user_id": user_id, "username": payload.get("username")}
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)) -> Dict[str, Any]:
+    mark_stage("receive")
+    user = decode_access_token(credentials.credentials)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    mark_stage("auth")
+    return user
@@ -1,20 +1,29 @@
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from typing import Any, AsyncGenerator, Dict
+from fastapi import Depends, FastAPI, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import uvicorn
 
 from backend.core.config import settings
 from backend.core.database import init_db, close_db
 from backend.core.events import websocket_manager
+from backend.core.metrics import OrderLatencyMiddleware
+from backend.core.security import decode_access_token, get_current_user
+from backend.services.execution_engine import execution_engine
+from backend.services.covariance import covariance_service
 from backend.api import auth, market_data, orders, positions, portfolio, signals, strategies, scanners, workspaces
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator:
     await init_db()
     await websocket_manager.start()
+    await execution_engine.start()
+    await covariance_service.start()
     yield
+    await covariance_service.stop()
+    await execution_engine.stop()
     await websocket_manager.stop()
     await close_db()
 
@@ -34,6 +43,7 @@ app.add_middleware(
 )
 
 app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(OrderLatencyMiddleware)
 
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(market_data.router, prefix="/api/v1/market-data", tags=["Market Data"])
@@ -58,34 +68,60 @@ async def root():
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/broker/stats")
+async def broker_stats(current_user: Dict[str, Any] = Depends(get_current_user)):
+    return execution_engine.get_broker_stats()
+
+@app.get("/ws/stats")
+async def websocket_stats(current_user: Dict[str, Any] = Depends(get_current_user)):
+    return websocket_manager.get_stats()
+
 @app.websocket("/ws/market-data")
 async def websocket_market_data(websocket: WebSocket):
-    await websocket_manager.connect(websocket, "market_data")
+    encoding = websocket.query_params.get("encoding", "json")
+    if not await websocket_manager.connect(websocket, "market_data", encoding):
+        return
     try:
         while True:
             data = await websocket.receive_json()
             await websocket_manager.handle_message(websocket, data, "market_data")
     except WebSocketDisconnect:
+        pass
+    finally:
         await websocket_manager.disconnect(websocket, "market_data")
 
 @app.websocket("/ws/orders")
 async def websocket_orders(websocket: WebSocket):
-    await websocket_manager.connect(websocket, "orders")
+    user = decode_access_token(websocket.query_params.get("token", ""))
+    if user is None:
+        await websocket.close(code=1008)
+        return
+    if not await websocket_manager.connect(websocket, "orders", user_id=user["user_id"]):
+        return
     try:
         while True:
             data = await websocket.receive_json()
             await websocket_manager.handle_message(websocket, data, "orders")
     except WebSocketDisconnect:
+        pass
+    finally:
         await websocket_manager.disconnect(websocket, "orders")
 
 @app.websocket("/ws/signals")
 async def websocket_signals(websocket: WebSocket):
-    await websocket_manager.connect(websocket, "signals")
+    if not await websocket_manager.connect(websocket, "signals"):
+        return
     try:
         while True:
             data = await websocket.receive_json()
             await websocket_manager.handle_message(websocket, data, "signals")
     except WebSocketDisconnect:
+        pass
+    finally:
         await websocket_manager.disconnect(websocket, "signals")
 
 if __name__ == "__main__":
@@ -94,5 +130,5 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
-        workers=4 if not settings.DEBUG else 1
+        workers=1 if settings.DEBUG else settings.WORKERS
     )
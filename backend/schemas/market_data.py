@@ -27,10 +27,17 @@ class OptionContract(BaseModel):
     volume: int
     open_interest: int
     implied_volatility: float
+    expiration: Optional[str] = None
+    delta: Optional[float] = None
+    gamma: Optional[float] = None
+    theta: Optional[float] = None
+    vega: Optional[float] = None
+    rho: Optional[float] = None
 
 class OptionChain(BaseModel):
     symbol: str
     expiration: Optional[str]
+    underlying_price: Optional[float] = None
     calls: List[OptionContract]
     puts: List[OptionContract]
 
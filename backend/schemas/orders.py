@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Dict
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List
 from datetime import datetime
 
 class OrderCreate(BaseModel):
@@ -17,6 +17,7 @@ class OrderCreate(BaseModel):
     stop_loss: Optional[Dict] = None
     trail_price: Optional[float] = None
     trail_percent: Optional[float] = None
+    algo_params: Optional[Dict] = None
 
 class Order(BaseModel):
     id: str
@@ -31,6 +32,23 @@ class Order(BaseModel):
     stop_price: Optional[float]
     created_at: str
     updated_at: Optional[str]
+    client_order_id: Optional[str] = None
+    parent_id: Optional[str] = None
+    algo: Optional[Dict] = None
+
+class BasketOrderCreate(BaseModel):
+    orders: List[OrderCreate] = Field(..., min_length=1)
+
+class BasketLegResult(BaseModel):
+    index: int
+    status: str
+    order: Optional[Order] = None
+    error: Optional[str] = None
+
+class BasketOrderResult(BaseModel):
+    submitted: int
+    rejected: int
+    results: List[BasketLegResult]
 
 class OrderUpdate(BaseModel):
     qty: Optional[float] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, List
 
 class AccountInfo(BaseModel):
     account_number: str
@@ -30,3 +30,14 @@ class PortfolioAnalytics(BaseModel):
     beta: float
     sharpe_ratio: float
     sortino_ratio: float
+
+class StressScenario(BaseModel):
+    name: str
+    market: float = 0.0
+    volatility: float = 0.0
+    sectors: Dict[str, float] = {}
+    symbols: Dict[str, float] = {}
+
+class StressTestRequest(BaseModel):
+    scenarios: List[StressScenario] = []
+    include_predefined: bool = True
@@ -10,3 +10,4 @@ class Position(BaseModel):
     unrealized_pl: float
     unrealized_plpc: float
     current_price: float
+    realized_pl: float = 0.0
@@ -0,0 +1,268 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import math
+import time
+from backend.core.config import settings
+from backend.services.order_store import TERMINAL_STATUSES
+from backend.services.timer_wheel import Timer, TimerWheel
+
+ALGO_TYPES = {"twap", "vwap", "pov"}
+EPSILON = 1e-9
+
+class VolumeProfile:
+    def __init__(self, bucket_minutes: Optional[int] = None, alpha: float = 0.3):
+        self.bucket_seconds = (bucket_minutes or settings.ALGO_VOLUME_BUCKET_MINUTES) * 60
+        self.buckets = int(86400 // self.bucket_seconds)
+        self.alpha = alpha
+        self.profiles: Dict[str, List[float]] = {}
+        self.volumes: Dict[str, float] = {}
+        self._open: Dict[str, List[float]] = {}
+
+    def bucket(self, timestamp: float) -> int:
+        return int(timestamp % 86400 // self.bucket_seconds)
+
+    def on_quote(self, symbol: str, quote: Dict[str, Any], now: float):
+        volume = quote.get("volume")
+        if not volume:
+            return
+        self.volumes[symbol] = volume
+        bucket = self.bucket(now)
+        current = self._open.get(symbol)
+        if current is None:
+            self._open[symbol] = [bucket, volume]
+            return
+        if current[0] == bucket:
+            return
+
+        traded = volume - current[1]
+        if traded > 0:
+            profile = self.profiles.get(symbol)
+            if profile is None:
+                profile = self.profiles[symbol] = [0.0] * self.buckets
+            index = int(current[0])
+            previous = profile[index]
+            profile[index] = traded if previous == 0 else previous + self.alpha * (traded - previous)
+        current[0] = bucket
+        current[1] = volume
+
+    def weights(self, symbol: str, start: float, interval: float, slices: int) -> List[float]:
+        profile = self.profiles.get(symbol)
+        if profile is None:
+            return [1.0 / slices] * slices
+        weights = [profile[self.bucket(start + index * interval)] for index in range(slices)]
+        observed = [weight for weight in weights if weight > 0]
+        if not observed:
+            return [1.0 / slices] * slices
+        mean = sum(observed) / len(observed)
+        weights = [weight if weight > 0 else mean for weight in weights]
+        total = sum(weights)
+        return [weight / total for weight in weights]
+
+class ParentOrder:
+    __slots__ = ("order", "timer", "targets", "children")
+
+    def __init__(self, order: Dict[str, Any], targets: Optional[List[float]]):
+        self.order = order
+        self.timer: Optional[Timer] = None
+        self.targets = targets
+        self.children: List[Dict[str, Any]] = []
+
+class AlgoScheduler:
+    def __init__(self, engine: Any, tick: Optional[float] = None):
+        self.engine = engine
+        self.wheel = TimerWheel(tick or settings.ALGO_TICK_INTERVAL)
+        self.profile = VolumeProfile()
+        self.parents: Dict[str, ParentOrder] = {}
+        self.by_symbol: Dict[str, int] = {}
+        self._origin = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {"parents": 0, "slices": 0, "children": 0, "slice_errors": 0}
+
+    def prepare(self, order_data: Dict[str, Any], params: Optional[Dict[str, Any]]):
+        params = params or {}
+        strategy = order_data["type"].lower()
+        duration = float(params.get("duration", settings.ALGO_DEFAULT_DURATION))
+        interval = float(params.get("interval", settings.ALGO_DEFAULT_INTERVAL))
+        participation = float(params.get("participation", settings.ALGO_DEFAULT_PARTICIPATION))
+        lot_size = float(params.get("lot_size", 1.0))
+        if duration <= 0 or interval <= 0:
+            raise Exception("Algo duration and interval must be positive")
+        if interval < self.wheel.tick:
+            raise Exception(f"Algo interval must be at least {self.wheel.tick}s")
+        if strategy == "pov" and not 0 < participation <= 1:
+            raise Exception("Participation rate must be between 0 and 1")
+        if lot_size <= 0:
+            raise Exception("Lot size must be positive")
+
+        start_at = time.time()
+        order_data["algo"] = {
+            "strategy": strategy,
+            "start_at": start_at,
+            "end_at": start_at + duration,
+            "interval": interval,
+            "participation": participation if strategy == "pov" else None,
+            "lot_size": lot_size,
+            "slices_total": max(1, math.ceil(duration / interval)),
+            "slices_sent": 0,
+            "next_slice_at": start_at,
+            "start_volume": self.profile.volumes.get(order_data["symbol"])
+        }
+
+    def add(self, order_data: Dict[str, Any], children: Optional[List[Dict[str, Any]]] = None):
+        algo = order_data["algo"]
+        targets = None
+        if algo["strategy"] == "vwap":
+            weights = self.profile.weights(
+                order_data["symbol"], algo["start_at"], algo["interval"], algo["slices_total"]
+            )
+            targets = []
+            cumulative = 0.0
+            for weight in weights:
+                cumulative += weight
+                targets.append(cumulative)
+
+        elapsed = int((time.time() - algo["start_at"]) // algo["interval"])
+        if algo["slices_sent"] < algo["slices_total"] and elapsed > algo["slices_sent"]:
+            algo["slices_sent"] = min(elapsed, algo["slices_total"] - 1)
+            algo["next_slice_at"] = algo["start_at"] + algo["slices_sent"] * algo["interval"]
+
+        parent = ParentOrder(order_data, targets)
+        parent.children = [child for child in children or () if child["status"] not in TERMINAL_STATUSES]
+        order_id = order_data["client_order_id"]
+        self.parents[order_id] = parent
+        symbol = order_data["symbol"]
+        self.by_symbol[symbol] = self.by_symbol.get(symbol, 0) + 1
+        self.stats["parents"] += 1
+        self._schedule(parent, algo["next_slice_at"])
+
+    def remove(self, order_id: str) -> List[Dict[str, Any]]:
+        parent = self.parents.pop(order_id, None)
+        if parent is None:
+            return []
+        if parent.timer is not None:
+            self.wheel.cancel(parent.timer)
+            parent.timer = None
+        symbol = parent.order["symbol"]
+        remaining = self.by_symbol.get(symbol, 0) - 1
+        if remaining > 0:
+            self.by_symbol[symbol] = remaining
+        else:
+            self.by_symbol.pop(symbol, None)
+        return [child for child in parent.children if child["status"] not in TERMINAL_STATUSES]
+
+    def has_orders(self, symbol: str) -> bool:
+        return symbol in self.by_symbol
+
+    async def start(self):
+        if self._task is None:
+            self._origin = time.monotonic() - self.wheel.current * self.wheel.tick
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"active": len(self.parents), "timers": len(self.wheel), **self.stats}
+
+    async def _run(self):
+        wheel = self.wheel
+        while True:
+            await asyncio.sleep(wheel.tick)
+            ticks = int((time.monotonic() - self._origin) / wheel.tick) - wheel.current
+            if ticks <= 0:
+                continue
+            due = wheel.advance(ticks)
+            if not due:
+                continue
+            results = await asyncio.gather(*(self._slice(order_id) for order_id in due), return_exceptions=True)
+            for order_id, result in zip(due, results):
+                if isinstance(result, Exception):
+                    await self._fail(order_id, result)
+
+    async def _fail(self, order_id: str, error: Exception):
+        self.stats["slice_errors"] += 1
+        print(f"Algo order {order_id} failed: {error!r}")
+        parent = self.parents.get(order_id)
+        if parent is None:
+            return
+        parent.order["reject_reason"] = str(error)
+        try:
+            await self.engine.close_algo_order(parent.order, "rejected")
+        except Exception as e:
+            print(f"Error closing failed algo order {order_id}: {e}")
+            self.remove(order_id)
+
+    def _schedule(self, parent: ParentOrder, at: float):
+        parent.timer = self.wheel.schedule(at - time.time(), parent.order["client_order_id"])
+
+    async def _slice(self, order_id: str):
+        parent = self.parents.get(order_id)
+        if parent is None:
+            return
+        parent.timer = None
+        order_data = parent.order
+        algo = order_data["algo"]
+        index = algo["slices_sent"]
+        if index >= algo["slices_total"]:
+            await self.engine.close_algo_order(order_data, "expired")
+            return
+
+        try:
+            quantity = self._child_quantity(parent, index)
+            if quantity > EPSILON:
+                child = await self.engine.submit_child_order(order_data, quantity, index)
+                self.stats["children"] += 1
+                if child["status"] not in TERMINAL_STATUSES:
+                    parent.children.append(child)
+        except Exception as e:
+            self.stats["slice_errors"] += 1
+            print(f"Algo slice {index} of {order_id} failed: {e}")
+
+        self.stats["slices"] += 1
+        algo["slices_sent"] = index + 1
+        if order_id not in self.parents:
+            return
+        if index + 1 < algo["slices_total"]:
+            algo["next_slice_at"] = algo["start_at"] + (index + 1) * algo["interval"]
+        else:
+            algo["next_slice_at"] = algo["end_at"] + algo["interval"]
+        self.engine.record_algo_progress(order_data)
+        self._schedule(parent, algo["next_slice_at"])
+
+    def _child_quantity(self, parent: ParentOrder, index: int) -> float:
+        order_data = parent.order
+        algo = order_data["algo"]
+        qty = order_data["qty"]
+        strategy = algo["strategy"]
+        final = index + 1 >= algo["slices_total"]
+
+        if strategy == "pov":
+            volume = self.profile.volumes.get(order_data["symbol"])
+            if volume is None:
+                return 0.0
+            if algo["start_volume"] is None or volume < algo["start_volume"]:
+                algo["start_volume"] = volume
+            target = min(qty, algo["participation"] * (volume - algo["start_volume"]))
+            final = False
+        elif strategy == "vwap":
+            target = qty * parent.targets[index]
+        else:
+            target = qty * (index + 1) / algo["slices_total"]
+        if final:
+            target = qty
+
+        parent.children = [child for child in parent.children if child["status"] not in TERMINAL_STATUSES]
+        working = order_data["filled_qty"] + sum(
+            child["qty"] - child["filled_qty"] for child in parent.children
+        )
+        quantity = target - working
+        if final:
+            return quantity
+        lot_size = algo["lot_size"]
+        return math.floor(quantity / lot_size + EPSILON) * lot_size
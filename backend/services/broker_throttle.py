@@ -0,0 +1,204 @@
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+from collections import deque
+import asyncio
+import time
+import redis.asyncio as aioredis
+from backend.core.config import settings
+
+PRIORITY_CANCEL = 0
+PRIORITY_ORDER = 1
+PRIORITY_QUERY = 2
+LANES = ["cancel", "order", "query"]
+FALLBACK_RETRY_SECONDS = 5.0
+
+TAKE_TOKEN_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+class RedisRateLimiter:
+    def __init__(self, name: str, rate: float, burst: int, client: Optional[Any] = None, prefix: str = "apex:throttle:"):
+        self.key = prefix + name
+        self.rate = rate
+        self.burst = burst
+        self.redis = client or aioredis.from_url(settings.REDIS_URL, max_connections=settings.REDIS_MAX_CONNECTIONS)
+        self._take = self.redis.register_script(TAKE_TOKEN_SCRIPT)
+        self.retry_at = 0.0
+        self.stats: Dict[str, int] = {"taken": 0, "denied": 0, "errors": 0}
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.retry_at
+
+    async def take(self) -> Optional[float]:
+        try:
+            wait_ms = await self._take(keys=[self.key], args=[self.rate, self.burst])
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.retry_at = time.monotonic() + FALLBACK_RETRY_SECONDS
+            print(f"Shared broker rate limit unavailable, using local budget for {FALLBACK_RETRY_SECONDS:.0f}s: {e}")
+            return None
+        if wait_ms:
+            self.stats["denied"] += 1
+            return wait_ms / 1000
+        self.stats["taken"] += 1
+        return 0.0
+
+class BrokerThrottle:
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: Optional[int] = None,
+        limiter: Optional[RedisRateLimiter] = None
+    ):
+        self.name = name
+        self.rate = rate
+        self.limiter = limiter
+        self.capacity = float(burst or max(1, int(rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lanes: List[Deque[asyncio.Future]] = [deque() for _ in LANES]
+        self.inflight: Dict[Hashable, asyncio.Future] = {}
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Dict[str, float]] = {
+            lane: {"granted": 0, "queued": 0, "coalesced": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+            for lane in LANES
+        }
+
+    async def acquire(self, priority: int = PRIORITY_QUERY):
+        stats = self.stats[LANES[priority]]
+        self._refill()
+        if self.tokens >= 1 and not any(self.lanes) and self.limiter is None:
+            self.tokens -= 1
+            stats["granted"] += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self.lanes[priority].append(future)
+        stats["queued"] += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        started = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.done() or future.cancelled():
+                try:
+                    self.lanes[priority].remove(future)
+                except ValueError:
+                    pass
+            else:
+                self.tokens += 1
+            raise
+        wait_ms = (time.monotonic() - started) * 1000
+        stats["granted"] += 1
+        stats["wait_ms_total"] += wait_ms
+        if wait_ms > stats["wait_ms_max"]:
+            stats["wait_ms_max"] = wait_ms
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_QUERY,
+        key: Optional[Hashable] = None
+    ) -> Any:
+        if key is None:
+            await self.acquire(priority)
+            return await call()
+
+        pending = self.inflight.get(key)
+        if pending is None:
+            pending = self.inflight[key] = asyncio.ensure_future(self._run_once(call, priority))
+            pending.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.stats[LANES[priority]]["coalesced"] += 1
+        return await asyncio.shield(pending)
+
+    async def _run_once(self, call: Callable[[], Awaitable[Any]], priority: int) -> Any:
+        await self.acquire(priority)
+        return await call()
+
+    async def _dispatch(self):
+        while any(self.lanes):
+            self._refill()
+            delay = 0.0
+            while self.tokens >= 1 or self._shared():
+                waiter = self._next_waiter()
+                if waiter is None:
+                    return
+                lane, future = waiter
+                if self._shared():
+                    # Redis holds the budget for every process; the local bucket is only the
+                    # fallback share used while it is unreachable.
+                    delay = await self.limiter.take()
+                    if delay:
+                        if not future.done():
+                            lane.appendleft(future)
+                        break
+                    if delay is not None:
+                        if not future.done():
+                            future.set_result(None)
+                        continue
+                    delay = 0.0
+                    if self.tokens < 1:
+                        if not future.done():
+                            lane.appendleft(future)
+                        break
+                if future.done():
+                    continue
+                self.tokens -= 1
+                future.set_result(None)
+            await asyncio.sleep(max(delay, (1 - self.tokens) / self.rate))
+
+    def _shared(self) -> bool:
+        return self.limiter is not None and self.limiter.available
+
+    def _next_waiter(self) -> Optional[Tuple[Deque[asyncio.Future], asyncio.Future]]:
+        for lane in self.lanes:
+            while lane:
+                future = lane.popleft()
+                if not future.done():
+                    return lane, future
+        return None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._refill()
+        lanes = {}
+        for index, lane in enumerate(LANES):
+            stats = self.stats[lane]
+            waited = stats["queued"] or 1
+            lanes[lane] = {
+                **stats,
+                "depth": len(self.lanes[index]),
+                "wait_ms_avg": stats["wait_ms_total"] / waited
+            }
+        return {
+            "broker": self.name,
+            "rate": self.rate,
+            "tokens": self.tokens,
+            "inflight_queries": len(self.inflight),
+            "shared": self.limiter.stats if self.limiter else None,
+            "lanes": lanes
+        }
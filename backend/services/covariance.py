@@ -0,0 +1,233 @@
+from typing import Dict, List, Optional, Sequence, Set
+from pathlib import Path
+import asyncio
+import fcntl
+import math
+import os
+import tempfile
+import time
+import numpy as np
+from backend.core.config import settings
+from backend.core.events import websocket_manager
+
+class CovarianceSnapshot:
+    __slots__ = ("symbols", "index", "matrix", "bars", "updated_at", "bars_per_year")
+
+    def __init__(
+        self,
+        symbols: Sequence[str],
+        matrix: np.ndarray,
+        bars: int,
+        updated_at: Optional[float],
+        bars_per_year: float
+    ):
+        self.symbols = tuple(symbols)
+        self.index = {symbol: position for position, symbol in enumerate(self.symbols)}
+        self.matrix = matrix
+        self.matrix.flags.writeable = False
+        self.bars = bars
+        self.updated_at = updated_at
+        self.bars_per_year = bars_per_year
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.index
+
+    def covariance(self, symbols: Sequence[str], annualize: bool = False) -> np.ndarray:
+        positions = [self.index[symbol] for symbol in symbols]
+        matrix = self.matrix[np.ix_(positions, positions)]
+        return matrix * self.bars_per_year if annualize else matrix
+
+    def correlation(self, symbols: Sequence[str]) -> np.ndarray:
+        matrix = self.covariance(symbols)
+        scale = np.sqrt(np.diag(matrix))
+        scale[scale == 0] = np.inf
+        return matrix / np.outer(scale, scale)
+
+    def volatility(self, symbol: str) -> Optional[float]:
+        position = self.index.get(symbol)
+        if position is None:
+            return None
+        return math.sqrt(self.matrix[position, position] * self.bars_per_year)
+
+    def betas(self, symbols: Sequence[str], benchmark: str) -> Optional[np.ndarray]:
+        anchor = self.index.get(benchmark)
+        if anchor is None or self.matrix[anchor, anchor] <= 0:
+            return None
+        positions = [self.index[symbol] for symbol in symbols]
+        return self.matrix[positions, anchor] / self.matrix[anchor, anchor]
+
+class CovarianceService:
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        decay: Optional[float] = None,
+        bar_seconds: Optional[float] = None,
+        benchmark: Optional[str] = None
+    ):
+        self.path = Path(path or settings.COVARIANCE_PATH)
+        self.decay = settings.COVARIANCE_DECAY if decay is None else decay
+        self.bar_seconds = bar_seconds or settings.COVARIANCE_BAR_SECONDS
+        self.benchmark = benchmark or settings.COVARIANCE_BENCHMARK
+        self.bars_per_year = 252 * 6.5 * 3600 / self.bar_seconds
+        self.symbols: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.matrix = np.zeros((0, 0))
+        self.last_prices = np.zeros(0)
+        self.closes: Dict[str, float] = {}
+        self.bars = 0
+        self._fresh: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._lock_file = None
+        self.snapshot = CovarianceSnapshot([], self.matrix.copy(), 0, None, self.bars_per_year)
+        self.stats: Dict[str, float] = {"bars": 0, "skipped_bars": 0, "update_ms": 0.0, "saves": 0}
+
+    async def start(self):
+        self.load()
+        websocket_manager.add_quote_listener(self.on_quotes)
+        await websocket_manager.watch_symbols([self.benchmark])
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        websocket_manager.remove_quote_listener(self.on_quotes)
+        await websocket_manager.unwatch_symbols([self.benchmark])
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await asyncio.to_thread(self.save)
+        except Exception as e:
+            print(f"Error saving covariance cache {self.path}: {e}")
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def on_quotes(self, updates: Dict[str, Dict]):
+        closes = self.closes
+        fresh = self._fresh
+        for symbol, quote in updates.items():
+            close = quote.get("close")
+            if close and close != closes.get(symbol):
+                closes[symbol] = close
+                fresh.add(symbol)
+
+    def sample(self, now: Optional[float] = None):
+        if not self._fresh:
+            self.stats["skipped_bars"] += 1
+            return
+        started = time.perf_counter()
+        added = [symbol for symbol in self._fresh if symbol not in self.index]
+        if added:
+            self._grow(added)
+
+        closes = self.closes
+        prices = np.array([closes.get(symbol, np.nan) for symbol in self.symbols])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.log(prices / self.last_prices)
+        returns[~np.isfinite(returns)] = 0.0
+
+        matrix = self.matrix * self.decay
+        matrix += np.outer(returns, returns * (1 - self.decay))
+        self.matrix = matrix
+        self.last_prices = np.where(np.isnan(prices), self.last_prices, prices)
+        self._fresh.clear()
+        self.bars += 1
+        self._publish(now or time.time())
+        self.stats["bars"] += 1
+        self.stats["update_ms"] = (time.perf_counter() - started) * 1000
+
+    def load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                symbols = [str(symbol) for symbol in data["symbols"]]
+                matrix = np.array(data["matrix"], dtype=np.float64)
+                bars = int(data["bars"])
+                updated_at = float(data["updated_at"])
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Error loading covariance cache {self.path}: {e}")
+            return
+        self.symbols = symbols
+        self.index = {symbol: position for position, symbol in enumerate(symbols)}
+        self.matrix = matrix
+        self.last_prices = np.full(len(symbols), np.nan)
+        self.bars = bars
+        self._publish(updated_at)
+
+    def save(self):
+        snapshot = self.snapshot
+        if not snapshot.symbols:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self._acquire():
+            return
+        fd, tmp = tempfile.mkstemp(prefix=self.path.name + ".", suffix=".tmp", dir=self.path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    symbols=np.array(snapshot.symbols),
+                    matrix=snapshot.matrix,
+                    bars=snapshot.bars,
+                    updated_at=snapshot.updated_at or time.time()
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.stats["saves"] += 1
+
+    def _acquire(self) -> bool:
+        # Every worker keeps its own estimate, but only the one holding the lock writes the cache.
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.path.with_name(self.path.name + ".lock"), "ab")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "symbols": len(self.symbols),
+            "updated_at": self.snapshot.updated_at,
+            "writer": self._lock_file is not None,
+            **self.stats
+        }
+
+    async def _run(self):
+        while True:
+            now = time.time()
+            await asyncio.sleep(self.bar_seconds - now % self.bar_seconds)
+            try:
+                self.sample()
+                if self.bars and self.bars % settings.COVARIANCE_SAVE_INTERVAL == 0:
+                    await asyncio.to_thread(self.save)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Covariance update failed: {e}")
+
+    def _grow(self, added: List[str]):
+        size = len(self.symbols)
+        for symbol in added:
+            self.index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        matrix = np.zeros((len(self.symbols), len(self.symbols)))
+        matrix[:size, :size] = self.matrix
+        self.matrix = matrix
+        self.last_prices = np.concatenate([self.last_prices, np.full(len(added), np.nan)])
+
+    def _publish(self, updated_at: float):
+        self.snapshot = CovarianceSnapshot(self.symbols, self.matrix, self.bars, updated_at, self.bars_per_year)
+
+covariance_service = CovarianceService()
@@ -1,15 +1,53 @@
 import asyncio
-from typing import Dict, List, Optional, Set
-from datetime import datetime
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+from datetime import date, datetime, timedelta
 import aiohttp
-from polygon import WebSocketClient, RESTClient
+import numpy as np
+import orjson
+import websockets
+from polygon import RESTClient
 from alpaca.data import StockHistoricalDataClient
 from alpaca.data.requests import StockBarsRequest, StockQuotesRequest
 from alpaca.data.timeframe import TimeFrame
+from ib_insync import Contract, Stock
 from backend.core.config import settings
+from backend.services.ib_session import IBSession, ib_session as default_ib_session
+from backend.services.options_pricing import GREEK_NAMES, MARKET_TZ, black_scholes, implied_volatility, years_to_expiry
+from backend.services.position_keeper import mark_price
+
+POLYGON_CHANNELS = ("Q", "T", "AM")
+
+class PolygonWebSocketTransport:
+    def __init__(self, url: Optional[str] = None, api_key: Optional[str] = None):
+        self.url = url or settings.POLYGON_WS_URL
+        self.api_key = api_key if api_key is not None else settings.POLYGON_API_KEY
+        self.ws = None
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url, max_size=None, compression=None)
+        await self.send({"action": "auth", "params": self.api_key})
+
+    async def recv(self) -> Union[str, bytes]:
+        return await self.ws.recv()
+
+    async def send(self, message: Dict[str, Any]):
+        await self.ws.send(orjson.dumps(message).decode())
+
+    async def close(self):
+        if self.ws:
+            await self.ws.close()
+            self.ws = None
 
 class DataStreamer:
-    def __init__(self):
+    def __init__(
+        self,
+        transport_factory: Optional[Callable[[], Any]] = None,
+        quotes: Optional[Dict[str, Dict]] = None,
+        ib_session: Optional[IBSession] = None,
+        received_at: Optional[Dict[str, float]] = None
+    ):
         self.polygon_rest = RESTClient(settings.POLYGON_API_KEY) if settings.POLYGON_API_KEY else None
         self.alpaca_client = StockHistoricalDataClient(
             settings.ALPACA_API_KEY,
@@ -17,33 +55,89 @@ class DataStreamer:
         ) if settings.ALPACA_API_KEY else None
         
         self.subscriptions: Set[str] = set()
-        self.latest_quotes: Dict[str, Dict] = {}
+        self.latest_quotes: Dict[str, Dict] = {} if quotes is None else quotes
+        self.received_at: Dict[str, float] = {} if received_at is None else received_at
+        self._dirty: Set[str] = set()
         self.ws_client = None
         self._running = False
+        
+        if ib_session is None and settings.IB_ENABLED and settings.IB_MARKET_DATA:
+            ib_session = default_ib_session
+        self.ib_session = ib_session
+        self.ib_contracts: Dict[str, Contract] = {}
+        self._ib_stamps: Dict[str, Any] = {}
+        
+        if transport_factory is None and settings.POLYGON_API_KEY and self.ib_session is None:
+            transport_factory = PolygonWebSocketTransport
+        self.transport_factory = transport_factory
+        self._raw_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.MARKET_DATA_QUEUE_SIZE)
+        self._tasks: List[asyncio.Task] = []
+        self.stats: Dict[str, float] = {
+            "frames_received": 0,
+            "messages_processed": 0,
+            "frames_dropped": 0,
+            "parse_errors": 0,
+            "reconnects": 0,
+            "lag_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
 
     async def start(self):
         self._running = True
-        if settings.POLYGON_API_KEY:
-            asyncio.create_task(self._polygon_websocket_loop())
+        if self.ib_session:
+            await self.ib_session.start()
+            self._tasks.append(asyncio.create_task(self._ib_loop()))
+        if self.transport_factory:
+            self._tasks.append(asyncio.create_task(self._polygon_websocket_loop()))
+            self._tasks.append(asyncio.create_task(self._process_loop()))
 
     async def stop(self):
         self._running = False
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
         if self.ws_client:
             await self.ws_client.close()
+            self.ws_client = None
+        if self.ib_session:
+            for contract in self.ib_contracts.values():
+                await self.ib_session.unsubscribe_market_data(contract)
+            self.ib_contracts.clear()
 
     async def subscribe(self, symbols: List[str]):
+        new_symbols = [symbol for symbol in symbols if symbol not in self.subscriptions]
         self.subscriptions.update(symbols)
+        if new_symbols:
+            await self._send_subscription("subscribe", new_symbols)
+            if self.ib_session and self.ib_session.connected:
+                await self._subscribe_ib(new_symbols)
 
     async def unsubscribe(self, symbols: List[str]):
         self.subscriptions.difference_update(symbols)
+        for symbol in symbols:
+            self.latest_quotes.pop(symbol, None)
+            self.received_at.pop(symbol, None)
+            self._dirty.discard(symbol)
+        if symbols:
+            await self._send_subscription("unsubscribe", symbols)
+        if self.ib_session:
+            for symbol in symbols:
+                contract = self.ib_contracts.pop(symbol, None)
+                self._ib_stamps.pop(symbol, None)
+                if contract is not None:
+                    await self.ib_session.unsubscribe_market_data(contract)
+
+    def get_stats(self) -> Dict[str, float]:
+        return {**self.stats, "queue_depth": self._raw_queue.qsize()}
 
     async def get_quote(self, symbol: str) -> Optional[Dict]:
-        if symbol in self.latest_quotes:
-            return self.latest_quotes[symbol]
+        quote = self.latest_quotes.get(symbol)
+        if quote is not None and time.time() - self.received_at.get(symbol, 0.0) <= settings.MARKET_DATA_QUOTE_MAX_AGE:
+            return quote
         
         if self.polygon_rest:
             try:
-                quote = self.polygon_rest.get_last_quote(symbol)
+                quote = await asyncio.to_thread(self.polygon_rest.get_last_quote, symbol)
                 return {
                     "symbol": symbol,
                     "bid": quote.bid_price,
@@ -58,12 +152,8 @@ class DataStreamer:
         return None
 
     async def get_quotes(self, symbols: List[str]) -> List[Dict]:
-        quotes = []
-        for symbol in symbols:
-            quote = await self.get_quote(symbol)
-            if quote:
-                quotes.append(quote)
-        return quotes
+        quotes = await asyncio.gather(*(self.get_quote(symbol) for symbol in symbols))
+        return [quote for quote in quotes if quote]
 
     async def get_historical_bars(
         self,
@@ -109,36 +199,109 @@ class DataStreamer:
             print(f"Error fetching bars: {e}")
             return []
 
+    async def get_daily_closes(self, symbols: List[str], days: int = 252) -> Dict[str, List[Tuple[str, float]]]:
+        if not self.alpaca_client or not symbols:
+            return {}
+        
+        request = StockBarsRequest(
+            symbol_or_symbols=symbols,
+            timeframe=TimeFrame.Day,
+            start=datetime.utcnow() - timedelta(days=days * 365 // 252 + 10)
+        )
+        try:
+            bars = await asyncio.to_thread(self.alpaca_client.get_stock_bars, request)
+        except Exception as e:
+            print(f"Error fetching daily bars: {e}")
+            return {}
+        
+        result = {}
+        for symbol in symbols:
+            try:
+                series = bars[symbol]
+            except (KeyError, IndexError):
+                continue
+            result[symbol] = [(bar.timestamp.date().isoformat(), float(bar.close)) for bar in series][-(days + 1):]
+        return result
+
     async def get_option_chain(self, symbol: str, expiration: Optional[str] = None) -> Optional[Dict]:
         if not self.polygon_rest:
             return None
         
         try:
-            contracts = self.polygon_rest.list_options_contracts(
-                underlying_ticker=symbol,
-                expiration_date=expiration
+            snapshots = await asyncio.to_thread(
+                list,
+                self.polygon_rest.list_snapshot_options_chain(
+                    symbol,
+                    params={"expiration_date": expiration} if expiration else None
+                )
             )
+            underlying = await self.get_quote(symbol)
+            spot = mark_price(underlying) if underlying else 0.0
+            if not spot:
+                spot = next(
+                    (snapshot.underlying_asset.price for snapshot in snapshots
+                     if snapshot.underlying_asset and snapshot.underlying_asset.price),
+                    0.0
+                )
             
             chain = {
                 "symbol": symbol,
                 "expiration": expiration,
+                "underlying_price": spot or None,
                 "calls": [],
                 "puts": []
             }
+            if not snapshots:
+                return chain
             
-            for contract in contracts:
-                option_data = {
-                    "strike": contract.strike_price,
-                    "contract": contract.ticker,
-                    "bid": 0,
-                    "ask": 0,
-                    "last": 0,
-                    "volume": 0,
-                    "open_interest": 0,
-                    "implied_volatility": 0
+            now = datetime.now(MARKET_TZ)
+            expiries = {}
+            strikes = np.empty(len(snapshots))
+            years = np.empty(len(snapshots))
+            is_call = np.empty(len(snapshots), dtype=bool)
+            prices = np.empty(len(snapshots))
+            rows = []
+            for index, snapshot in enumerate(snapshots):
+                details = snapshot.details
+                last_quote = snapshot.last_quote
+                quote = {
+                    "bid": last_quote.bid if last_quote else None,
+                    "ask": last_quote.ask if last_quote else None,
+                    "last": snapshot.last_trade.price if snapshot.last_trade else None,
+                    "close": snapshot.day.close if snapshot.day else None
                 }
-                
-                if contract.contract_type == "call":
+                if details.expiration_date not in expiries:
+                    expiries[details.expiration_date] = years_to_expiry(date.fromisoformat(details.expiration_date), now)
+                strikes[index] = details.strike_price
+                years[index] = expiries[details.expiration_date]
+                is_call[index] = details.contract_type == "call"
+                prices[index] = mark_price(quote) or np.nan
+                rows.append({
+                    "strike": details.strike_price,
+                    "contract": details.ticker,
+                    "expiration": details.expiration_date,
+                    "bid": quote["bid"] or 0,
+                    "ask": quote["ask"] or 0,
+                    "last": quote["last"] or 0,
+                    "volume": int(snapshot.day.volume or 0) if snapshot.day else 0,
+                    "open_interest": int(snapshot.open_interest or 0),
+                    "implied_volatility": 0
+                })
+            
+            if spot > 0:
+                rate = settings.RISK_FREE_RATE
+                implied = implied_volatility(prices, spot, strikes, years, is_call, rate)
+                greeks = black_scholes(spot, strikes, years, implied, is_call, rate)
+                columns = {name: greeks[name].tolist() for name in GREEK_NAMES}
+                volatilities = implied.tolist()
+                for index in np.flatnonzero(np.isfinite(implied)).tolist():
+                    option_data = rows[index]
+                    option_data["implied_volatility"] = volatilities[index]
+                    for name in GREEK_NAMES:
+                        option_data[name] = columns[name][index]
+            
+            for index, option_data in enumerate(rows):
+                if is_call[index]:
                     chain["calls"].append(option_data)
                 else:
                     chain["puts"].append(option_data)
@@ -200,10 +363,203 @@ class DataStreamer:
     async def get_latest_quotes(self) -> Dict[str, Dict]:
         return self.latest_quotes.copy()
 
+    async def get_updated_quotes(self) -> Dict[str, Dict]:
+        if not self._dirty:
+            return {}
+        dirty, self._dirty = self._dirty, set()
+        quotes = self.latest_quotes
+        return {symbol: dict(quotes[symbol]) for symbol in dirty}
+
+    async def _send_subscription(self, action: str, symbols: List[str]):
+        if not self.ws_client:
+            return
+        params = ",".join(f"{channel}.{symbol}" for symbol in symbols for channel in POLYGON_CHANNELS)
+        try:
+            await self.ws_client.send({"action": action, "params": params})
+        except Exception as e:
+            print(f"WebSocket {action} failed: {e}")
+
+    async def _subscribe_ib(self, symbols: List[str]):
+        for symbol in symbols:
+            if symbol in self.ib_contracts or symbol not in self.subscriptions:
+                continue
+            contract = Stock(symbol, "SMART", "USD")
+            try:
+                await self.ib_session.subscribe_market_data(contract)
+            except Exception as e:
+                print(f"IB market data subscribe failed for {symbol}: {e}")
+                return
+            self.ib_contracts[symbol] = contract
+
+    async def _ib_loop(self):
+        session = self.ib_session
+        while self._running:
+            await asyncio.sleep(settings.IB_MARKET_DATA_POLL_INTERVAL)
+            if not session.connected:
+                continue
+            try:
+                if len(self.ib_contracts) < len(self.subscriptions):
+                    await self._subscribe_ib([symbol for symbol in self.subscriptions if symbol not in self.ib_contracts])
+                self._apply_tickers()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"IB market data poll failed: {e}")
+
+    def _apply_tickers(self):
+        quotes = self.latest_quotes
+        stamps = self._ib_stamps
+        now = time.time()
+        for symbol, contract in self.ib_contracts.items():
+            ticker = self.ib_session.get_ticker(contract)
+            if ticker is None or ticker.time is None or stamps.get(symbol) == ticker.time:
+                continue
+            stamps[symbol] = ticker.time
+            quotes[symbol] = {
+                **quotes.get(symbol, {}),
+                "symbol": symbol,
+                "bid": _ib_value(ticker.bid),
+                "ask": _ib_value(ticker.ask),
+                "bid_size": int(_ib_value(ticker.bidSize)),
+                "ask_size": int(_ib_value(ticker.askSize)),
+                "last": _ib_value(ticker.last),
+                "last_size": int(_ib_value(ticker.lastSize)),
+                "volume": _ib_value(ticker.volume),
+                "vwap": _ib_value(ticker.vwap),
+                "close": _ib_value(ticker.close) or None,
+                "timestamp": int(ticker.time.timestamp() * 1000)
+            }
+            self.received_at[symbol] = now
+            self._dirty.add(symbol)
+
     async def _polygon_websocket_loop(self):
+        delay = settings.MARKET_DATA_RECONNECT_MIN_DELAY
+        queue = self._raw_queue
+        stats = self.stats
+        
         while self._running:
+            transport = self.transport_factory()
             try:
-                await asyncio.sleep(1)
+                await transport.connect()
+                self.ws_client = transport
+                delay = settings.MARKET_DATA_RECONNECT_MIN_DELAY
+                if self.subscriptions:
+                    await self._send_subscription("subscribe", list(self.subscriptions))
+                
+                while self._running:
+                    frame = await transport.recv()
+                    stats["frames_received"] += 1
+                    if queue.full():
+                        queue.get_nowait()
+                        stats["frames_dropped"] += 1
+                    queue.put_nowait(frame)
+            except asyncio.CancelledError:
+                await transport.close()
+                raise
             except Exception as e:
                 print(f"WebSocket error: {e}")
-                await asyncio.sleep(5)
+            
+            self.ws_client = None
+            await transport.close()
+            if not self._running:
+                break
+            stats["reconnects"] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.MARKET_DATA_RECONNECT_MAX_DELAY)
+
+    async def _process_loop(self):
+        queue = self._raw_queue
+        batch_size = settings.MARKET_DATA_BATCH_SIZE
+        stats = self.stats
+        
+        while self._running:
+            frames = [await queue.get()]
+            while len(frames) < batch_size and not queue.empty():
+                frames.append(queue.get_nowait())
+            
+            events = []
+            for frame in frames:
+                try:
+                    parsed = orjson.loads(frame)
+                except orjson.JSONDecodeError:
+                    stats["parse_errors"] += 1
+                    continue
+                if isinstance(parsed, list):
+                    events.extend(parsed)
+                else:
+                    events.append(parsed)
+            
+            last_ts = self._apply_events(events)
+            stats["messages_processed"] += len(events)
+            if last_ts:
+                lag = time.time() * 1000 - last_ts
+                stats["lag_ms"] = lag
+                if lag > stats["max_lag_ms"]:
+                    stats["max_lag_ms"] = lag
+
+    def _apply_events(self, events: List[Dict[str, Any]]) -> int:
+        quotes = self.latest_quotes
+        received_at = self.received_at
+        mark_dirty = self._dirty.add
+        stats = self.stats
+        now = time.time()
+        last_ts = 0
+        
+        for event in events:
+            try:
+                ev = event.get("ev")
+                symbol = event.get("sym")
+                if symbol is None:
+                    if ev == "status" and event.get("status") == "auth_failed":
+                        print(f"Polygon auth failed: {event.get('message')}")
+                    continue
+            
+                quote = quotes.get(symbol)
+                if quote is None:
+                    quote = quotes[symbol] = {
+                        "symbol": symbol,
+                        "bid": 0.0,
+                        "ask": 0.0,
+                        "bid_size": 0,
+                        "ask_size": 0,
+                        "last": 0.0,
+                        "last_size": 0,
+                        "volume": 0,
+                        "vwap": 0.0,
+                        "timestamp": 0
+                    }
+            
+                if ev == "Q":
+                    quote["bid"] = event.get("bp", 0.0)
+                    quote["ask"] = event.get("ap", 0.0)
+                    quote["bid_size"] = event.get("bs", 0)
+                    quote["ask_size"] = event.get("as", 0)
+                    ts = quote["timestamp"] = event.get("t") or 0
+                elif ev == "T":
+                    quote["last"] = event.get("p", 0.0)
+                    quote["last_size"] = event.get("s", 0)
+                    ts = quote["timestamp"] = event.get("t") or 0
+                elif ev == "AM" or ev == "A":
+                    quote["open"] = event.get("o")
+                    quote["high"] = event.get("h")
+                    quote["low"] = event.get("l")
+                    quote["close"] = event.get("c")
+                    quote["volume"] = event.get("av", event.get("v", 0))
+                    quote["vwap"] = event.get("a", event.get("vw", 0.0))
+                    ts = event.get("e") or 0
+                else:
+                    continue
+            
+                mark_dirty(symbol)
+                received_at[symbol] = now
+                if ts > last_ts:
+                    last_ts = ts
+            except Exception:
+                stats["parse_errors"] += 1
+
+        return last_ts
+
+def _ib_value(value: Optional[float]) -> float:
+    if value is None or math.isnan(value) or value < 0:
+        return 0.0
+    return float(value)
@@ -1,21 +1,97 @@
-from typing import Dict, List, Optional, Any
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import asyncio
-from ib_insync import IB, Stock, Order as IBOrder, LimitOrder, MarketOrder, StopOrder
+import gc
+import time
+from ib_insync import Stock, Order as IBOrder, LimitOrder, MarketOrder, StopOrder
 from alpaca.trading.client import TradingClient
-from alpaca.trading.requests import MarketOrderRequest, LimitOrderRequest, StopOrderRequest
-from alpaca.trading.enums import OrderSide, TimeInForce, OrderType
-from backend.core.config import settings
+from alpaca.trading.requests import GetOrdersRequest, MarketOrderRequest, LimitOrderRequest, StopOrderRequest
+from alpaca.trading.enums import OrderSide, QueryOrderStatus, TimeInForce, OrderType
+from alpaca.trading.stream import TradingStream
+from alpaca.common.exceptions import APIError
+from requests.adapters import HTTPAdapter
+from backend.core.config import settings, get_config_section
+from backend.core.events import websocket_manager
+from backend.core.metrics import mark_stage, label_trace
+from backend.services.order_store import OrderStore, TERMINAL_STATUSES
+from backend.services.paper_exchange import PaperExchange
+from backend.services.ib_session import ib_session
+from backend.services.order_journal import OrderJournal, RECORD_ORDER, RECORD_UPDATE, RECORD_FILL
+from backend.services.position_keeper import PositionKeeper, mark_price
+from backend.services.risk_gate import RiskGate
+from backend.services.idempotency import IdempotencyIndex
+from backend.services.algo_scheduler import AlgoScheduler, ALGO_TYPES
+from backend.services.broker_throttle import BrokerThrottle, RedisRateLimiter, PRIORITY_CANCEL, PRIORITY_ORDER, PRIORITY_QUERY
 import uuid
 
+BROKER_BOOK = "alpaca"
+
+ORDER_EVENTS = {
+    "new": "accepted",
+    "accepted": "accepted",
+    "pending_new": "accepted",
+    "partial_fill": "partially_filled",
+    "fill": "filled",
+    "canceled": "canceled",
+    "expired": "canceled",
+    "rejected": "rejected",
+}
+
+BROKER_STATUSES = {
+    "new": "accepted",
+    "pending_new": "accepted",
+    "accepted_for_bidding": "accepted",
+    "held": "accepted",
+    "expired": "canceled",
+}
+
+def broker_status(status: Optional[str]) -> Optional[str]:
+    return BROKER_STATUSES.get(status, status)
+
 class ExecutionEngine:
     def __init__(self):
-        self.ib = None
+        self.ib_session = ib_session if settings.IB_ENABLED else None
         self.alpaca = None
         self.paper_mode = settings.ENABLE_PAPER_TRADING
         self.live_mode = settings.ENABLE_LIVE_TRADING
-        self.orders_cache: Dict[str, Dict] = {}
-        self.positions_cache: Dict[str, Dict] = {}
+        self.order_store = OrderStore()
+        self.idempotency = IdempotencyIndex()
+        self.execution_config = get_config_section("execution")
+        self.paper_exchange = PaperExchange(self.execution_config)
+        self.position_keeper = PositionKeeper(shared_account=BROKER_BOOK if settings.ALPACA_API_KEY else None)
+        self.algo_scheduler = AlgoScheduler(self)
+        risk_limits = {
+            key: self.execution_config[key]
+            for key in ("max_position_size", "max_order_value")
+            if key in self.execution_config
+        }
+        risk_limits.update(get_config_section("risk"))
+        self.risk_gate = RiskGate(
+            self.position_keeper,
+            risk_limits,
+            enabled=self.execution_config.get("enable_risk_checks", False)
+        )
+        self.watched_symbols: Set[str] = set()
+        self.journal = OrderJournal() if settings.JOURNAL_ENABLED else None
+        self.broker_order_ids: Dict[str, str] = {}
+        self.unresolved_orders: Set[str] = set()
+        self._resolve_tasks: Set[asyncio.Task] = set()
+        self.trade_stream = None
+        self._stream_task: Optional[asyncio.Task] = None
+        self._reconcile_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        self.throttles = {
+            "alpaca": self._alpaca_throttle(),
+            "ib": BrokerThrottle("ib", settings.IB_RATE_LIMIT)
+        }
+        
+        self.broker_executor = ThreadPoolExecutor(
+            max_workers=settings.BROKER_EXECUTOR_WORKERS,
+            thread_name_prefix="broker"
+        )
         
         if settings.ALPACA_API_KEY:
             self.alpaca = TradingClient(
@@ -23,19 +99,335 @@ class ExecutionEngine:
                 secret_key=settings.ALPACA_SECRET_KEY,
                 paper=self.paper_mode
             )
+            session = getattr(self.alpaca, "_session", None)
+            if session is not None:
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=settings.BROKER_EXECUTOR_WORKERS
+                )
+                session.mount("https://", adapter)
+
+    def _alpaca_throttle(self) -> BrokerThrottle:
+        rate = settings.BROKER_RATE_LIMIT
+        burst = settings.BROKER_RATE_BURST
+        limiter = RedisRateLimiter("alpaca", rate, burst) if settings.BROKER_RATE_BACKEND == "redis" else None
+        shares = max(1, settings.BROKER_RATE_SHARES)
+        return BrokerThrottle("alpaca", rate / shares, max(1, burst // shares), limiter)
 
-    async def connect_ib(self):
-        if not self.ib:
-            self.ib = IB()
+    async def broker_call(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        timeout: Optional[float] = None,
+        priority: int = PRIORITY_QUERY,
+        **kwargs: Any
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        
+        async def call():
+            mark_stage("throttle")
+            return await asyncio.wait_for(
+                loop.run_in_executor(self.broker_executor, partial(fn, *args, **kwargs)),
+                timeout=timeout or settings.BROKER_CALL_TIMEOUT
+            )
+        
+        key = None
+        if priority == PRIORITY_QUERY:
+            key = (getattr(fn, "__qualname__", repr(fn)), args, tuple(sorted(kwargs.items())))
             try:
-                await self.ib.connectAsync(
-                    settings.IB_HOST,
-                    settings.IB_PORT,
-                    clientId=settings.IB_CLIENT_ID
-                )
+                hash(key)
+            except TypeError:
+                key = None
+        return await self.throttles["alpaca"].run(call, priority, key)
+
+    def get_broker_stats(self) -> Dict[str, Any]:
+        return {
+            "throttles": {name: throttle.get_stats() for name, throttle in self.throttles.items()},
+            "ib_session": self.ib_session.get_stats() if self.ib_session else None,
+            "journal": self.journal.get_stats() if self.journal else None,
+            "idempotency": self.idempotency.get_stats(),
+            "algo": self.algo_scheduler.get_stats(),
+            "risk_gate": self.risk_gate.get_stats()
+        }
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self.ib_session:
+            await self.ib_session.start()
+        if self.journal:
+            self._restore()
+            await self.journal.start(self._journal_state)
+            parents = []
+            children: Dict[str, List[Dict[str, Any]]] = {}
+            for order_data in list(self.order_store.orders.values()):
+                if order_data.get("parent_id"):
+                    children.setdefault(order_data["parent_id"], []).append(order_data)
+                if order_data["status"] in TERMINAL_STATUSES:
+                    continue
+                if order_data.get("broker") == "paper":
+                    await self._submit_paper_order(order_data)
+                elif order_data.get("broker") == "algo":
+                    parents.append(order_data)
+                elif order_data.get("broker") == "alpaca" and order_data["id"] == order_data["client_order_id"]:
+                    self.unresolved_orders.add(order_data["client_order_id"])
+            for order_data in parents:
+                self.algo_scheduler.add(order_data, children.get(order_data["client_order_id"]))
+                await self._sync_symbol_watch(order_data["symbol"])
+            for symbol in list(self.position_keeper.by_symbol):
+                await self._sync_symbol_watch(symbol)
+        await self.algo_scheduler.start()
+        websocket_manager.add_quote_listener(self._on_quotes)
+        if self.alpaca:
+            await self.reconcile_broker()
+            self._reconcile_task = asyncio.create_task(self._reconcile_loop())
+            self.trade_stream = TradingStream(
+                settings.ALPACA_API_KEY,
+                settings.ALPACA_SECRET_KEY,
+                paper=self.paper_mode,
+                raw_data=True,
+                url_override=settings.ALPACA_STREAM_URL or None
+            )
+            self.trade_stream.subscribe_trade_updates(self._relay_trade_update)
+            self._stream_task = asyncio.create_task(asyncio.to_thread(self.trade_stream.run))
+
+    async def stop(self):
+        websocket_manager.remove_quote_listener(self._on_quotes)
+        await self.algo_scheduler.stop()
+        for task in list(self._resolve_tasks):
+            task.cancel()
+        if self._reconcile_task:
+            self._reconcile_task.cancel()
+            try:
+                await self._reconcile_task
+            except asyncio.CancelledError:
+                pass
+            self._reconcile_task = None
+        if self.trade_stream:
+            try:
+                await asyncio.to_thread(self.trade_stream.stop)
             except Exception as e:
-                print(f"IB connection failed: {e}")
-                self.ib = None
+                print(f"Error stopping trade updates stream: {e}")
+            self.trade_stream = None
+        if self._stream_task:
+            self._stream_task.cancel()
+            self._stream_task = None
+        if self.ib_session:
+            await self.ib_session.stop()
+        if self.journal:
+            await self.journal.stop()
+        self.broker_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def reconcile_broker(self):
+        try:
+            account = await self.broker_call(self.alpaca.get_account)
+            broker_positions = await self.broker_call(self.alpaca.get_all_positions)
+        except Exception as e:
+            print(f"Error reconciling broker account: {e}")
+            return
+        
+        positions = [
+            {
+                "symbol": pos.symbol,
+                "qty": abs(float(pos.qty)) * (-1 if str(getattr(pos.side, "value", pos.side)) == "short" else 1),
+                "avg_entry_price": float(pos.avg_entry_price),
+                "current_price": float(pos.current_price or 0)
+            }
+            for pos in broker_positions
+        ]
+        for order_id in list(self.unresolved_orders):
+            order_data = self.order_store.get(order_id)
+            if order_data is not None:
+                await self.resolve_order(order_data)
+        
+        keeper = self.position_keeper
+        held = set(keeper.book(BROKER_BOOK))
+        balances = {
+            "buying_power": float(account.buying_power),
+            "last_equity": float(account.last_equity),
+            "initial_margin": float(account.initial_margin)
+        }
+        keeper.sync_account(BROKER_BOOK, float(account.cash), positions, balances)
+        for symbol in held | set(keeper.book(BROKER_BOOK)):
+            await self._sync_symbol_watch(symbol)
+
+    async def _reconcile_loop(self):
+        while True:
+            await asyncio.sleep(settings.BROKER_RECONCILE_INTERVAL)
+            await self.reconcile_broker()
+
+    async def _relay_trade_update(self, data: Dict[str, Any]):
+        asyncio.run_coroutine_threadsafe(self.handle_trade_update(data), self._loop)
+
+    async def handle_trade_update(self, data: Dict[str, Any]):
+        event = ORDER_EVENTS.get(str(data.get("event")))
+        broker_order = data.get("order") or {}
+        if event is None:
+            return
+        
+        order_data = self._find_order(broker_order.get("client_order_id")) or self._find_order(str(broker_order.get("id")))
+        if order_data is None:
+            return
+        
+        if order_data["client_order_id"] in self.unresolved_orders and broker_order.get("id"):
+            self._bind_broker_order(order_data, str(broker_order["id"]))
+        self.order_store.set_status(order_data, broker_status(broker_order.get("status")) or event)
+        order_data["filled_qty"] = float(broker_order.get("filled_qty") or 0)
+        order_data["filled_avg_price"] = float(broker_order.get("filled_avg_price") or 0)
+        order_data["updated_at"] = datetime.utcnow().isoformat()
+        if event in ("partially_filled", "filled") and data.get("qty"):
+            fill = {
+                "order_id": order_data["client_order_id"],
+                "symbol": order_data["symbol"],
+                "side": order_data["side"],
+                "qty": float(data["qty"]),
+                "price": float(data.get("price") or 0),
+                "timestamp": str(data.get("timestamp") or order_data["updated_at"])
+            }
+            seq = self.position_keeper.apply_fill(
+                order_data["user_id"], fill["symbol"], fill["side"], fill["qty"], fill["price"]
+            )
+            if self.journal:
+                self.journal.record_fill(fill, seq)
+            await self._sync_symbol_watch(fill["symbol"])
+            if order_data.get("parent_id"):
+                await self._apply_child_fill(order_data, fill["qty"], fill["price"])
+        if self.journal:
+            self.journal.record_update(order_data)
+        await self._emit_order_event(order_data, event)
+
+    async def _on_quotes(self, updates: Dict[str, Dict]):
+        exchange = self.paper_exchange
+        keeper = self.position_keeper
+        profile = self.algo_scheduler.profile
+        now = time.time()
+        for symbol, quote in updates.items():
+            profile.on_quote(symbol, quote, now)
+            if exchange.has_orders(symbol):
+                await self._apply_paper_fills(exchange.on_quote(symbol, quote))
+                await self._sync_symbol_watch(symbol)
+            if keeper.has_positions(symbol):
+                keeper.mark(symbol, quote)
+
+    async def _apply_paper_fills(self, fills: List[Dict[str, Any]]):
+        for fill in fills:
+            order_data = self.order_store.get(fill["order_id"])
+            if order_data is None:
+                continue
+            filled_qty = order_data["filled_qty"] + fill["qty"]
+            order_data["filled_avg_price"] = (
+                order_data["filled_avg_price"] * order_data["filled_qty"] + fill["price"] * fill["qty"]
+            ) / filled_qty
+            order_data["filled_qty"] = filled_qty
+            order_data["commission"] = order_data.get("commission", 0.0) + fill["commission"]
+            order_data["updated_at"] = fill["timestamp"]
+            event = "filled" if fill["remaining"] <= 0 else "partially_filled"
+            self.order_store.set_status(order_data, event)
+            seq = self.position_keeper.apply_fill(
+                order_data["user_id"], fill["symbol"], fill["side"], fill["qty"], fill["price"], fill["commission"]
+            )
+            if self.journal:
+                self.journal.record_fill(fill, seq)
+                self.journal.record_update(order_data)
+            await self._emit_order_event(order_data, event)
+            if order_data.get("parent_id"):
+                await self._apply_child_fill(order_data, fill["qty"], fill["price"], fill["commission"])
+
+    async def _submit_paper_order(self, order_data: Dict[str, Any]):
+        symbol = order_data["symbol"]
+        fills = self.paper_exchange.submit(order_data, websocket_manager.latest_quotes.get(symbol))
+        await self._apply_paper_fills(fills)
+        await self._sync_symbol_watch(symbol)
+
+    async def _cancel_paper_order(self, order_data: Dict[str, Any]) -> bool:
+        canceled = self.paper_exchange.cancel(order_data["client_order_id"])
+        await self._sync_symbol_watch(order_data["symbol"])
+        return canceled
+
+    async def _sync_symbol_watch(self, symbol: str):
+        active = (
+            self.paper_exchange.has_orders(symbol)
+            or self.position_keeper.has_positions(symbol)
+            or self.algo_scheduler.has_orders(symbol)
+        )
+        if active and symbol not in self.watched_symbols:
+            self.watched_symbols.add(symbol)
+            await websocket_manager.watch_symbols([symbol])
+        elif not active and symbol in self.watched_symbols:
+            self.watched_symbols.discard(symbol)
+            await websocket_manager.unwatch_symbols([symbol])
+
+    def _restore(self):
+        gc.disable()
+        try:
+            snapshot, records = self.journal.recover()
+            orders = {order_data["client_order_id"]: order_data for order_data in snapshot.get("orders", ())}
+            keeper = self.position_keeper
+            keeper.load(snapshot.get("positions", {}))
+            updates = {}
+            for block in records:
+                for record in block:
+                    kind = record[0]
+                    if kind == RECORD_UPDATE:
+                        updates[record[1]] = record
+                    elif kind == RECORD_FILL:
+                        order_data = orders.get(record[1])
+                        if order_data is not None and record[8] > keeper.fill_seq:
+                            keeper.apply_fill(order_data["user_id"], *record[2:7], seq=record[8], day=record[7][:10])
+                    elif kind == RECORD_ORDER:
+                        order_data = record[1]
+                        order_id = order_data["client_order_id"]
+                        update = updates.pop(order_id, None)
+                        if update is not None and order_id in orders:
+                            self._apply_update_record(orders[order_id], update)
+                        orders[order_id] = order_data
+            
+            for order_id, update in updates.items():
+                order_data = orders.get(order_id)
+                if order_data is not None:
+                    self._apply_update_record(order_data, update)
+            
+            self.order_store.load(orders.values())
+            for order_data in orders.values():
+                if order_data.get("broker") == "alpaca":
+                    self.broker_order_ids[order_data["id"]] = order_data["client_order_id"]
+        finally:
+            gc.enable()
+        gc.freeze()
+
+    def _apply_update_record(self, order_data: Dict[str, Any], record: Tuple):
+        (
+            order_data["status"],
+            order_data["filled_qty"],
+            order_data["filled_avg_price"],
+            order_data["commission"],
+            order_data["updated_at"]
+        ) = record[2:]
+
+    async def _journal_state(self) -> Dict[str, Any]:
+        positions = self.position_keeper.snapshot()
+        orders = []
+        for index, order_data in enumerate(list(self.order_store.orders.values())):
+            orders.append(dict(order_data))
+            if index % 10000 == 9999:
+                await asyncio.sleep(0)
+        return {"orders": orders, "positions": positions}
+
+    def _find_order(self, order_id: Optional[str], user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if not order_id:
+            return None
+        order_data = self.order_store.get(order_id)
+        if order_data is None and order_id in self.broker_order_ids:
+            order_data = self.order_store.get(self.broker_order_ids[order_id])
+        if order_data is None or (user_id is not None and order_data["user_id"] != user_id):
+            return None
+        return order_data
+
+    async def _emit_order_event(self, order_data: Dict[str, Any], event: str):
+        await websocket_manager.publish_to_user("orders", order_data["user_id"], {
+            "type": "order_update",
+            "event": event,
+            "order": order_data
+        })
 
     async def place_order(
         self,
@@ -53,10 +445,55 @@ class ExecutionEngine:
         take_profit: Optional[Dict] = None,
         stop_loss: Optional[Dict] = None,
         trail_price: Optional[float] = None,
-        trail_percent: Optional[float] = None
+        trail_percent: Optional[float] = None,
+        algo_params: Optional[Dict] = None
     ) -> Dict[str, Any]:
-        order_id = client_order_id or str(uuid.uuid4())
+        if order_type.lower() in ALGO_TYPES:
+            submit = partial(
+                self._submit_algo_order, user_id, symbol, qty, side, order_type, limit_price,
+                time_in_force, client_order_id or str(uuid.uuid4()), algo_params
+            )
+        else:
+            submit = partial(
+                self._submit_order, user_id, symbol, qty, side, order_type, limit_price, stop_price,
+                time_in_force, extended_hours, client_order_id or str(uuid.uuid4())
+            )
+        if client_order_id is None:
+            return await submit()
+        
+        key = (user_id, client_order_id)
+        store = self.order_store
+        if self.idempotency.get(key) is None:
+            existing = store.get(client_order_id)
+            if existing is not None and existing["user_id"] == user_id:
+                self.idempotency.stats["replayed"] += 1
+                return existing
+        # Reserve the id before the first await so a concurrent submission from another
+        # user cannot reach the broker under it or evict this user's order.
+        if not store.reserve(client_order_id, user_id):
+            raise Exception(f"client_order_id {client_order_id} is already in use")
         
+        async def reserved_submit() -> Dict[str, Any]:
+            try:
+                return await submit()
+            finally:
+                store.release(client_order_id)
+        return await self.idempotency.run(key, reserved_submit)
+
+    async def _submit_order(
+        self,
+        user_id: str,
+        symbol: str,
+        qty: float,
+        side: str,
+        order_type: str,
+        limit_price: Optional[float],
+        stop_price: Optional[float],
+        time_in_force: str,
+        extended_hours: bool,
+        order_id: str,
+        parent_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         order_data = {
             "id": order_id,
             "symbol": symbol,
@@ -71,10 +508,19 @@ class ExecutionEngine:
             "filled_avg_price": 0,
             "created_at": datetime.utcnow().isoformat(),
             "updated_at": datetime.utcnow().isoformat(),
-            "user_id": user_id
+            "user_id": user_id,
+            "client_order_id": order_id
         }
+        if parent_id:
+            order_data["parent_id"] = parent_id
         
-        if self.alpaca:
+        risk = self.check_risk(user_id, symbol, side, qty, limit_price or stop_price)
+        mark_stage("risk")
+        broker = "alpaca" if self.alpaca else "interactive_brokers" if self.ib_session else "paper"
+        if not risk["approved"]:
+            order_data["status"] = "rejected"
+            order_data["reject_reason"] = "; ".join(risk["violations"])
+        elif self.alpaca:
             try:
                 order_side = OrderSide.BUY if side.lower() == "buy" else OrderSide.SELL
                 tif = TimeInForce.DAY if time_in_force.lower() == "day" else TimeInForce.GTC
@@ -84,7 +530,8 @@ class ExecutionEngine:
                         symbol=symbol,
                         qty=qty,
                         side=order_side,
-                        time_in_force=tif
+                        time_in_force=tif,
+                        client_order_id=order_id
                     )
                 elif order_type.lower() == "limit":
                     request = LimitOrderRequest(
@@ -92,7 +539,8 @@ class ExecutionEngine:
                         qty=qty,
                         side=order_side,
                         time_in_force=tif,
-                        limit_price=limit_price
+                        limit_price=limit_price,
+                        client_order_id=order_id
                     )
                 elif order_type.lower() == "stop":
                     request = StopOrderRequest(
@@ -100,30 +548,40 @@ class ExecutionEngine:
                         qty=qty,
                         side=order_side,
                         time_in_force=tif,
-                        stop_price=stop_price
+                        stop_price=stop_price,
+                        client_order_id=order_id
                     )
                 else:
                     request = MarketOrderRequest(
                         symbol=symbol,
                         qty=qty,
                         side=order_side,
-                        time_in_force=tif
+                        time_in_force=tif,
+                        client_order_id=order_id
                     )
                 
-                alpaca_order = self.alpaca.submit_order(request)
+                mark_stage("serialize")
+                alpaca_order = await self.broker_call(self.alpaca.submit_order, request, priority=PRIORITY_ORDER)
+                mark_stage("broker")
                 
                 order_data.update({
-                    "id": alpaca_order.id,
-                    "status": alpaca_order.status.value,
+                    "id": str(alpaca_order.id),
+                    "status": broker_status(alpaca_order.status.value),
                     "broker": "alpaca"
                 })
+                self.broker_order_ids[order_data["id"]] = order_id
+            except asyncio.TimeoutError:
+                # The executor thread is not interrupted, so the order may still reach the
+                # broker; it stays pending until the broker confirms or denies it.
+                order_data["broker"] = "alpaca"
+                self.unresolved_orders.add(order_id)
             except Exception as e:
                 order_data["status"] = "rejected"
-                order_data["reject_reason"] = str(e)
+                order_data["reject_reason"] = str(e) or type(e).__name__
         
-        elif self.ib:
+        elif self.ib_session:
             try:
-                await self.connect_ib()
+                ib = await self.ib_session.get_ib()
                 contract = Stock(symbol, 'SMART', 'USD')
                 
                 if order_type.lower() == "market":
@@ -135,7 +593,11 @@ class ExecutionEngine:
                 else:
                     ib_order = MarketOrder(side.upper(), qty)
                 
-                trade = self.ib.placeOrder(contract, ib_order)
+                mark_stage("serialize")
+                await self.throttles["ib"].acquire(PRIORITY_ORDER)
+                mark_stage("throttle")
+                trade = ib.placeOrder(contract, ib_order)
+                mark_stage("broker")
                 
                 order_data.update({
                     "id": str(trade.order.orderId),
@@ -147,65 +609,311 @@ class ExecutionEngine:
                 order_data["reject_reason"] = str(e)
         
         else:
-            order_data["status"] = "filled"
-            order_data["filled_qty"] = qty
-            order_data["filled_avg_price"] = limit_price or 100.0
+            order_data["status"] = "accepted"
             order_data["broker"] = "paper"
+            order_data["commission"] = 0.0
         
-        self.orders_cache[order_id] = order_data
+        self.order_store.add(order_data)
+        if self.journal:
+            self.journal.record_order(order_data)
+        mark_stage("cache")
+        label_trace(broker, order_type.lower())
+        if order_data["status"] == "rejected":
+            await self._emit_order_event(order_data, "rejected")
+            mark_stage("publish")
+        elif order_data.get("broker") == "paper":
+            await self._emit_order_event(order_data, "accepted")
+            mark_stage("publish")
+            await self._submit_paper_order(order_data)
+            mark_stage("broker")
+        elif order_id in self.unresolved_orders:
+            task = asyncio.create_task(self._resolve_later(order_data))
+            self._resolve_tasks.add(task)
+            task.add_done_callback(self._resolve_tasks.discard)
         return order_data
 
+    async def _resolve_later(self, order_data: Dict[str, Any]):
+        await asyncio.sleep(settings.BROKER_CALL_TIMEOUT)
+        await self.resolve_order(order_data)
+
+    async def resolve_order(self, order_data: Dict[str, Any]):
+        order_id = order_data["client_order_id"]
+        if order_id not in self.unresolved_orders:
+            return
+        try:
+            order = await self.broker_call(self.alpaca.get_order_by_client_id, order_id)
+        except APIError as e:
+            if e.status_code != 404:
+                print(f"Error resolving order {order_id}: {e}")
+                return
+            order = None
+        except Exception as e:
+            print(f"Error resolving order {order_id}: {e!r}")
+            return
+        if order_id not in self.unresolved_orders:
+            return
+        
+        if order is None:
+            self.unresolved_orders.discard(order_id)
+            status = "rejected"
+            order_data["reject_reason"] = "Order was not received by the broker"
+        else:
+            self._bind_broker_order(order_data, str(order.id))
+            status = broker_status(order.status.value)
+        self.order_store.set_status(order_data, status)
+        order_data["updated_at"] = datetime.utcnow().isoformat()
+        if self.journal:
+            self.journal.record_order(order_data)
+        await self._emit_order_event(order_data, status)
+
+    def _bind_broker_order(self, order_data: Dict[str, Any], broker_id: str):
+        self.unresolved_orders.discard(order_data["client_order_id"])
+        order_data["id"] = broker_id
+        self.broker_order_ids[broker_id] = order_data["client_order_id"]
+
+    async def _submit_algo_order(
+        self,
+        user_id: str,
+        symbol: str,
+        qty: float,
+        side: str,
+        order_type: str,
+        limit_price: Optional[float],
+        time_in_force: str,
+        order_id: str,
+        algo_params: Optional[Dict]
+    ) -> Dict[str, Any]:
+        if side.lower() not in ("buy", "sell"):
+            raise Exception(f"Invalid side: {side}")
+        if qty <= 0:
+            raise Exception("Quantity must be positive")
+        risk = self.check_risk(user_id, symbol, side, qty, limit_price)
+        mark_stage("risk")
+        if not risk["approved"]:
+            raise Exception("; ".join(risk["violations"]))
+        
+        order_data = {
+            "id": order_id,
+            "symbol": symbol,
+            "qty": qty,
+            "side": side,
+            "type": order_type.lower(),
+            "limit_price": limit_price,
+            "stop_price": None,
+            "time_in_force": time_in_force,
+            "status": "accepted",
+            "filled_qty": 0,
+            "filled_avg_price": 0,
+            "commission": 0.0,
+            "created_at": datetime.utcnow().isoformat(),
+            "updated_at": datetime.utcnow().isoformat(),
+            "user_id": user_id,
+            "client_order_id": order_id,
+            "broker": "algo"
+        }
+        self.algo_scheduler.prepare(order_data, algo_params)
+        
+        self.order_store.add(order_data)
+        self.record_algo_progress(order_data)
+        mark_stage("cache")
+        label_trace("algo", order_data["type"])
+        await self._emit_order_event(order_data, "accepted")
+        self.algo_scheduler.add(order_data)
+        await self._sync_symbol_watch(symbol)
+        return order_data
+
+    def check_risk(
+        self,
+        user_id: str,
+        symbol: str,
+        side: str,
+        qty: float,
+        price: Optional[float] = None
+    ) -> Dict[str, Any]:
+        if not self.risk_gate.enabled:
+            return {"approved": True, "violations": [], "risk_score": 0.0}
+        return self.risk_gate.check(user_id, symbol, side, qty, price or self.reference_price(symbol))
+
+    def reference_price(self, symbol: str) -> Optional[float]:
+        quote = websocket_manager.latest_quotes.get(symbol)
+        return mark_price(quote) if quote else None
+
+    async def submit_child_order(self, parent: Dict[str, Any], qty: float, index: int) -> Dict[str, Any]:
+        order_id = f"{parent['client_order_id']}-{index}"
+        existing = self.order_store.get(order_id)
+        if existing is not None:
+            return existing
+        return await self._submit_order(
+            parent["user_id"],
+            parent["symbol"],
+            qty,
+            parent["side"],
+            "limit" if parent["limit_price"] else "market",
+            parent["limit_price"],
+            None,
+            parent["time_in_force"],
+            False,
+            order_id,
+            parent["client_order_id"]
+        )
+
+    def record_algo_progress(self, parent: Dict[str, Any]):
+        if self.journal:
+            self.journal.record_order({**parent, "algo": dict(parent["algo"])})
+
+    async def close_algo_order(self, parent: Dict[str, Any], status: str):
+        for child in self.algo_scheduler.remove(parent["client_order_id"]):
+            try:
+                await self.cancel_order(child["id"], child["user_id"])
+            except Exception as e:
+                print(f"Error canceling child order {child['client_order_id']}: {e}")
+        
+        if parent["filled_qty"] >= parent["qty"] - 1e-9:
+            status = "filled"
+        self.order_store.set_status(parent, status)
+        parent["updated_at"] = datetime.utcnow().isoformat()
+        if self.journal:
+            self.journal.record_update(parent)
+        await self._emit_order_event(parent, "filled" if status == "filled" else "canceled")
+        await self._sync_symbol_watch(parent["symbol"])
+
+    async def _apply_child_fill(self, child: Dict[str, Any], qty: float, price: float, commission: float = 0.0):
+        parent = self.order_store.get(child["parent_id"])
+        if parent is None:
+            return
+        
+        filled_qty = parent["filled_qty"] + qty
+        parent["filled_avg_price"] = (parent["filled_avg_price"] * parent["filled_qty"] + price * qty) / filled_qty
+        parent["filled_qty"] = filled_qty
+        parent["commission"] = parent.get("commission", 0.0) + commission
+        parent["updated_at"] = child["updated_at"]
+        if parent["status"] not in TERMINAL_STATUSES:
+            if filled_qty >= parent["qty"] - 1e-9:
+                self.algo_scheduler.remove(parent["client_order_id"])
+                event = "filled"
+            else:
+                event = "partially_filled"
+            self.order_store.set_status(parent, event)
+            await self._emit_order_event(parent, event)
+            if event == "filled":
+                await self._sync_symbol_watch(parent["symbol"])
+        if self.journal:
+            self.journal.record_update(parent)
+
+    def check_basket(self, user_id: str, legs: List[Dict[str, Any]]) -> List[Optional[str]]:
+        seen: Set[str] = set()
+        errors: List[Optional[str]] = []
+        
+        for leg in legs:
+            order_type = leg.get("order_type", "market").lower()
+            client_order_id = leg.get("client_order_id")
+            qty = leg["qty"]
+            error = None
+            
+            if leg["side"].lower() not in ("buy", "sell"):
+                error = f"Invalid side: {leg['side']}"
+            elif qty <= 0:
+                error = "Quantity must be positive"
+            elif order_type in ("limit", "stop_limit") and not leg.get("limit_price"):
+                error = f"{order_type} order requires limit_price"
+            elif order_type in ("stop", "stop_limit") and not leg.get("stop_price"):
+                error = f"{order_type} order requires stop_price"
+            elif client_order_id is not None and client_order_id in seen:
+                error = f"Duplicate client_order_id: {client_order_id}"
+            elif client_order_id is not None and self.order_store.owner(client_order_id) not in (None, user_id):
+                error = f"client_order_id {client_order_id} is already in use"
+            
+            if client_order_id is not None:
+                seen.add(client_order_id)
+            errors.append(error)
+        
+        return errors
+
+    async def place_orders(self, user_id: str, legs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        errors = self.check_basket(user_id, legs)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(legs)
+        
+        semaphore = asyncio.Semaphore(settings.BASKET_MAX_CONCURRENCY)
+        
+        async def submit(index: int, leg: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    order = await self.place_order(user_id=user_id, **leg)
+                except Exception as e:
+                    results[index] = {"index": index, "status": "error", "order": None, "error": str(e)}
+                    return
+            rejected = order["status"] == "rejected"
+            results[index] = {
+                "index": index,
+                "status": "rejected" if rejected else "submitted",
+                "order": order,
+                "error": order.get("reject_reason") if rejected else None
+            }
+        
+        tasks = []
+        for index, (leg, error) in enumerate(zip(legs, errors)):
+            if error is not None:
+                results[index] = {"index": index, "status": "rejected", "order": None, "error": error}
+            else:
+                tasks.append(submit(index, leg))
+        await asyncio.gather(*tasks)
+        return results
+
     async def get_orders(
         self,
         user_id: str,
         status: Optional[str] = None,
-        limit: int = 100
+        limit: int = 100,
+        before: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        if self.alpaca:
-            try:
-                alpaca_orders = self.alpaca.get_orders()
-                return [
-                    {
-                        "id": order.id,
-                        "symbol": order.symbol,
-                        "qty": float(order.qty),
-                        "side": order.side.value,
-                        "type": order.order_type.value,
-                        "status": order.status.value,
-                        "filled_qty": float(order.filled_qty or 0),
-                        "filled_avg_price": float(order.filled_avg_price or 0),
-                        "limit_price": float(order.limit_price) if order.limit_price else None,
-                        "stop_price": float(order.stop_price) if order.stop_price else None,
-                        "created_at": order.created_at.isoformat(),
-                        "updated_at": order.updated_at.isoformat() if order.updated_at else None
-                    }
-                    for order in alpaca_orders[:limit]
-                ]
-            except Exception as e:
-                print(f"Error fetching orders: {e}")
+        store = self.order_store
+        cursor = None
+        if before is not None:
+            cursor = self._find_order(before, user_id)
+            if cursor is None:
+                return []
+            before = cursor["client_order_id"]
+        orders = store.list_orders(user_id, status=status, limit=limit, before=before)
+        if not self.alpaca:
+            return orders
         
-        return [order for order in self.orders_cache.values() if order["user_id"] == user_id][:limit]
+        # Broker state is authoritative for orders the stream may have missed, but only
+        # orders this user owns in the store are listed; the broker account is shared.
+        try:
+            request = GetOrdersRequest(
+                status=QueryOrderStatus.ALL,
+                limit=min(limit, 500),
+                until=cursor["created_at"] if cursor else None,
+                direction="desc"
+            )
+            broker_orders = await self.broker_call(self.alpaca.get_orders, request)
+        except Exception as e:
+            print(f"Error fetching orders: {e}")
+            return orders
+        
+        merged = {order_data["client_order_id"]: order_data for order_data in orders}
+        for order in broker_orders:
+            order_data = self._find_order(order.client_order_id, user_id)
+            if order_data is None:
+                continue
+            merged[order_data["client_order_id"]] = {
+                **order_data,
+                "status": broker_status(order.status.value),
+                "filled_qty": float(order.filled_qty or 0),
+                "filled_avg_price": float(order.filled_avg_price or 0)
+            }
+        
+        key = (cursor["created_at"], cursor["client_order_id"]) if cursor else None
+        orders = [
+            order_data for order_data in merged.values()
+            if (status is None or order_data["status"] == status)
+            and (key is None or (order_data["created_at"], order_data["client_order_id"]) < key)
+        ]
+        orders.sort(key=lambda order_data: (order_data["created_at"], order_data["client_order_id"]), reverse=True)
+        return orders[:limit]
 
     async def get_order(self, order_id: str, user_id: str) -> Optional[Dict[str, Any]]:
-        if self.alpaca:
-            try:
-                order = self.alpaca.get_order_by_id(order_id)
-                return {
-                    "id": order.id,
-                    "symbol": order.symbol,
-                    "qty": float(order.qty),
-                    "side": order.side.value,
-                    "type": order.order_type.value,
-                    "status": order.status.value,
-                    "filled_qty": float(order.filled_qty or 0),
-                    "filled_avg_price": float(order.filled_avg_price or 0),
-                    "limit_price": float(order.limit_price) if order.limit_price else None,
-                    "created_at": order.created_at.isoformat()
-                }
-            except Exception:
-                pass
-        
-        return self.orders_cache.get(order_id)
+        return self._find_order(order_id, user_id)
 
     async def update_order(
         self,
@@ -216,6 +924,10 @@ class ExecutionEngine:
         stop_price: Optional[float] = None,
         trail: Optional[float] = None
     ) -> Dict[str, Any]:
+        order_data = self._find_order(order_id, user_id)
+        if order_data is not None and order_data.get("broker") == "algo":
+            raise Exception("Algo orders cannot be modified")
+        
         if self.alpaca:
             try:
                 from alpaca.trading.requests import ReplaceOrderRequest
@@ -223,7 +935,7 @@ class ExecutionEngine:
                     qty=qty,
                     limit_price=limit_price
                 )
-                order = self.alpaca.replace_order_by_id(order_id, request)
+                order = await self.broker_call(self.alpaca.replace_order_by_id, order_id, request, priority=PRIORITY_ORDER)
                 return {
                     "id": order.id,
                     "status": order.status.value,
@@ -232,95 +944,92 @@ class ExecutionEngine:
             except Exception as e:
                 raise Exception(f"Failed to update order: {e}")
         
-        if order_id in self.orders_cache:
+        if order_data is not None:
+            resting = order_data.get("broker") == "paper" and await self._cancel_paper_order(order_data)
             if qty:
-                self.orders_cache[order_id]["qty"] = qty
+                order_data["qty"] = qty
             if limit_price:
-                self.orders_cache[order_id]["limit_price"] = limit_price
-            return self.orders_cache[order_id]
+                order_data["limit_price"] = limit_price
+            if stop_price:
+                order_data["stop_price"] = stop_price
+            order_data["updated_at"] = datetime.utcnow().isoformat()
+            if self.journal:
+                self.journal.record_order(order_data)
+            if resting:
+                await self._submit_paper_order(order_data)
+            return order_data
         
         raise Exception("Order not found")
 
     async def cancel_order(self, order_id: str, user_id: str):
+        order_data = self._find_order(order_id, user_id)
+        if order_data is not None and order_data.get("broker") == "algo":
+            if order_data["status"] not in TERMINAL_STATUSES:
+                await self.close_algo_order(order_data, "canceled")
+            return
+        
         if self.alpaca:
             try:
-                self.alpaca.cancel_order_by_id(order_id)
+                await self.broker_call(self.alpaca.cancel_order_by_id, order_id, priority=PRIORITY_CANCEL)
             except Exception as e:
                 raise Exception(f"Failed to cancel order: {e}")
         
-        if order_id in self.orders_cache:
-            self.orders_cache[order_id]["status"] = "canceled"
+        if order_data and order_data["status"] not in TERMINAL_STATUSES:
+            if order_data.get("broker") == "paper":
+                await self._cancel_paper_order(order_data)
+            self.order_store.set_status(order_data, "canceled")
+            order_data["updated_at"] = datetime.utcnow().isoformat()
+            if self.journal:
+                self.journal.record_update(order_data)
+            if not self.alpaca:
+                await self._emit_order_event(order_data, "canceled")
 
     async def cancel_all_orders(self, user_id: str):
         if self.alpaca:
             try:
-                self.alpaca.cancel_orders()
+                await self.broker_call(self.alpaca.cancel_orders, priority=PRIORITY_CANCEL)
             except Exception as e:
                 raise Exception(f"Failed to cancel orders: {e}")
         
-        for order_id in self.orders_cache:
-            if self.orders_cache[order_id]["user_id"] == user_id:
-                self.orders_cache[order_id]["status"] = "canceled"
+        open_orders = sorted(self.order_store.open_orders(user_id), key=lambda order: order.get("broker") != "algo")
+        for order_data in open_orders:
+            if order_data["status"] in TERMINAL_STATUSES:
+                continue
+            if order_data.get("broker") == "algo":
+                await self.close_algo_order(order_data, "canceled")
+                continue
+            if order_data.get("broker") == "paper":
+                await self._cancel_paper_order(order_data)
+            self.order_store.set_status(order_data, "canceled")
+            order_data["updated_at"] = datetime.utcnow().isoformat()
+            if self.journal:
+                self.journal.record_update(order_data)
+            if not self.alpaca:
+                await self._emit_order_event(order_data, "canceled")
 
     async def get_positions(self, user_id: str) -> List[Dict[str, Any]]:
-        if self.alpaca:
-            try:
-                positions = self.alpaca.get_all_positions()
-                return [
-                    {
-                        "symbol": pos.symbol,
-                        "qty": float(pos.qty),
-                        "side": "long" if float(pos.qty) > 0 else "short",
-                        "avg_entry_price": float(pos.avg_entry_price),
-                        "market_value": float(pos.market_value),
-                        "cost_basis": float(pos.cost_basis),
-                        "unrealized_pl": float(pos.unrealized_pl),
-                        "unrealized_plpc": float(pos.unrealized_plpc),
-                        "current_price": float(pos.current_price)
-                    }
-                    for pos in positions
-                ]
-            except Exception as e:
-                print(f"Error fetching positions: {e}")
-        
-        return list(self.positions_cache.values())
+        return self.position_keeper.get_positions(user_id)
 
     async def get_position(self, symbol: str, user_id: str) -> Optional[Dict[str, Any]]:
-        if self.alpaca:
-            try:
-                pos = self.alpaca.get_open_position(symbol)
-                return {
-                    "symbol": pos.symbol,
-                    "qty": float(pos.qty),
-                    "side": "long" if float(pos.qty) > 0 else "short",
-                    "avg_entry_price": float(pos.avg_entry_price),
-                    "market_value": float(pos.market_value),
-                    "unrealized_pl": float(pos.unrealized_pl),
-                    "current_price": float(pos.current_price)
-                }
-            except Exception:
-                pass
-        
-        return self.positions_cache.get(symbol)
+        return self.position_keeper.get_position(user_id, symbol)
 
     async def close_position(self, symbol: str, user_id: str, qty: Optional[float] = None):
-        if self.alpaca:
-            try:
-                if qty:
-                    self.alpaca.close_position(symbol, close_options={"qty": str(qty)})
-                else:
-                    self.alpaca.close_position(symbol)
-            except Exception as e:
-                raise Exception(f"Failed to close position: {e}")
+        position = self.position_keeper.get_position(user_id, symbol)
+        if position is None:
+            raise Exception(f"No open position in {symbol}")
         
-        if symbol in self.positions_cache:
-            del self.positions_cache[symbol]
+        close_qty = min(qty, abs(position["qty"])) if qty else abs(position["qty"])
+        order_data = await self.place_order(
+            user_id=user_id,
+            symbol=symbol,
+            qty=close_qty,
+            side="sell" if position["qty"] > 0 else "buy"
+        )
+        if order_data["status"] == "rejected":
+            raise Exception(f"Failed to close position: {order_data.get('reject_reason')}")
 
     async def close_all_positions(self, user_id: str):
-        if self.alpaca:
-            try:
-                self.alpaca.close_all_positions()
-            except Exception as e:
-                raise Exception(f"Failed to close positions: {e}")
-        
-        self.positions_cache.clear()
+        for position in self.position_keeper.get_positions(user_id):
+            await self.close_position(position["symbol"], user_id)
+
+execution_engine = ExecutionEngine()
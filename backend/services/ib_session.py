@@ -0,0 +1,204 @@
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Set
+from collections import deque
+import asyncio
+import time
+from ib_insync import IB, Contract, Ticker
+from backend.core.config import settings
+
+class ClientIdPool:
+    def __init__(self, client_ids: List[int]):
+        self.free: Deque[int] = deque(client_ids)
+        self.leased: Set[int] = set()
+
+    def acquire(self) -> int:
+        if not self.free:
+            raise Exception("No IB client ids available")
+        client_id = self.free.popleft()
+        self.leased.add(client_id)
+        return client_id
+
+    def release(self, client_id: int):
+        if client_id in self.leased:
+            self.leased.discard(client_id)
+            self.free.append(client_id)
+
+client_id_pool = ClientIdPool(list(range(
+    settings.IB_CLIENT_ID,
+    settings.IB_CLIENT_ID + settings.IB_CLIENT_ID_POOL_SIZE
+)))
+
+class IBSession:
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        pool: Optional[ClientIdPool] = None,
+        ib_factory: Callable[[], Any] = IB,
+        readonly: bool = False
+    ):
+        self.host = host or settings.IB_HOST
+        self.port = port or settings.IB_PORT
+        self.pool = pool or client_id_pool
+        self.ib_factory = ib_factory
+        self.readonly = readonly
+        self.ib: Optional[Any] = None
+        self.client_id: Optional[int] = None
+        self.market_data: Dict[Hashable, Dict[str, Any]] = {}
+        self._connected = asyncio.Event()
+        self._lost = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {
+            "connects": 0,
+            "connect_failures": 0,
+            "disconnects": 0,
+            "heartbeat_failures": 0,
+            "heartbeat_rtt_ms": None,
+            "connected_since": None,
+        }
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._teardown()
+
+    async def get_ib(self, timeout: Optional[float] = None) -> Any:
+        if not self._connected.is_set():
+            try:
+                await asyncio.wait_for(self._connected.wait(), timeout or settings.IB_CONNECT_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise Exception(f"IB session to {self.host}:{self.port} is not connected")
+        return self.ib
+
+    async def subscribe_market_data(self, contract: Contract) -> Ticker:
+        ib = await self.get_ib()
+        key = self._contract_key(contract)
+        entry = self.market_data.get(key)
+        if entry is None:
+            entry = self.market_data[key] = {"contract": contract, "refs": 0}
+        entry["refs"] += 1
+        if entry["refs"] == 1:
+            return ib.reqMktData(contract, "", False, False)
+        return ib.ticker(entry["contract"])
+
+    async def unsubscribe_market_data(self, contract: Contract):
+        key = self._contract_key(contract)
+        entry = self.market_data.get(key)
+        if entry is None:
+            return
+        entry["refs"] -= 1
+        if entry["refs"] > 0:
+            return
+        del self.market_data[key]
+        if self.connected:
+            self.ib.cancelMktData(entry["contract"])
+
+    def get_ticker(self, contract: Contract) -> Optional[Ticker]:
+        entry = self.market_data.get(self._contract_key(contract))
+        if entry is None or not self.connected:
+            return None
+        return self.ib.ticker(entry["contract"])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "host": self.host,
+            "port": self.port,
+            "connected": self.connected,
+            "client_id": self.client_id,
+            "market_data_subscriptions": len(self.market_data),
+            **self.stats
+        }
+
+    async def _supervise(self):
+        delay = settings.IB_RECONNECT_MIN_DELAY
+        while True:
+            try:
+                await self._connect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["connect_failures"] += 1
+                print(f"IB connection to {self.host}:{self.port} failed (clientId={self.client_id}): {e}")
+                self._teardown()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, settings.IB_RECONNECT_MAX_DELAY)
+                continue
+
+            delay = settings.IB_RECONNECT_MIN_DELAY
+            await self._heartbeat_until_lost()
+            self.stats["disconnects"] += 1
+            print(f"IB session to {self.host}:{self.port} lost, reconnecting")
+            self._teardown()
+
+    async def _connect(self):
+        self.client_id = self.pool.acquire()
+        self.ib = self.ib_factory()
+        self._lost.clear()
+        self.ib.disconnectedEvent += self._on_disconnected
+        await self.ib.connectAsync(
+            self.host,
+            self.port,
+            clientId=self.client_id,
+            timeout=settings.IB_CONNECT_TIMEOUT,
+            readonly=self.readonly
+        )
+        for entry in self.market_data.values():
+            self.ib.reqMktData(entry["contract"], "", False, False)
+        self.stats["connects"] += 1
+        self.stats["connected_since"] = time.time()
+        self._connected.set()
+
+    async def _heartbeat_until_lost(self):
+        while not self._lost.is_set():
+            try:
+                await asyncio.wait_for(self._lost.wait(), settings.IB_HEARTBEAT_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                pass
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self.ib.reqCurrentTimeAsync(), settings.IB_HEARTBEAT_TIMEOUT)
+                self.stats["heartbeat_rtt_ms"] = (time.monotonic() - started) * 1000
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats["heartbeat_failures"] += 1
+                return
+
+    def _on_disconnected(self):
+        self._connected.clear()
+        self._lost.set()
+
+    def _teardown(self):
+        self._connected.clear()
+        self.stats["connected_since"] = None
+        if self.ib is not None:
+            self.ib.disconnectedEvent -= self._on_disconnected
+            try:
+                self.ib.disconnect()
+            except Exception:
+                pass
+            self.ib = None
+        if self.client_id is not None:
+            self.pool.release(self.client_id)
+            self.client_id = None
+
+    def _contract_key(self, contract: Contract) -> Hashable:
+        if contract.conId:
+            return contract.conId
+        return (contract.secType, contract.symbol, contract.exchange, contract.currency,
+                contract.lastTradeDateOrContractMonth, contract.strike, contract.right)
+
+ib_session = IBSession()
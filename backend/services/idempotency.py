@@ -0,0 +1,49 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import time
+from backend.core.config import settings
+
+class IdempotencyIndex:
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = settings.IDEMPOTENCY_TTL if ttl is None else ttl
+        self.entries: "OrderedDict[Hashable, Tuple[float, asyncio.Future]]" = OrderedDict()
+        self.stats: Dict[str, int] = {"submitted": 0, "replayed": 0, "coalesced": 0, "evicted": 0}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Optional[asyncio.Future]:
+        self._evict(time.monotonic())
+        entry = self.entries.get(key)
+        return entry[1] if entry else None
+
+    async def run(self, key: Hashable, submit: Callable[[], Awaitable[Any]]) -> Any:
+        future = self.get(key)
+        if future is not None:
+            self.stats["coalesced" if not future.done() else "replayed"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(submit())
+        self.entries[key] = (time.monotonic() + self.ttl, future)
+        future.add_done_callback(lambda done: self._discard_failed(key, done))
+        self.stats["submitted"] += 1
+        return await asyncio.shield(future)
+
+    def _discard_failed(self, key: Hashable, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] is future:
+                del self.entries[key]
+
+    def _evict(self, now: float):
+        entries = self.entries
+        while entries:
+            key, (expires, future) = next(iter(entries.items()))
+            if expires > now or not future.done():
+                return
+            entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"entries": len(self.entries), "ttl": self.ttl, **self.stats}
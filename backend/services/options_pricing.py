@@ -0,0 +1,197 @@
+from typing import Dict, Optional, Tuple
+from datetime import date, datetime, time as clock
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+import math
+import numpy as np
+from scipy.special import ndtr
+
+CONTRACT_MULTIPLIER = 100
+GREEK_NAMES = ("delta", "gamma", "theta", "vega", "rho")
+MIN_VOLATILITY = 1e-4
+MAX_VOLATILITY = 5.0
+SECONDS_PER_YEAR = 365 * 86400
+MIN_YEARS = 60 / SECONDS_PER_YEAR
+PRICE_TOLERANCE = 1e-9
+MARKET_TZ = ZoneInfo("America/New_York")
+INV_SQRT_2PI = 1 / math.sqrt(2 * math.pi)
+
+@lru_cache(maxsize=65536)
+def parse_option_symbol(symbol: str) -> Optional[Tuple[str, date, bool, float]]:
+    body = symbol[2:] if symbol.startswith("O:") else symbol
+    if len(body) < 16:
+        return None
+    root, expiry, kind, strike = body[:-15], body[-15:-9], body[-9], body[-8:]
+    if kind not in ("C", "P") or not expiry.isdigit() or not strike.isdigit() or not root.isalnum():
+        return None
+    try:
+        expires = datetime.strptime(expiry, "%y%m%d").date()
+    except ValueError:
+        return None
+    return root, expires, kind == "C", int(strike) / 1000
+
+def years_to_expiry(expiry: date, now: Optional[datetime] = None) -> float:
+    close = datetime.combine(expiry, clock(16), MARKET_TZ)
+    now = now or datetime.now(MARKET_TZ)
+    return max((close - now).total_seconds() / SECONDS_PER_YEAR, MIN_YEARS)
+
+def black_scholes(
+    spot: np.ndarray,
+    strike: np.ndarray,
+    years: np.ndarray,
+    volatility: np.ndarray,
+    is_call: np.ndarray,
+    rate: float = 0.0,
+    dividend: float = 0.0
+) -> Dict[str, np.ndarray]:
+    spot, strike, years, volatility, is_call = np.broadcast_arrays(
+        np.asarray(spot, dtype=np.float64),
+        np.asarray(strike, dtype=np.float64),
+        np.maximum(np.asarray(years, dtype=np.float64), MIN_YEARS),
+        np.maximum(np.asarray(volatility, dtype=np.float64), MIN_VOLATILITY),
+        np.asarray(is_call, dtype=bool)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sign = np.where(is_call, 1.0, -1.0)
+        sqrt_t = np.sqrt(years)
+        sigma_t = volatility * sqrt_t
+        discount = np.exp(-rate * years)
+        carry = np.exp(-dividend * years)
+        d1 = (np.log(spot / strike) + (rate - dividend + 0.5 * volatility * volatility) * years) / sigma_t
+        d2 = d1 - sigma_t
+        nd1 = ndtr(sign * d1)
+        nd2 = ndtr(sign * d2)
+        pdf = np.exp(-0.5 * d1 * d1) * INV_SQRT_2PI
+        spot_carry = spot * carry
+        strike_discount = strike * discount
+
+        theta = (
+            -spot_carry * pdf * volatility / (2 * sqrt_t)
+            - sign * rate * strike_discount * nd2
+            + sign * dividend * spot_carry * nd1
+        )
+        return {
+            "price": sign * (spot_carry * nd1 - strike_discount * nd2),
+            "delta": sign * carry * nd1,
+            "gamma": carry * pdf / (spot * sigma_t),
+            "theta": theta / 365,
+            "vega": spot_carry * pdf * sqrt_t / 100,
+            "rho": sign * strike_discount * years * nd2 / 100
+        }
+
+def option_price(
+    spot: np.ndarray,
+    strike: np.ndarray,
+    years: np.ndarray,
+    volatility: np.ndarray,
+    is_call: np.ndarray,
+    rate: float = 0.0,
+    dividend: float = 0.0
+) -> np.ndarray:
+    years = np.maximum(np.asarray(years, dtype=np.float64), MIN_YEARS)
+    sign = np.where(is_call, 1.0, -1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _price_and_d1(
+            np.asarray(spot, dtype=np.float64) * np.exp(-dividend * years),
+            np.asarray(strike, dtype=np.float64) * np.exp(-rate * years),
+            np.sqrt(years),
+            np.maximum(np.asarray(volatility, dtype=np.float64), MIN_VOLATILITY),
+            sign
+        )[0]
+
+def implied_volatility(
+    price: np.ndarray,
+    spot: np.ndarray,
+    strike: np.ndarray,
+    years: np.ndarray,
+    is_call: np.ndarray,
+    rate: float = 0.0,
+    dividend: float = 0.0,
+    tolerance: float = 1e-6,
+    max_iterations: int = 20
+) -> np.ndarray:
+    price, spot, strike, years, is_call = (
+        np.ravel(array) for array in np.broadcast_arrays(
+            np.asarray(price, dtype=np.float64),
+            np.asarray(spot, dtype=np.float64),
+            np.asarray(strike, dtype=np.float64),
+            np.maximum(np.asarray(years, dtype=np.float64), MIN_YEARS),
+            np.asarray(is_call, dtype=bool)
+        )
+    )
+    result = np.full(price.shape, np.nan)
+    spot_carry = spot * np.exp(-dividend * years)
+    strike_discount = strike * np.exp(-rate * years)
+    lower = np.maximum(np.where(is_call, spot_carry - strike_discount, strike_discount - spot_carry), 0.0)
+    upper = np.where(is_call, spot_carry, strike_discount)
+    with np.errstate(invalid="ignore"):
+        valid = (price > lower) & (price < upper) & (spot > 0) & (strike > 0)
+
+    sign = np.where(is_call, 1.0, -1.0)
+    sqrt_t = np.sqrt(years)
+    active = np.flatnonzero(valid)
+    moneyness = np.abs(np.log(spot_carry[active] / strike_discount[active])) / years[active]
+    volatility = np.clip(np.sqrt(2 * moneyness), 0.05, MAX_VOLATILITY)
+    low = np.full(active.shape, MIN_VOLATILITY)
+    high = np.full(active.shape, MAX_VOLATILITY)
+    for _ in range(max_iterations):
+        if not active.size:
+            break
+        model, d1 = _price_and_d1(
+            spot_carry[active], strike_discount[active], sqrt_t[active], volatility, sign[active]
+        )
+        vega = spot_carry[active] * np.exp(-0.5 * d1 * d1) * INV_SQRT_2PI * sqrt_t[active]
+        diff = model - price[active]
+        above = diff > 0
+        high = np.where(above, volatility, high)
+        low = np.where(above, low, volatility)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            step = diff / vega
+        stepped = volatility - step
+        stepped = np.where((stepped > low) & (stepped < high), stepped, 0.5 * (low + high))
+        exact = np.abs(diff) < PRICE_TOLERANCE
+        converged = exact | (np.abs(step) < tolerance)
+        result[active[converged]] = np.where(exact, volatility, stepped)[converged]
+
+        keep = ~converged
+        active = active[keep]
+        volatility = stepped[keep]
+        low = low[keep]
+        high = high[keep]
+
+    if active.size:
+        result[active] = _bisect(
+            price[active], spot_carry[active], strike_discount[active], sqrt_t[active], sign[active],
+            low, high, tolerance
+        )
+    return result
+
+def _price_and_d1(
+    spot_carry: np.ndarray,
+    strike_discount: np.ndarray,
+    sqrt_t: np.ndarray,
+    volatility: np.ndarray,
+    sign: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    sigma_t = volatility * sqrt_t
+    d1 = np.log(spot_carry / strike_discount) / sigma_t + 0.5 * sigma_t
+    price = sign * (spot_carry * ndtr(sign * d1) - strike_discount * ndtr(sign * (d1 - sigma_t)))
+    return price, d1
+
+def _bisect(
+    price: np.ndarray,
+    spot_carry: np.ndarray,
+    strike_discount: np.ndarray,
+    sqrt_t: np.ndarray,
+    sign: np.ndarray,
+    low: np.ndarray,
+    high: np.ndarray,
+    tolerance: float
+) -> np.ndarray:
+    iterations = math.ceil(math.log2(max(float((high - low).max()), tolerance) / tolerance))
+    for _ in range(iterations):
+        middle = 0.5 * (low + high)
+        above = _price_and_d1(spot_carry, strike_discount, sqrt_t, middle, sign)[0] > price
+        high = np.where(above, middle, high)
+        low = np.where(above, low, middle)
+    return 0.5 * (low + high)
@@ -0,0 +1,250 @@
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from pathlib import Path
+import asyncio
+import fcntl
+import os
+import struct
+import time
+import zlib
+import msgpack
+from backend.core.config import settings
+
+RECORD_ORDER = 0
+RECORD_UPDATE = 1
+RECORD_FILL = 2
+
+BLOCK_HEADER = struct.Struct("<II")
+SEGMENT_PREFIX = "segment-"
+SNAPSHOT_PREFIX = "snapshot-"
+WRITER_PREFIX = "writer-"
+LOCK_FILE = "writer.lock"
+
+StateProvider = Callable[[], Awaitable[Dict[str, Any]]]
+
+class OrderJournal:
+    def __init__(self, path: Optional[Path] = None):
+        self.root = Path(path or settings.JOURNAL_PATH)
+        self.path = self.root
+        self.max_writers = settings.JOURNAL_MAX_WRITERS
+        self.flush_interval = settings.JOURNAL_FLUSH_INTERVAL_MS / 1000
+        self.snapshot_interval = settings.JOURNAL_SNAPSHOT_INTERVAL
+        self.fsync = settings.JOURNAL_FSYNC
+        self.segment_index = 0
+        self._file = None
+        self._lock_file = None
+        self._pending: List[Tuple] = []
+        self._since_snapshot = 0
+        self._packer = msgpack.Packer(use_bin_type=True)
+        self._state_provider: Optional[StateProvider] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.stats: Dict[str, float] = {
+            "records": 0,
+            "blocks": 0,
+            "bytes": 0,
+            "snapshots": 0,
+            "last_flush_ms": 0.0,
+            "recovered_records": 0,
+            "recovery_ms": 0.0,
+        }
+
+    def record_order(self, order: Dict[str, Any]):
+        self._pending.append((RECORD_ORDER, dict(order)))
+
+    def record_update(self, order: Dict[str, Any]):
+        self._pending.append((
+            RECORD_UPDATE,
+            order["client_order_id"],
+            order["status"],
+            order["filled_qty"],
+            order["filled_avg_price"],
+            order.get("commission", 0.0),
+            order["updated_at"]
+        ))
+
+    def record_fill(self, fill: Dict[str, Any], seq: int):
+        self._pending.append((
+            RECORD_FILL,
+            fill["order_id"],
+            fill["symbol"],
+            fill["side"],
+            fill["qty"],
+            fill["price"],
+            fill.get("commission", 0.0),
+            fill["timestamp"],
+            seq
+        ))
+
+    def recover(self) -> Tuple[Dict[str, Any], Iterator[List[Tuple]]]:
+        started = time.perf_counter()
+        self._acquire()
+        snapshot: Dict[str, Any] = {}
+        first_segment = 0
+        for index in sorted(self._indexes(SNAPSHOT_PREFIX), reverse=True):
+            try:
+                with open(self._file_path(SNAPSHOT_PREFIX, index), "rb") as f:
+                    snapshot = msgpack.unpackb(f.read(), raw=False)
+                first_segment = index
+                break
+            except Exception as e:
+                print(f"Skipping unreadable journal snapshot {index}: {e}")
+
+        segments = [index for index in sorted(self._indexes(SEGMENT_PREFIX)) if index >= first_segment]
+        self.segment_index = max(segments + [first_segment - 1, 0]) + 1
+        return snapshot, self._replay(segments, started)
+
+    async def start(self, state_provider: StateProvider):
+        self._state_provider = state_provider
+        self._acquire()
+        self._open_segment()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending or self._file is None:
+                return
+            records, self._pending = self._pending, []
+            pack = self._packer.pack
+            payload = b"".join([pack(record) for record in records])
+            block = BLOCK_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+            started = time.perf_counter()
+            await asyncio.to_thread(self._write, self._file, block)
+            self.stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+            self.stats["records"] += len(records)
+            self.stats["blocks"] += 1
+            self.stats["bytes"] += len(block)
+            self._since_snapshot += len(records)
+
+    async def snapshot(self):
+        if self._state_provider is None:
+            return
+        await self.flush()
+        async with self._lock:
+            previous = self._file
+            self.segment_index += 1
+            self._open_segment()
+            await asyncio.to_thread(previous.close)
+            self._since_snapshot = 0
+
+        index = self.segment_index
+        state = await self._state_provider()
+        await asyncio.to_thread(self._write_snapshot, index, state)
+        self.stats["snapshots"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "locked": self._lock_file is not None,
+            "segment": self.segment_index,
+            "pending": len(self._pending),
+            "since_snapshot": self._since_snapshot,
+            **self.stats
+        }
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if self._since_snapshot >= self.snapshot_interval:
+                    await self.snapshot()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Order journal flush failed: {e}")
+
+    def _write(self, f, block: bytes):
+        f.write(block)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def _write_snapshot(self, index: int, state: Dict[str, Any]):
+        target = self._file_path(SNAPSHOT_PREFIX, index)
+        tmp = target.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(msgpack.packb(state, use_bin_type=True))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+
+        for old in self._indexes(SNAPSHOT_PREFIX):
+            if old < index:
+                self._file_path(SNAPSHOT_PREFIX, old).unlink(missing_ok=True)
+        for old in self._indexes(SEGMENT_PREFIX):
+            if old < index:
+                self._file_path(SEGMENT_PREFIX, old).unlink(missing_ok=True)
+
+    def _replay(self, segments: List[int], started: float) -> Iterator[List[Tuple]]:
+        count = 0
+        for index in segments:
+            with open(self._file_path(SEGMENT_PREFIX, index), "rb") as f:
+                data = f.read()
+            offset = 0
+            end = len(data)
+            while offset + BLOCK_HEADER.size <= end:
+                length, checksum = BLOCK_HEADER.unpack_from(data, offset)
+                start = offset + BLOCK_HEADER.size
+                payload = data[start:start + length]
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    print(f"Journal segment {index} truncated at offset {offset}")
+                    break
+                unpacker = msgpack.Unpacker(raw=False, use_list=False)
+                unpacker.feed(payload)
+                records = list(unpacker)
+                count += len(records)
+                yield records
+                offset = start + length
+        self.stats["recovered_records"] = count
+        self.stats["recovery_ms"] = (time.perf_counter() - started) * 1000
+
+    def _acquire(self):
+        if self._lock_file is not None:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        for slot in range(self.max_writers):
+            path = self.root / f"{WRITER_PREFIX}{slot}"
+            path.mkdir(exist_ok=True)
+            lock_file = open(path / LOCK_FILE, "ab")
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            self.path = path
+            self._lock_file = lock_file
+            return
+        raise Exception(f"All {self.max_writers} journal writer slots under {self.root} are in use")
+
+    def _open_segment(self):
+        self._file = open(self._file_path(SEGMENT_PREFIX, self.segment_index), "ab")
+
+    def _indexes(self, prefix: str) -> List[int]:
+        indexes = []
+        for entry in self.path.glob(f"{prefix}*"):
+            if entry.suffix in (".log", ".msgpack"):
+                try:
+                    indexes.append(int(entry.stem[len(prefix):]))
+                except ValueError:
+                    pass
+        return indexes
+
+    def _file_path(self, prefix: str, index: int) -> Path:
+        suffix = ".log" if prefix == SEGMENT_PREFIX else ".msgpack"
+        return self.path / f"{prefix}{index:08d}{suffix}"
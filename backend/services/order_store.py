@@ -0,0 +1,183 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from bisect import bisect_left, insort
+
+TERMINAL_STATUSES = {"filled", "canceled", "expired", "rejected", "replaced", "done_for_day"}
+
+class OrderStore:
+    def __init__(self):
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self._seq_by_id: Dict[str, int] = {}
+        self._id_by_seq: Dict[int, str] = {}
+        self._next_seq = 0
+        self._by_user: Dict[str, List[int]] = {}
+        self._by_user_status: Dict[Tuple[str, str], List[int]] = {}
+        self._by_symbol_status: Dict[Tuple[str, str], List[int]] = {}
+        self._user_statuses: Dict[str, Set[str]] = {}
+        self._reserved: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self.orders
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        return self.orders.get(order_id)
+
+    def owner(self, order_id: str) -> Optional[str]:
+        order = self.orders.get(order_id)
+        return order["user_id"] if order is not None else self._reserved.get(order_id)
+
+    def reserve(self, order_id: str, user_id: str) -> bool:
+        owner = self.owner(order_id)
+        if owner is not None:
+            return owner == user_id
+        self._reserved[order_id] = user_id
+        return True
+
+    def release(self, order_id: str):
+        self._reserved.pop(order_id, None)
+
+    def add(self, order: Dict[str, Any]):
+        order_id = order["client_order_id"]
+        owner = self.owner(order_id)
+        if owner is not None and owner != order["user_id"]:
+            raise Exception(f"client_order_id {order_id} is already in use")
+        self._reserved.pop(order_id, None)
+        if order_id in self.orders:
+            self.remove(order_id)
+
+        seq = self._next_seq
+        self._next_seq += 1
+        self.orders[order_id] = order
+        self._seq_by_id[order_id] = seq
+        self._id_by_seq[seq] = order_id
+
+        user_id = order["user_id"]
+        status = order["status"]
+        self._by_user.setdefault(user_id, []).append(seq)
+        self._by_user_status.setdefault((user_id, status), []).append(seq)
+        self._by_symbol_status.setdefault((order["symbol"], status), []).append(seq)
+        self._user_statuses.setdefault(user_id, set()).add(status)
+
+    def load(self, orders: Iterable[Dict[str, Any]]):
+        self_orders = self.orders
+        seq_by_id = self._seq_by_id
+        id_by_seq = self._id_by_seq
+        by_user = self._by_user
+        by_user_status = self._by_user_status
+        by_symbol_status = self._by_symbol_status
+        user_statuses = self._user_statuses
+        seq = self._next_seq
+
+        for order in orders:
+            order_id = order["client_order_id"]
+            if order_id in self_orders:
+                self.remove(order_id)
+            self_orders[order_id] = order
+            seq_by_id[order_id] = seq
+            id_by_seq[seq] = order_id
+            user_id = order["user_id"]
+            status = order["status"]
+            user_seqs = by_user.get(user_id)
+            if user_seqs is None:
+                user_seqs = by_user[user_id] = []
+                user_statuses[user_id] = set()
+            user_seqs.append(seq)
+            key = (user_id, status)
+            seqs = by_user_status.get(key)
+            if seqs is None:
+                seqs = by_user_status[key] = []
+                user_statuses[user_id].add(status)
+            seqs.append(seq)
+            key = (order["symbol"], status)
+            seqs = by_symbol_status.get(key)
+            if seqs is None:
+                seqs = by_symbol_status[key] = []
+            seqs.append(seq)
+            seq += 1
+
+        self._next_seq = seq
+
+    def remove(self, order_id: str) -> Optional[Dict[str, Any]]:
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return None
+        seq = self._seq_by_id.pop(order_id)
+        del self._id_by_seq[seq]
+
+        user_id = order["user_id"]
+        self._discard(self._by_user, user_id, seq)
+        self._unindex_status(order, order["status"], seq)
+        return order
+
+    def set_status(self, order: Dict[str, Any], status: str):
+        previous = order["status"]
+        if previous == status:
+            return
+        seq = self._seq_by_id.get(order["client_order_id"])
+        order["status"] = status
+        if seq is None:
+            return
+
+        self._unindex_status(order, previous, seq)
+        insort(self._by_user_status.setdefault((order["user_id"], status), []), seq)
+        insort(self._by_symbol_status.setdefault((order["symbol"], status), []), seq)
+        self._user_statuses.setdefault(order["user_id"], set()).add(status)
+
+    def list_orders(
+        self,
+        user_id: str,
+        status: Optional[str] = None,
+        limit: int = 100,
+        before: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        if status is None:
+            seqs = self._by_user.get(user_id)
+        else:
+            seqs = self._by_user_status.get((user_id, status))
+        if not seqs or limit <= 0:
+            return []
+
+        end = len(seqs)
+        if before is not None:
+            before_seq = self._seq_by_id.get(before)
+            if before_seq is None:
+                return []
+            end = bisect_left(seqs, before_seq)
+
+        id_by_seq = self._id_by_seq
+        orders = self.orders
+        return [orders[id_by_seq[seq]] for seq in reversed(seqs[max(0, end - limit):end])]
+
+    def open_orders(self, user_id: str) -> List[Dict[str, Any]]:
+        result = []
+        for status in self._user_statuses.get(user_id, ()):
+            if status not in TERMINAL_STATUSES:
+                result.extend(self.list_orders(user_id, status, limit=len(self.orders)))
+        return result
+
+    def symbol_orders(self, symbol: str, status: str) -> Iterator[Dict[str, Any]]:
+        id_by_seq = self._id_by_seq
+        for seq in list(self._by_symbol_status.get((symbol, status), ())):
+            yield self.orders[id_by_seq[seq]]
+
+    def _unindex_status(self, order: Dict[str, Any], status: str, seq: int):
+        user_id = order["user_id"]
+        if self._discard(self._by_user_status, (user_id, status), seq):
+            statuses = self._user_statuses.get(user_id)
+            if statuses is not None:
+                statuses.discard(status)
+        self._discard(self._by_symbol_status, (order["symbol"], status), seq)
+
+    def _discard(self, index: Dict[Any, List[int]], key: Any, seq: int) -> bool:
+        seqs = index.get(key)
+        if seqs is None:
+            return False
+        position = bisect_left(seqs, seq)
+        if position < len(seqs) and seqs[position] == seq:
+            del seqs[position]
+        if not seqs:
+            del index[key]
+            return True
+        return False
@@ -0,0 +1,270 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime
+import heapq
+import math
+from backend.core.config import get_config_section
+
+INF = math.inf
+
+ASSET_CLASS_PREFIXES = {"O:": "options", "X:": "crypto", "C:": "forex"}
+
+def asset_class(symbol: str) -> str:
+    return ASSET_CLASS_PREFIXES.get(symbol[:2], "stocks")
+
+def quote_touch(quote: Dict[str, Any], side: str) -> Tuple[float, float]:
+    price = quote.get(side) or 0.0
+    if price > 0:
+        size = quote.get(f"{side}_size")
+    else:
+        price = quote.get("last") or quote.get("close") or 0.0
+        size = quote.get("last_size")
+    if price <= 0:
+        return 0.0, 0.0
+    return float(price), float(size) if size else INF
+
+class RestingOrder:
+    __slots__ = ("order_id", "symbol", "side", "price", "remaining", "stop_price", "limit_price")
+
+    def __init__(self, order_id: str, symbol: str, side: str, remaining: float, limit_price: Optional[float], stop_price: Optional[float]):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.remaining = remaining
+        self.limit_price = limit_price
+        self.stop_price = stop_price
+        self.price = 0.0
+
+    def arm(self):
+        if self.limit_price is not None:
+            self.price = self.limit_price
+        else:
+            self.price = INF if self.side == "buy" else -INF
+
+class PriceLevels:
+    def __init__(self, is_bid: bool):
+        self.sign = -1 if is_bid else 1
+        self.heap: List[float] = []
+        self.levels: Dict[float, OrderedDict] = {}
+
+    def add(self, order: RestingOrder):
+        level = self.levels.get(order.price)
+        if level is None:
+            level = self.levels[order.price] = OrderedDict()
+            heapq.heappush(self.heap, self.sign * order.price)
+        level[order.order_id] = order
+
+    def remove(self, order: RestingOrder) -> bool:
+        level = self.levels.get(order.price)
+        if level is None or level.pop(order.order_id, None) is None:
+            return False
+        if not level:
+            del self.levels[order.price]
+        return True
+
+    def best(self) -> Optional[float]:
+        heap = self.heap
+        levels = self.levels
+        while heap:
+            price = self.sign * heap[0]
+            if price in levels:
+                return price
+            heapq.heappop(heap)
+        return None
+
+class OrderBook:
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.levels = {"buy": PriceLevels(True), "sell": PriceLevels(False)}
+        self.stop_heaps: Dict[str, List[Tuple[float, int, str]]] = {"buy": [], "sell": []}
+        self.stops: Dict[str, RestingOrder] = {}
+        self.touch = {"buy": 0.0, "sell": 0.0}
+        self.available = {"buy": 0.0, "sell": 0.0}
+        self.quote: Optional[Dict[str, Any]] = None
+        self.count = 0
+        self._seq = 0
+
+    def set_quote(self, quote: Dict[str, Any]):
+        self.quote = quote
+        self.touch["buy"], self.available["buy"] = quote_touch(quote, "ask")
+        self.touch["sell"], self.available["sell"] = quote_touch(quote, "bid")
+
+    def add_stop(self, order: RestingOrder):
+        self._seq += 1
+        key = order.stop_price if order.side == "buy" else -order.stop_price
+        heapq.heappush(self.stop_heaps[order.side], (key, self._seq, order.order_id))
+        self.stops[order.order_id] = order
+
+    def pop_triggered(self, side: str) -> List[RestingOrder]:
+        heap = self.stop_heaps[side]
+        reference = self.touch[side]
+        triggered = []
+        if reference <= 0:
+            return triggered
+        while heap:
+            key, _, order_id = heap[0]
+            order = self.stops.get(order_id)
+            if order is None:
+                heapq.heappop(heap)
+                continue
+            if (side == "buy" and reference < key) or (side == "sell" and reference > -key):
+                break
+            heapq.heappop(heap)
+            del self.stops[order_id]
+            triggered.append(order)
+        return triggered
+
+class PaperExchange:
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        if config is None:
+            config = get_config_section("execution")
+        self.slippage_model = config.get("slippage_model", "none")
+        self.slippage_bps = float(config.get("slippage_bps", 0.0))
+        self.commission_model = config.get("commission_model", "per_share")
+        self.commissions: Dict[str, float] = config.get("commissions") or {}
+        self.books: Dict[str, OrderBook] = {}
+        self.orders: Dict[str, RestingOrder] = {}
+
+    def has_orders(self, symbol: str) -> bool:
+        return symbol in self.books
+
+    def symbols(self) -> List[str]:
+        return list(self.books)
+
+    def submit(self, order_data: Dict[str, Any], quote: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        order_id = order_data["client_order_id"]
+        symbol = order_data["symbol"]
+        order_type = order_data["type"].lower()
+        limit_price = order_data.get("limit_price") if order_type in ("limit", "stop_limit") else None
+        stop_price = order_data.get("stop_price") if order_type in ("stop", "stop_limit") else None
+        remaining = float(order_data["qty"]) - float(order_data.get("filled_qty") or 0)
+        if remaining <= 0:
+            return []
+
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = OrderBook(symbol)
+        if book.quote is None and quote is not None:
+            book.set_quote(quote)
+
+        order = RestingOrder(order_id, symbol, order_data["side"].lower(), remaining, limit_price, stop_price)
+        self.orders[order_id] = order
+        book.count += 1
+
+        fills: List[Dict[str, Any]] = []
+        if stop_price is not None:
+            book.add_stop(order)
+            for triggered in book.pop_triggered(order.side):
+                self._take(book, triggered, fills)
+        else:
+            self._take(book, order, fills)
+        self._prune(book)
+        return fills
+
+    def cancel(self, order_id: str) -> bool:
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return False
+        book = self.books[order.symbol]
+        if book.stops.pop(order_id, None) is None:
+            book.levels[order.side].remove(order)
+        book.count -= 1
+        self._prune(book)
+        return True
+
+    def on_quote(self, symbol: str, quote: Dict[str, Any]) -> List[Dict[str, Any]]:
+        book = self.books.get(symbol)
+        if book is None:
+            return []
+        book.set_quote(quote)
+
+        fills: List[Dict[str, Any]] = []
+        for side in ("buy", "sell"):
+            self._match_resting(book, side, fills)
+            for order in book.pop_triggered(side):
+                self._take(book, order, fills)
+        self._prune(book)
+        return fills
+
+    def _take(self, book: OrderBook, order: RestingOrder, fills: List[Dict[str, Any]]):
+        order.arm()
+        side = order.side
+        touch = book.touch[side]
+        available = book.available[side]
+        if touch > 0 and available > 0 and self._crosses(side, order.price, touch):
+            qty = min(order.remaining, available)
+            price = self._taker_price(side, touch, qty, available)
+            if order.limit_price is not None:
+                price = min(price, order.limit_price) if side == "buy" else max(price, order.limit_price)
+            book.available[side] = available - qty
+            self._fill(book, order, qty, price, "taker", fills)
+        if order.remaining > 0:
+            book.levels[side].add(order)
+
+    def _match_resting(self, book: OrderBook, side: str, fills: List[Dict[str, Any]]):
+        levels = book.levels[side]
+        touch = book.touch[side]
+        if touch <= 0:
+            return
+        while book.available[side] > 0:
+            best = levels.best()
+            if best is None or not self._crosses(side, best, touch):
+                return
+            level = levels.levels[best]
+            while level and book.available[side] > 0:
+                order = next(iter(level.values()))
+                available = book.available[side]
+                qty = min(order.remaining, available)
+                if math.isinf(order.price):
+                    price, liquidity = self._taker_price(side, touch, qty, available), "taker"
+                else:
+                    price, liquidity = order.price, "maker"
+                book.available[side] = available - qty
+                self._fill(book, order, qty, price, liquidity, fills)
+                if order.remaining <= 0:
+                    level.popitem(last=False)
+            if not level:
+                del levels.levels[best]
+
+    def _fill(self, book: OrderBook, order: RestingOrder, qty: float, price: float, liquidity: str, fills: List[Dict[str, Any]]):
+        order.remaining -= qty
+        if order.remaining <= 1e-9:
+            order.remaining = 0.0
+            del self.orders[order.order_id]
+            book.count -= 1
+        fills.append({
+            "order_id": order.order_id,
+            "symbol": order.symbol,
+            "side": order.side,
+            "qty": qty,
+            "price": price,
+            "commission": self._commission(order.symbol, qty, price),
+            "liquidity": liquidity,
+            "remaining": order.remaining,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+
+    def _prune(self, book: OrderBook):
+        if book.count <= 0:
+            self.books.pop(book.symbol, None)
+
+    def _crosses(self, side: str, price: float, touch: float) -> bool:
+        return touch <= price if side == "buy" else touch >= price
+
+    def _taker_price(self, side: str, touch: float, qty: float, displayed: float) -> float:
+        if self.slippage_model in ("none", "zero") or self.slippage_bps <= 0:
+            return touch
+        slippage = touch * self.slippage_bps / 10000
+        if self.slippage_model == "realistic" and not math.isinf(displayed):
+            slippage *= math.sqrt(qty / displayed)
+        return touch + slippage if side == "buy" else touch - slippage
+
+    def _commission(self, symbol: str, qty: float, price: float) -> float:
+        rate = self.commissions.get(asset_class(symbol), self.commissions.get("stocks", 0.0))
+        if self.commission_model == "per_share":
+            return qty * rate
+        if self.commission_model == "percentage":
+            return qty * price * rate
+        if self.commission_model == "per_trade":
+            return rate
+        return 0.0
@@ -0,0 +1,247 @@
+from typing import Any, Dict, List, Optional
+import time
+from backend.core.config import settings
+from backend.services.options_pricing import CONTRACT_MULTIPLIER, parse_option_symbol
+
+EPSILON = 1e-9
+
+def mark_price(quote: Dict[str, Any]) -> float:
+    bid = quote.get("bid") or 0.0
+    ask = quote.get("ask") or 0.0
+    if bid > 0 and ask > 0:
+        return (bid + ask) / 2
+    return quote.get("last") or quote.get("close") or 0.0
+
+def utc_day() -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+def contract_multiplier(symbol: str) -> int:
+    return CONTRACT_MULTIPLIER if parse_option_symbol(symbol) else 1
+
+class PositionKeeper:
+    def __init__(self, starting_cash: Optional[float] = None, shared_account: Optional[str] = None):
+        self.starting_cash = settings.PAPER_STARTING_CASH if starting_cash is None else starting_cash
+        self.shared_account = shared_account
+        self.by_user: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.by_symbol: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.accounts: Dict[str, Dict[str, float]] = {}
+        self.fill_seq = 0
+
+    def book_id(self, user_id: str) -> str:
+        return self.shared_account or user_id
+
+    def book(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        return self.by_user.get(self.book_id(user_id), {})
+
+    def has_positions(self, symbol: str) -> bool:
+        return symbol in self.by_symbol
+
+    def get_positions(self, user_id: str) -> List[Dict[str, Any]]:
+        return [dict(position) for position in self.book(user_id).values()]
+
+    def get_position(self, user_id: str, symbol: str) -> Optional[Dict[str, Any]]:
+        position = self.book(user_id).get(symbol)
+        return dict(position) if position else None
+
+    def get_account(self, user_id: str) -> Dict[str, float]:
+        account = self._account(self.book_id(user_id))
+        equity = account["cash"] + account["market_value"]
+        return {**account, "equity": equity}
+
+    def apply_fill(
+        self,
+        user_id: str,
+        symbol: str,
+        side: str,
+        qty: float,
+        price: float,
+        commission: float = 0.0,
+        seq: Optional[int] = None,
+        day: Optional[str] = None
+    ) -> int:
+        self.fill_seq = seq if seq is not None else self.fill_seq + 1
+        user_id = self.book_id(user_id)
+        account = self._account(user_id)
+        day = day or utc_day()
+        if day > account["day"]:
+            account["day"] = day
+            account["day_start_pl"] = account["realized_pl"] - account["commission"]
+        positions = self.by_user.setdefault(user_id, {})
+        position = positions.get(symbol)
+        if position is None:
+            position = positions[symbol] = {
+                "symbol": symbol,
+                "multiplier": contract_multiplier(symbol),
+                "qty": 0.0,
+                "side": "long",
+                "avg_entry_price": 0.0,
+                "market_value": 0.0,
+                "cost_basis": 0.0,
+                "unrealized_pl": 0.0,
+                "unrealized_plpc": 0.0,
+                "current_price": price,
+                "realized_pl": 0.0
+            }
+            self.by_symbol.setdefault(symbol, {})[user_id] = position
+
+        multiplier = position["multiplier"]
+        signed = qty if side.lower() == "buy" else -qty
+        account["cash"] -= signed * price * multiplier + commission
+        account["commission"] += commission
+
+        current = position["qty"]
+        if current == 0 or (current > 0) == (signed > 0):
+            position["avg_entry_price"] = (abs(current) * position["avg_entry_price"] + qty * price) / (abs(current) + qty)
+        else:
+            closed = min(qty, abs(current))
+            realized = closed * (price - position["avg_entry_price"]) * multiplier * (1 if current > 0 else -1)
+            position["realized_pl"] += realized
+            account["realized_pl"] += realized
+            if qty > abs(current) + EPSILON:
+                position["avg_entry_price"] = price
+
+        quantity = current + signed
+        if abs(quantity) < EPSILON:
+            self._remove(user_id, symbol)
+            account["market_value"] -= position["market_value"]
+            account["unrealized_pl"] -= position["unrealized_pl"]
+            account["cost_basis"] -= position["cost_basis"]
+            account["gross_exposure"] -= abs(position["market_value"])
+            self._update_peak(account)
+            return self.fill_seq
+
+        position["qty"] = quantity
+        position["side"] = "long" if quantity > 0 else "short"
+        self._mark(account, position, position["current_price"] or price)
+        return self.fill_seq
+
+    def sync_account(
+        self,
+        user_id: str,
+        cash: float,
+        positions: List[Dict[str, Any]],
+        balances: Optional[Dict[str, float]] = None
+    ):
+        user_id = self.book_id(user_id)
+        account = self._account(user_id)
+        account.update(balances or {})
+        previous = dict(self.by_user.get(user_id, {}))
+        for symbol in list(previous):
+            self._remove(user_id, symbol)
+        account.update(cash=cash, market_value=0.0, cost_basis=0.0, unrealized_pl=0.0, gross_exposure=0.0)
+
+        book = {}
+        for entry in positions:
+            symbol = entry["symbol"]
+            position = {
+                "symbol": symbol,
+                "multiplier": contract_multiplier(symbol),
+                "qty": entry["qty"],
+                "side": "long" if entry["qty"] > 0 else "short",
+                "avg_entry_price": entry["avg_entry_price"],
+                "market_value": 0.0,
+                "cost_basis": 0.0,
+                "unrealized_pl": 0.0,
+                "unrealized_plpc": 0.0,
+                "current_price": entry["current_price"],
+                "realized_pl": previous.get(symbol, {}).get("realized_pl", 0.0)
+            }
+            book[symbol] = position
+            self.by_symbol.setdefault(symbol, {})[user_id] = position
+            self._mark(account, position, entry["current_price"] or entry["avg_entry_price"])
+        if book:
+            self.by_user[user_id] = book
+        self._update_peak(account)
+
+    def mark(self, symbol: str, quote: Dict[str, Any]):
+        holders = self.by_symbol.get(symbol)
+        if not holders:
+            return
+        price = mark_price(quote)
+        if price <= 0:
+            return
+        accounts = self.accounts
+        for user_id, position in holders.items():
+            self._mark(accounts[user_id], position, price)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "fill_seq": self.fill_seq,
+            "accounts": {user_id: dict(account) for user_id, account in self.accounts.items()},
+            "positions": [
+                {"user_id": user_id, **position}
+                for user_id, positions in self.by_user.items()
+                for position in positions.values()
+            ]
+        }
+
+    def load(self, state: Dict[str, Any]):
+        self.fill_seq = state.get("fill_seq", 0)
+        self.accounts = {user_id: dict(account) for user_id, account in state.get("accounts", {}).items()}
+        self.by_user = {}
+        self.by_symbol = {}
+        for entry in state.get("positions", ()):
+            position = dict(entry)
+            user_id = position.pop("user_id")
+            position.setdefault("multiplier", contract_multiplier(position["symbol"]))
+            self.by_user.setdefault(user_id, {})[position["symbol"]] = position
+            self.by_symbol.setdefault(position["symbol"], {})[user_id] = position
+        for user_id, account in self.accounts.items():
+            if "gross_exposure" not in account:
+                positions = self.by_user.get(user_id, {}).values()
+                account["gross_exposure"] = sum(abs(position["market_value"]) for position in positions)
+            if "peak_equity" not in account:
+                account["peak_equity"] = max(self.starting_cash, account["cash"] + account["market_value"])
+            if "day" not in account:
+                account["day"] = ""
+                account["day_start_pl"] = account["realized_pl"] - account["commission"]
+
+    def _mark(self, account: Dict[str, float], position: Dict[str, Any], price: float):
+        quantity = position["qty"] * position["multiplier"]
+        market_value = quantity * price
+        cost_basis = quantity * position["avg_entry_price"]
+        unrealized = market_value - cost_basis
+        account["market_value"] += market_value - position["market_value"]
+        account["unrealized_pl"] += unrealized - position["unrealized_pl"]
+        account["cost_basis"] += cost_basis - position["cost_basis"]
+        account["gross_exposure"] += abs(market_value) - abs(position["market_value"])
+        position["current_price"] = price
+        position["market_value"] = market_value
+        position["cost_basis"] = cost_basis
+        position["unrealized_pl"] = unrealized
+        position["unrealized_plpc"] = unrealized / abs(cost_basis) if cost_basis else 0.0
+        self._update_peak(account)
+
+    def _update_peak(self, account: Dict[str, float]):
+        equity = account["cash"] + account["market_value"]
+        if equity > account["peak_equity"]:
+            account["peak_equity"] = equity
+
+    def _remove(self, user_id: str, symbol: str):
+        positions = self.by_user.get(user_id)
+        if positions is not None:
+            positions.pop(symbol, None)
+            if not positions:
+                del self.by_user[user_id]
+        holders = self.by_symbol.get(symbol)
+        if holders is not None:
+            holders.pop(user_id, None)
+            if not holders:
+                del self.by_symbol[symbol]
+
+    def _account(self, user_id: str) -> Dict[str, float]:
+        account = self.accounts.get(user_id)
+        if account is None:
+            account = self.accounts[user_id] = {
+                "cash": self.starting_cash,
+                "market_value": 0.0,
+                "cost_basis": 0.0,
+                "unrealized_pl": 0.0,
+                "realized_pl": 0.0,
+                "commission": 0.0,
+                "gross_exposure": 0.0,
+                "peak_equity": self.starting_cash,
+                "day": "",
+                "day_start_pl": 0.0
+            }
+        return account
@@ -1,24 +1,42 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
+import asyncio
+import time
 import numpy as np
+import pandas as pd
 from scipy import stats
-from backend.services.execution_engine import ExecutionEngine
+from backend.services.execution_engine import execution_engine
+from backend.services.data_streamer import DataStreamer
+from backend.services.var_engine import VaREngine
+from backend.services.stress_engine import PREDEFINED_SCENARIOS, stress_engine
+from backend.core.config import settings
+from backend.services.covariance import covariance_service
+from backend.services.options_pricing import (
+    GREEK_NAMES,
+    MARKET_TZ,
+    black_scholes,
+    implied_volatility,
+    parse_option_symbol,
+    years_to_expiry
+)
+
+RETURN_HISTORY_DAYS = 252
+RETURN_HISTORY_TTL = 3600.0
 
 class RiskEngine:
     def __init__(self):
-        self.execution_engine = ExecutionEngine()
-        self.risk_limits = {
-            "max_position_size": 10000,
-            "max_portfolio_risk": 0.02,
-            "max_position_risk": 0.01,
-            "max_daily_loss": 1000,
-            "max_drawdown": 0.15
-        }
+        self.execution_engine = execution_engine
+        self.risk_limits = execution_engine.risk_gate.limits
+        self.var_engine = VaREngine()
+        self.data_streamer = DataStreamer()
+        self.price_history: Dict[str, Tuple[float, List[Tuple[str, float]]]] = {}
+        self.covariance = covariance_service
+        self.stress_engine = stress_engine
 
     async def get_account_info(self, user_id: str) -> Dict[str, Any]:
         if self.execution_engine.alpaca:
             try:
-                account = self.execution_engine.alpaca.get_account()
+                account = await self.execution_engine.broker_call(self.execution_engine.alpaca.get_account)
                 return {
                     "account_number": account.account_number,
                     "status": account.status.value,
@@ -42,19 +60,28 @@ class RiskEngine:
             "account_number": "PAPER001",
             "status": "ACTIVE",
             "currency": "USD",
-            "buying_power": 100000.0,
-            "cash": 100000.0,
-            "portfolio_value": 100000.0,
-            "equity": 100000.0,
-            "last_equity": 100000.0
+            **self._book_account(user_id)
+        }
+
+    def _book_account(self, user_id: str) -> Dict[str, Any]:
+        keeper = self.execution_engine.position_keeper
+        account = keeper.get_account(user_id)
+        return {
+            "buying_power": account.get("buying_power", account["cash"]),
+            "cash": account["cash"],
+            "portfolio_value": account["equity"],
+            "equity": account["equity"],
+            "last_equity": account.get("last_equity", keeper.starting_cash),
+            "initial_margin": account.get("initial_margin", 0.0)
         }
 
     async def get_portfolio_summary(self, user_id: str) -> Dict[str, Any]:
-        account = await self.get_account_info(user_id)
-        positions = await self.execution_engine.get_positions(user_id)
+        account = self._book_account(user_id)
+        keeper = self.execution_engine.position_keeper
+        totals = keeper.get_account(user_id)
         
-        total_pl = sum(pos.get("unrealized_pl", 0) for pos in positions)
-        total_value = sum(pos.get("market_value", 0) for pos in positions)
+        total_pl = totals["unrealized_pl"]
+        total_value = totals["market_value"]
         
         return {
             "account_value": account["portfolio_value"],
@@ -64,13 +91,15 @@ class RiskEngine:
             "total_pl": total_pl,
             "total_pl_percent": (total_pl / account["last_equity"]) * 100 if account["last_equity"] > 0 else 0,
             "day_pl": total_pl,
-            "positions_count": len(positions),
-            "margin_used": account.get("initial_margin", 0),
+            "positions_count": len(keeper.book(user_id)),
+            "margin_used": account["initial_margin"],
             "margin_available": account["buying_power"]
         }
 
     async def get_portfolio_analytics(self, user_id: str) -> Dict[str, Any]:
         positions = await self.execution_engine.get_positions(user_id)
+        account = self.execution_engine.position_keeper.get_account(user_id)
+        _, beta = self._volatility_and_beta(user_id, account["equity"])
         
         by_sector = {}
         by_asset_type = {"stocks": 0, "options": 0, "futures": 0, "crypto": 0}
@@ -84,63 +113,240 @@ class RiskEngine:
             "exposure_by_sector": by_sector,
             "exposure_by_asset_type": by_asset_type,
             "concentration_risk": self._calculate_concentration(positions),
-            "beta": 1.0,
+            "beta": beta,
             "sharpe_ratio": 1.5,
             "sortino_ratio": 2.0
         }
 
     async def calculate_risk_metrics(self, user_id: str) -> Dict[str, Any]:
-        account = await self.get_account_info(user_id)
-        positions = await self.execution_engine.get_positions(user_id)
+        account = self._book_account(user_id)
+        var = (await self.calculate_portfolio_var([user_id]))[user_id]
         
         portfolio_value = account["portfolio_value"]
-        var_95 = self._calculate_var(positions, 0.95)
-        var_99 = self._calculate_var(positions, 0.99)
+        volatility, beta = self._volatility_and_beta(user_id, portfolio_value)
         
         return {
             "portfolio_value": portfolio_value,
             "cash_percent": (account["cash"] / portfolio_value) * 100 if portfolio_value > 0 else 100,
             "leverage": (portfolio_value - account["cash"]) / portfolio_value if portfolio_value > 0 else 0,
-            "var_95": var_95,
-            "var_99": var_99,
-            "expected_shortfall": var_99 * 1.2,
+            "var_95": var["historical"]["var_95"],
+            "var_99": var["historical"]["var_99"],
+            "expected_shortfall": var["historical"]["es_99"],
+            "var": var,
             "max_drawdown": 0.05,
-            "volatility": 0.15,
-            "beta": 1.0
+            "volatility": volatility,
+            "beta": beta
         }
 
     async def calculate_portfolio_greeks(self, user_id: str) -> Dict[str, Any]:
-        positions = await self.execution_engine.get_positions(user_id)
+        positions = self.execution_engine.position_keeper.book(user_id)
+        symbols = [symbol for symbol in positions if parse_option_symbol(symbol)]
+        result: Dict[str, Any] = {name: 0.0 for name in GREEK_NAMES}
+        result["positions"] = []
+        if not symbols:
+            return result
         
-        total_delta = 0
-        total_gamma = 0
-        total_theta = 0
-        total_vega = 0
-        
-        for pos in positions:
-            if "option" in pos.get("symbol", "").lower():
-                total_delta += pos.get("qty", 0) * 0.5
-                total_gamma += pos.get("qty", 0) * 0.05
-                total_theta += pos.get("qty", 0) * -0.02
-                total_vega += pos.get("qty", 0) * 0.1
+        options = self.price_options(symbols)
+        contracts = np.array([positions[symbol]["qty"] * positions[symbol]["multiplier"] for symbol in symbols])
+        priced = options["spot"] > 0
+        for name in GREEK_NAMES:
+            exposure = np.where(priced, contracts * options[name], 0.0)
+            result[name] = float(exposure.sum())
+        for index, symbol in enumerate(symbols):
+            if priced[index]:
+                result["positions"].append({
+                    "symbol": symbol,
+                    "underlying": options["underlying"][index],
+                    "qty": positions[symbol]["qty"],
+                    "implied_volatility": float(options["volatility"][index]),
+                    **{name: float(contracts[index] * options[name][index]) for name in GREEK_NAMES}
+                })
+        return result
+
+    def price_options(self, symbols: List[str]) -> Dict[str, Any]:
+        engine = self.execution_engine
+        now = datetime.now(MARKET_TZ)
+        contracts = [parse_option_symbol(symbol) for symbol in symbols]
+        underlying = [contract[0] for contract in contracts]
+        spot = np.array([
+            engine.reference_price(root) or self.covariance.closes.get(root, 0.0) for root in underlying
+        ])
+        strike = np.array([contract[3] for contract in contracts])
+        years = np.array([years_to_expiry(contract[1], now) for contract in contracts])
+        is_call = np.array([contract[2] for contract in contracts], dtype=bool)
+        market = np.array([engine.reference_price(symbol) or np.nan for symbol in symbols])
         
+        rate = settings.RISK_FREE_RATE
+        implied = implied_volatility(market, spot, strike, years, is_call, rate)
+        snapshot = self.covariance.snapshot
+        default_volatility = self.risk_limits["default_volatility"]
+        fallback = np.array([snapshot.volatility(root) or default_volatility for root in underlying])
+        volatility = np.where(np.isfinite(implied), implied, fallback)
         return {
-            "delta": total_delta,
-            "gamma": total_gamma,
-            "theta": total_theta,
-            "vega": total_vega,
-            "rho": 0.0
+            "underlying": underlying,
+            "spot": spot,
+            "strike": strike,
+            "years": years,
+            "is_call": is_call,
+            "volatility": volatility,
+            **black_scholes(spot, strike, years, volatility, is_call, rate)
         }
 
-    def _calculate_var(self, positions: List[Dict], confidence: float) -> float:
-        if not positions:
-            return 0.0
+    async def calculate_portfolio_var(self, user_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+        keeper = self.execution_engine.position_keeper
+        if user_ids is None:
+            user_ids = list(keeper.by_user)
+        empty = {"var_95": 0.0, "es_95": 0.0, "var_99": 0.0, "es_99": 0.0}
+        result = {
+            user_id: {method: dict(empty) for method in ("historical", "parametric", "monte_carlo")}
+            for user_id in user_ids
+        }
         
-        returns = [pos.get("unrealized_plpc", 0) for pos in positions]
-        if not returns:
-            return 0.0
+        symbols = sorted({symbol for user_id in user_ids for symbol in keeper.book(user_id)})
+        if not symbols:
+            return result
+        columns = {symbol: index for index, symbol in enumerate(symbols)}
+        exposures = np.zeros((len(user_ids), len(symbols)))
+        for row, user_id in enumerate(user_ids):
+            for symbol, position in keeper.book(user_id).items():
+                exposures[row, columns[symbol]] = position["market_value"]
+        
+        returns = await self.get_return_matrix(symbols)
+        if returns.shape[0] < 2:
+            return result
+        
+        estimates = await asyncio.to_thread(self.var_engine.compute, returns, exposures)
+        for method, levels in estimates.items():
+            for row, user_id in enumerate(user_ids):
+                result[user_id][method] = {
+                    "var_95": float(levels[0.95][0][row]),
+                    "es_95": float(levels[0.95][1][row]),
+                    "var_99": float(levels[0.99][0][row]),
+                    "es_99": float(levels[0.99][1][row])
+                }
+        return result
+
+    async def run_stress_test(
+        self,
+        scenarios: Optional[List[Dict[str, Any]]] = None,
+        user_ids: Optional[List[str]] = None,
+        include_predefined: bool = True,
+        include_positions: bool = True
+    ) -> Dict[str, Any]:
+        keeper = self.execution_engine.position_keeper
+        if user_ids is None:
+            user_ids = list(keeper.by_user)
+        scenarios = (PREDEFINED_SCENARIOS if include_predefined else []) + list(scenarios or [])
+        names = [scenario["name"] for scenario in scenarios]
+        result: Dict[str, Any] = {
+            "scenarios": names,
+            "accounts": {user_id: {"pnl": [0.0] * len(names), "positions": {}} for user_id in user_ids}
+        }
+        
+        held = {
+            symbol: position
+            for user_id in user_ids for symbol, position in keeper.book(user_id).items()
+        }
+        symbols = sorted(held)
+        if not symbols or not scenarios:
+            return result
+        
+        option_symbols = [symbol for symbol in symbols if parse_option_symbol(symbol)]
+        options = self.price_options(option_symbols) if option_symbols else None
+        option_rows = {symbol: row for row, symbol in enumerate(option_symbols)}
+        underlyings: List[str] = []
+        columns: Dict[str, int] = {}
+        instruments = {
+            "underlying": np.zeros(len(symbols), dtype=np.intp),
+            "price": np.zeros(len(symbols)),
+            "spot": np.zeros(len(symbols)),
+            "strike": np.zeros(len(symbols)),
+            "years": np.ones(len(symbols)),
+            "is_call": np.zeros(len(symbols), dtype=bool),
+            "volatility": np.zeros(len(symbols)),
+            "multiplier": np.ones(len(symbols)),
+            "is_option": np.zeros(len(symbols), dtype=bool)
+        }
+        for index, symbol in enumerate(symbols):
+            row = option_rows.get(symbol)
+            underlying = symbol if row is None else options["underlying"][row]
+            if underlying not in columns:
+                columns[underlying] = len(underlyings)
+                underlyings.append(underlying)
+            instruments["underlying"][index] = columns[underlying]
+            instruments["multiplier"][index] = held[symbol]["multiplier"]
+            if row is None:
+                instruments["price"][index] = self.execution_engine.reference_price(symbol) or held[symbol]["current_price"] or 0.0
+                continue
+            instruments["is_option"][index] = True
+            for name in ("price", "spot", "strike", "years", "is_call", "volatility"):
+                instruments[name][index] = options[name][row]
+        
+        snapshot = self.covariance.snapshot
+        covered = [symbol for symbol in underlyings if symbol in snapshot]
+        betas = np.ones(len(underlyings))
+        covered_betas = snapshot.betas(covered, self.covariance.benchmark) if covered else None
+        if covered_betas is not None:
+            betas[[columns[symbol] for symbol in covered]] = covered_betas
+        sectors = [self._get_sector(symbol) for symbol in underlyings]
+        
+        spot_shocks, volatility_shocks = self.stress_engine.build_shocks(scenarios, underlyings, betas, sectors)
+        pnl = await asyncio.to_thread(
+            self.stress_engine.revalue, spot_shocks, volatility_shocks, instruments, settings.RISK_FREE_RATE
+        )
+        
+        positions = {symbol: index for index, symbol in enumerate(symbols)}
+        quantities = np.zeros((len(user_ids), len(symbols)))
+        for row, user_id in enumerate(user_ids):
+            for symbol, position in keeper.book(user_id).items():
+                quantities[row, positions[symbol]] = position["qty"]
+        totals = quantities @ pnl.T
+        for row, user_id in enumerate(user_ids):
+            account = result["accounts"][user_id]
+            account["pnl"] = totals[row].tolist()
+            if include_positions:
+                for symbol, position in keeper.book(user_id).items():
+                    account["positions"][symbol] = (pnl[:, positions[symbol]] * position["qty"]).tolist()
+            worst = int(totals[row].argmin())
+            account["worst"] = {"scenario": names[worst], "pnl": float(totals[row, worst])}
+        return result
+
+    async def get_return_matrix(self, symbols: List[str]) -> np.ndarray:
+        now = time.monotonic()
+        stale = [
+            symbol for symbol in symbols
+            if symbol not in self.price_history or now - self.price_history[symbol][0] > RETURN_HISTORY_TTL
+        ]
+        if stale:
+            closes = await self.data_streamer.get_daily_closes(stale, RETURN_HISTORY_DAYS)
+            for symbol in stale:
+                self.price_history[symbol] = (now, closes.get(symbol, []))
         
-        return abs(np.percentile(returns, (1 - confidence) * 100)) * 100
+        prices = pd.DataFrame(
+            {symbol: pd.Series(dict(self.price_history[symbol][1]), dtype=float) for symbol in symbols},
+            columns=symbols
+        ).sort_index().ffill()
+        returns = prices.pct_change(fill_method=None).iloc[1:].tail(RETURN_HISTORY_DAYS)
+        return returns.fillna(0.0).to_numpy()
+
+    def _volatility_and_beta(self, user_id: str, portfolio_value: float) -> Tuple[float, float]:
+        positions = self.execution_engine.position_keeper.book(user_id)
+        default_volatility = self.risk_limits["default_volatility"]
+        if not positions or portfolio_value <= 0:
+            return 0.0, 0.0
+        
+        snapshot = self.covariance.snapshot
+        covered = [symbol for symbol in positions if symbol in snapshot]
+        weights = np.array([positions[symbol]["market_value"] for symbol in covered])
+        uncovered = [positions[symbol]["market_value"] for symbol in positions if symbol not in snapshot]
+        
+        variance = sum((value * default_volatility) ** 2 for value in uncovered)
+        dollar_beta = sum(uncovered)
+        if covered:
+            variance += float(weights @ snapshot.covariance(covered, annualize=True) @ weights)
+            betas = snapshot.betas(covered, self.covariance.benchmark)
+            dollar_beta += float(weights @ betas) if betas is not None else float(weights.sum())
+        return float(np.sqrt(max(variance, 0.0))) / portfolio_value, dollar_beta / portfolio_value
 
     def _calculate_concentration(self, positions: List[Dict]) -> float:
         if not positions:
@@ -165,22 +371,7 @@ class RiskEngine:
         return sector_map.get(symbol, "Other")
 
     async def check_risk_limits(self, user_id: str, order: Dict) -> Dict[str, Any]:
-        account = await self.get_account_info(user_id)
-        positions = await self.execution_engine.get_positions(user_id)
-        
-        violations = []
-        
-        order_value = order["qty"] * order.get("limit_price", 100)
-        if order_value > self.risk_limits["max_position_size"]:
-            violations.append(f"Order exceeds max position size: {order_value} > {self.risk_limits['max_position_size']}")
-        
-        total_exposure = sum(pos.get("market_value", 0) for pos in positions) + order_value
-        portfolio_risk = total_exposure / account["portfolio_value"]
-        if portfolio_risk > self.risk_limits["max_portfolio_risk"]:
-            violations.append(f"Portfolio risk exceeded: {portfolio_risk:.2%}")
-        
-        return {
-            "approved": len(violations) == 0,
-            "violations": violations,
-            "risk_score": portfolio_risk
-        }
+        price = order.get("limit_price") or order.get("stop_price") or self.execution_engine.reference_price(order["symbol"])
+        return self.execution_engine.risk_gate.check(
+            user_id, order["symbol"], order.get("side", "buy"), order["qty"], price
+        )
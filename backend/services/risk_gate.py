@@ -0,0 +1,92 @@
+from typing import Any, Dict, Optional
+import math
+from backend.services.position_keeper import PositionKeeper, contract_multiplier, utc_day
+
+EPSILON = 1e-9
+TRADING_DAYS = 252
+
+DEFAULT_RISK_LIMITS = {
+    "max_position_size": 10000,
+    "max_order_value": 100000,
+    "max_portfolio_risk": 0.02,
+    "max_position_risk": 0.01,
+    "max_daily_loss": 1000,
+    "max_drawdown": 0.15,
+    "default_volatility": 0.15
+}
+
+class RiskGate:
+    def __init__(self, keeper: PositionKeeper, limits: Optional[Dict[str, Any]] = None, enabled: bool = True):
+        self.keeper = keeper
+        self.limits: Dict[str, Any] = dict(DEFAULT_RISK_LIMITS)
+        self.limits.update((key, value) for key, value in (limits or {}).items() if key in DEFAULT_RISK_LIMITS)
+        self.enabled = enabled
+        self.volatility: Dict[str, float] = {}
+        self.stats: Dict[str, int] = {"checks": 0, "rejections": 0}
+
+    def set_volatility(self, symbol: str, volatility: float):
+        self.volatility[symbol] = volatility
+
+    def check(self, user_id: str, symbol: str, side: str, qty: float, price: Optional[float]) -> Dict[str, Any]:
+        self.stats["checks"] += 1
+        limits = self.limits
+        keeper = self.keeper
+        account = keeper.accounts.get(keeper.book_id(user_id))
+        position = keeper.book(user_id).get(symbol)
+
+        current = position["qty"] if position else 0.0
+        after = current + (qty if side.lower() == "buy" else -qty)
+        increasing = abs(after) > abs(current) + EPSILON
+        if not price and position:
+            price = position["current_price"]
+
+        if account is None:
+            equity = peak = keeper.starting_cash
+            gross = daily_loss = 0.0
+        else:
+            equity = account["cash"] + account["market_value"]
+            peak = account["peak_equity"]
+            gross = account["gross_exposure"]
+            net_realized = account["realized_pl"] - account["commission"]
+            daily_loss = account["day_start_pl"] - net_realized if account["day"] == utc_day() else 0.0
+
+        violations = []
+        risk_score = 0.0
+        if increasing:
+            if abs(after) > limits["max_position_size"]:
+                violations.append(f"Position exceeds max position size: {abs(after)} > {limits['max_position_size']}")
+            if equity <= 0:
+                violations.append(f"Account equity is exhausted: {equity:.2f}")
+            elif price:
+                multiplier = position["multiplier"] if position else contract_multiplier(symbol)
+                order_value = qty * price * multiplier
+                if order_value > limits["max_order_value"]:
+                    violations.append(f"Order exceeds max order value: {order_value:.2f} > {limits['max_order_value']}")
+                exposure = abs(after) * price * multiplier
+                gross_after = gross - (abs(position["market_value"]) if position else 0.0) + exposure
+                default_volatility = limits["default_volatility"]
+                daily_move = self.volatility.get(symbol, default_volatility) / math.sqrt(TRADING_DAYS)
+                position_risk = exposure * daily_move / equity
+                risk_score = gross_after * default_volatility / math.sqrt(TRADING_DAYS) / equity
+                if position_risk > limits["max_position_risk"]:
+                    violations.append(f"Position risk exceeded: {position_risk:.2%} > {limits['max_position_risk']:.2%}")
+                if risk_score > limits["max_portfolio_risk"]:
+                    violations.append(f"Portfolio risk exceeded: {risk_score:.2%} > {limits['max_portfolio_risk']:.2%}")
+
+            if daily_loss >= limits["max_daily_loss"]:
+                violations.append(f"Daily loss limit reached: {daily_loss:.2f} >= {limits['max_daily_loss']}")
+
+            drawdown = (peak - equity) / peak if peak > 0 else 0.0
+            if drawdown > limits["max_drawdown"]:
+                violations.append(f"Max drawdown exceeded: {drawdown:.2%} > {limits['max_drawdown']:.2%}")
+
+        if violations:
+            self.stats["rejections"] += 1
+        return {
+            "approved": not violations,
+            "violations": violations,
+            "risk_score": risk_score
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "limits": dict(self.limits), **self.stats}
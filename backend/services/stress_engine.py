@@ -0,0 +1,81 @@
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+from backend.services.options_pricing import MIN_VOLATILITY, option_price
+
+CHUNK_ELEMENTS = 4_000_000
+
+PREDEFINED_SCENARIOS: List[Dict[str, Any]] = [
+    {"name": "market_down_5", "market": -0.05},
+    {"name": "market_down_10", "market": -0.10},
+    {"name": "market_down_20", "market": -0.20},
+    {"name": "market_up_5", "market": 0.05},
+    {"name": "market_up_10", "market": 0.10},
+    {"name": "volatility_up_10", "volatility": 0.10},
+    {"name": "volatility_up_20", "volatility": 0.20},
+    {"name": "volatility_down_5", "volatility": -0.05},
+    {"name": "crash", "market": -0.20, "volatility": 0.30},
+    {"name": "melt_up", "market": 0.10, "volatility": -0.05},
+    {"name": "technology_down_15", "sectors": {"Technology": -0.15}},
+    {"name": "finance_down_15", "sectors": {"Finance": -0.15}}
+]
+
+class StressEngine:
+    def build_shocks(
+        self,
+        scenarios: Sequence[Dict[str, Any]],
+        underlyings: Sequence[str],
+        betas: np.ndarray,
+        sectors: Sequence[str]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        columns = {symbol: index for index, symbol in enumerate(underlyings)}
+        by_sector: Dict[str, List[int]] = {}
+        for index, sector in enumerate(sectors):
+            by_sector.setdefault(sector, []).append(index)
+
+        market = np.array([scenario.get("market", 0.0) for scenario in scenarios])
+        volatility = np.array([scenario.get("volatility", 0.0) for scenario in scenarios])
+        spot_shocks = np.outer(market, betas)
+        for row, scenario in enumerate(scenarios):
+            for sector, shock in (scenario.get("sectors") or {}).items():
+                spot_shocks[row, by_sector.get(sector, [])] += shock
+            for symbol, shock in (scenario.get("symbols") or {}).items():
+                if symbol in columns:
+                    spot_shocks[row, columns[symbol]] += shock
+        np.maximum(spot_shocks, -1.0, out=spot_shocks)
+        return spot_shocks, volatility
+
+    def revalue(
+        self,
+        spot_shocks: np.ndarray,
+        volatility_shocks: np.ndarray,
+        instruments: Dict[str, np.ndarray],
+        rate: float = 0.0
+    ) -> np.ndarray:
+        underlying = instruments["underlying"]
+        spot = instruments["spot"]
+        multiplier = instruments["multiplier"]
+        options = np.flatnonzero(instruments["is_option"])
+        linear = np.flatnonzero(~instruments["is_option"])
+
+        pnl = np.empty((spot_shocks.shape[0], len(underlying)))
+        pnl[:, linear] = spot_shocks[:, underlying[linear]] * (instruments["price"][linear] * multiplier[linear])
+        if not options.size:
+            return pnl
+
+        option_underlying = underlying[options]
+        strike = instruments["strike"][options]
+        years = instruments["years"][options]
+        is_call = instruments["is_call"][options]
+        volatility = instruments["volatility"][options]
+        base = instruments["price"][options]
+        option_spot = spot[options]
+        chunk = max(1, CHUNK_ELEMENTS // options.size)
+        for start in range(0, spot_shocks.shape[0], chunk):
+            stop = start + chunk
+            shocked_spot = option_spot * (1 + spot_shocks[start:stop, option_underlying])
+            shocked_volatility = np.maximum(volatility + volatility_shocks[start:stop, None], MIN_VOLATILITY)
+            value = option_price(shocked_spot, strike, years, shocked_volatility, is_call, rate)
+            pnl[start:stop, options] = (value - base) * multiplier[options]
+        return pnl
+
+stress_engine = StressEngine()
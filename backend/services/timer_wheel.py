@@ -0,0 +1,79 @@
+from typing import Any, List, Optional, Set
+import math
+
+class Timer:
+    __slots__ = ("expires", "payload", "bucket")
+
+    def __init__(self, expires: int, payload: Any):
+        self.expires = expires
+        self.payload = payload
+        self.bucket: Optional[Set["Timer"]] = None
+
+class TimerWheel:
+    def __init__(self, tick: float, slots: int = 256, levels: int = 4):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.current = 0
+        self.count = 0
+        self.wheels: List[List[Set[Timer]]] = [[set() for _ in range(slots)] for _ in range(levels)]
+        self.spans = [slots ** level for level in range(levels + 1)]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def schedule(self, delay: float, payload: Any) -> Timer:
+        ticks = max(1, math.ceil(delay / self.tick))
+        timer = Timer(self.current + ticks, payload)
+        self._insert(timer)
+        self.count += 1
+        return timer
+
+    def cancel(self, timer: Timer) -> bool:
+        if timer.bucket is None:
+            return False
+        timer.bucket.discard(timer)
+        timer.bucket = None
+        self.count -= 1
+        return True
+
+    def advance(self, ticks: int) -> List[Any]:
+        expired: List[Any] = []
+        wheels = self.wheels
+        slots = self.slots
+        for _ in range(ticks):
+            self.current += 1
+            current = self.current
+            for level in range(self.levels - 1, 0, -1):
+                span = self.spans[level]
+                if current % span == 0:
+                    bucket = wheels[level][(current // span) % slots]
+                    if bucket:
+                        timers = list(bucket)
+                        bucket.clear()
+                        for timer in timers:
+                            self._insert(timer)
+
+            bucket = wheels[0][current % slots]
+            if bucket:
+                for timer in bucket:
+                    timer.bucket = None
+                    expired.append(timer.payload)
+                self.count -= len(bucket)
+                bucket.clear()
+        return expired
+
+    def _insert(self, timer: Timer):
+        expires = timer.expires
+        delta = expires - self.current
+        if delta < 0:
+            expires = self.current
+            delta = 0
+        level = 0
+        while level < self.levels - 1 and delta >= self.spans[level + 1]:
+            level += 1
+        if delta >= self.spans[level + 1]:
+            expires = self.current + self.spans[level + 1] - 1
+        bucket = self.wheels[level][(expires // self.spans[level]) % self.slots]
+        bucket.add(timer)
+        timer.bucket = bucket
@@ -0,0 +1,120 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+import math
+import numpy as np
+from scipy import stats
+
+DEFAULT_CONFIDENCE_LEVELS = (0.95, 0.99)
+CHUNK_ELEMENTS = 8_000_000
+
+class VaREngine:
+    def __init__(self, paths: int = 100000, seed: Optional[int] = None, dtype: Any = np.float32):
+        self.paths = paths
+        self.dtype = dtype
+        self.rng = np.random.default_rng(seed)
+
+    def compute(
+        self,
+        returns: np.ndarray,
+        exposures: np.ndarray,
+        confidence_levels: Iterable[float] = DEFAULT_CONFIDENCE_LEVELS,
+        horizon_days: int = 1,
+        paths: Optional[int] = None,
+        df: Optional[float] = None
+    ) -> Dict[str, Dict[float, Tuple[np.ndarray, np.ndarray]]]:
+        returns = np.asarray(returns, dtype=np.float64)
+        exposures = np.atleast_2d(np.asarray(exposures, dtype=np.float64))
+        confidence_levels = tuple(confidence_levels)
+        mean = returns.mean(axis=0)
+        cov = np.cov(returns, rowvar=False).reshape(returns.shape[1], returns.shape[1])
+        return {
+            "historical": self.historical(returns, exposures, confidence_levels, horizon_days),
+            "parametric": self.parametric(mean, cov, exposures, confidence_levels, horizon_days),
+            "monte_carlo": self.monte_carlo(mean, cov, exposures, confidence_levels, horizon_days, paths, df)
+        }
+
+    def historical(
+        self,
+        returns: np.ndarray,
+        exposures: np.ndarray,
+        confidence_levels: Iterable[float] = DEFAULT_CONFIDENCE_LEVELS,
+        horizon_days: int = 1
+    ) -> Dict[float, Tuple[np.ndarray, np.ndarray]]:
+        pnl = np.atleast_2d(exposures) @ np.asarray(returns).T
+        return self._tail(pnl * math.sqrt(horizon_days), confidence_levels)
+
+    def parametric(
+        self,
+        mean: np.ndarray,
+        cov: np.ndarray,
+        exposures: np.ndarray,
+        confidence_levels: Iterable[float] = DEFAULT_CONFIDENCE_LEVELS,
+        horizon_days: int = 1
+    ) -> Dict[float, Tuple[np.ndarray, np.ndarray]]:
+        exposures = np.atleast_2d(exposures)
+        drift = exposures @ mean * horizon_days
+        sigma = np.sqrt(np.maximum(np.einsum("pi,ij,pj->p", exposures, cov, exposures), 0.0) * horizon_days)
+        result = {}
+        for confidence in confidence_levels:
+            z = stats.norm.ppf(confidence)
+            var = z * sigma - drift
+            es = sigma * stats.norm.pdf(z) / (1 - confidence) - drift
+            result[confidence] = (var, es)
+        return result
+
+    def monte_carlo(
+        self,
+        mean: np.ndarray,
+        cov: np.ndarray,
+        exposures: np.ndarray,
+        confidence_levels: Iterable[float] = DEFAULT_CONFIDENCE_LEVELS,
+        horizon_days: int = 1,
+        paths: Optional[int] = None,
+        df: Optional[float] = None
+    ) -> Dict[float, Tuple[np.ndarray, np.ndarray]]:
+        exposures = np.atleast_2d(exposures)
+        paths = paths or self.paths
+        if exposures.shape[0] <= exposures.shape[1]:
+            projection = factor_loadings(exposures @ cov @ exposures.T)
+        else:
+            projection = exposures @ factor_loadings(cov)
+
+        draws = self.rng.standard_normal((projection.shape[1], paths), dtype=self.dtype)
+        if df is not None:
+            if df <= 2:
+                raise ValueError("Student-t degrees of freedom must be greater than 2")
+            draws *= np.sqrt((df - 2) / self.rng.chisquare(df, paths)).astype(self.dtype)
+
+        drift = (exposures @ mean * horizon_days).astype(self.dtype)[:, None]
+        projection = (projection * math.sqrt(horizon_days)).astype(self.dtype)
+        chunk = max(1, CHUNK_ELEMENTS // paths)
+        parts = []
+        for start in range(0, projection.shape[0], chunk):
+            pnl = projection[start:start + chunk] @ draws
+            pnl += drift[start:start + chunk]
+            parts.append(self._tail(pnl, confidence_levels))
+        return {
+            confidence: (
+                np.concatenate([part[confidence][0] for part in parts]),
+                np.concatenate([part[confidence][1] for part in parts])
+            )
+            for confidence in confidence_levels
+        }
+
+    def _tail(self, pnl: np.ndarray, confidence_levels: Iterable[float]) -> Dict[float, Tuple[np.ndarray, np.ndarray]]:
+        observations = pnl.shape[-1]
+        result = {}
+        for confidence in confidence_levels:
+            count = max(1, math.ceil((1 - confidence) * observations))
+            tail = np.partition(pnl, count - 1, axis=-1)[..., :count]
+            result[confidence] = (
+                -tail.max(axis=-1).astype(np.float64),
+                -tail.mean(axis=-1, dtype=np.float64)
+            )
+        return result
+
+def factor_loadings(cov: np.ndarray, tolerance: float = 1e-12) -> np.ndarray:
+    values, vectors = np.linalg.eigh(cov)
+    keep = values > tolerance * max(values.max(initial=0.0), tolerance)
+    if not keep.any():
+        return np.zeros((cov.shape[0], 1))
+    return vectors[:, keep] * np.sqrt(values[keep])
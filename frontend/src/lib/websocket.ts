@@ -7,15 +7,27 @@ class WebSocketManager {
   private maxReconnectAttempts = 5
   private reconnectDelay = 1000
   private url: string
+  private authenticated: boolean
 
-  constructor(url: string) {
+  constructor(url: string, authenticated = false) {
     this.url = url
+    this.authenticated = authenticated
   }
 
   connect() {
     if (this.ws?.readyState === WebSocket.OPEN) return
 
-    this.ws = new WebSocket(this.url)
+    let url = this.url
+    if (this.authenticated) {
+      const token = localStorage.getItem('access_token')
+      if (!token) {
+        console.error('WebSocket requires an access token')
+        return
+      }
+      url = `${url}?token=${encodeURIComponent(token)}`
+    }
+
+    this.ws = new WebSocket(url)
 
     this.ws.onopen = () => {
       console.log('WebSocket connected')
@@ -24,10 +36,13 @@ class WebSocketManager {
 
     this.ws.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data)
-        const channel = data.channel || 'default'
-        const handlers = this.handlers.get(channel)
-        handlers?.forEach((handler) => handler(data))
+        const payload = JSON.parse(event.data)
+        const messages = Array.isArray(payload) ? payload : [payload]
+        messages.forEach((data) => {
+          const channel = data.channel || 'default'
+          const handlers = this.handlers.get(channel)
+          handlers?.forEach((handler) => handler(data))
+        })
       } catch (error) {
         console.error('WebSocket message parse error:', error)
       }
@@ -86,5 +101,5 @@ class WebSocketManager {
 const WS_URL = import.meta.env.VITE_WS_URL || 'ws://localhost:8000'
 
 export const marketDataWS = new WebSocketManager(`${WS_URL}/ws/market-data`)
-export const ordersWS = new WebSocketManager(`${WS_URL}/ws/orders`)
+export const ordersWS = new WebSocketManager(`${WS_URL}/ws/orders`, true)
 export const signalsWS = new WebSocketManager(`${WS_URL}/ws/signals`)
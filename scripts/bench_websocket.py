@@ -0,0 +1,291 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import msgpack
+import orjson
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+class SyntheticTransport:
+    def __init__(self, symbols: List[str], rate: int, batch_size: int):
+        self.symbols = symbols
+        self.batch_size = batch_size
+        self.frame_interval = batch_size / rate
+        self.next_frame = 0.0
+        self.sent = 0
+
+    async def connect(self):
+        self.next_frame = time.monotonic()
+
+    async def recv(self) -> bytes:
+        delay = self.next_frame - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.next_frame += self.frame_interval
+
+        now_ms = int(time.time() * 1000)
+        events = []
+        for symbol in random.choices(self.symbols, k=self.batch_size):
+            bid = round(100 + random.random(), 2)
+            events.append({
+                "ev": "Q",
+                "sym": symbol,
+                "bp": bid,
+                "ap": round(bid + 0.01, 2),
+                "bs": random.randint(1, 10) * 100,
+                "as": random.randint(1, 10) * 100,
+                "t": now_ms
+            })
+        self.sent += len(events)
+        return orjson.dumps(events)
+
+    async def send(self, message: Dict[str, Any]):
+        pass
+
+    async def close(self):
+        pass
+
+def run_server(args: argparse.Namespace):
+    os.environ["WEBSOCKET_BACKPLANE"] = "local"
+    import uvicorn
+    from backend.main import app
+    from backend.core.events import websocket_manager
+    from backend.services.data_streamer import DataStreamer
+
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    websocket_manager.streamer_factory = lambda: DataStreamer(
+        transport_factory=lambda: SyntheticTransport(symbols, args.rate, args.feed_batch)
+    )
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await websocket_manager.start()
+        yield
+        await websocket_manager.stop()
+
+    app.router.lifespan_context = lifespan
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", ws_max_queue=1024)
+
+async def run_clients(args: argparse.Namespace, count: int, seed: int, done: Any) -> Dict[str, Any]:
+    import websockets
+    from backend.core.events import MSG_KEYFRAME, MSG_SYMBOL, TIMESTAMP_FIELD
+
+    rng = random.Random(seed)
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    url = f"ws://127.0.0.1:{args.port}/ws/market-data"
+    if args.encoding == "msgpack":
+        url += "?encoding=msgpack"
+
+    stats = {"connected": 0, "errors": 0, "messages": 0, "frames": 0, "bytes": 0}
+    latencies: List[float] = []
+    measuring = False
+    connect_gate = asyncio.Semaphore(200)
+
+    def record(timestamp: Optional[int], now_ms: float):
+        if not measuring or not timestamp:
+            return
+        stats["messages"] += 1
+        if len(latencies) < args.max_samples:
+            latencies.append(now_ms - timestamp)
+        elif rng.random() < 0.01:
+            latencies[rng.randrange(len(latencies))] = now_ms - timestamp
+
+    async def client():
+        try:
+            async with connect_gate:
+                ws = await websockets.connect(url, max_size=None, compression=None, open_timeout=60)
+            stats["connected"] += 1
+        except Exception:
+            stats["errors"] += 1
+            return
+
+        baselines: Dict[int, int] = {}
+        try:
+            await ws.send(orjson.dumps({
+                "action": "subscribe",
+                "symbols": rng.sample(symbols, min(args.subscriptions, len(symbols)))
+            }).decode())
+            async for frame in ws:
+                now_ms = time.time() * 1000
+                if measuring:
+                    stats["frames"] += 1
+                    stats["bytes"] += len(frame)
+                if isinstance(frame, bytes):
+                    for item in msgpack.unpackb(frame, strict_map_key=False):
+                        if not isinstance(item, list) or item[0] == MSG_SYMBOL:
+                            continue
+                        fields = item[2]
+                        if TIMESTAMP_FIELD not in fields:
+                            continue
+                        timestamp = fields[TIMESTAMP_FIELD]
+                        if item[0] != MSG_KEYFRAME:
+                            timestamp += baselines.get(item[1], 0)
+                        baselines[item[1]] = timestamp
+                        record(timestamp, now_ms)
+                else:
+                    payload = orjson.loads(frame)
+                    for message in payload if isinstance(payload, list) else [payload]:
+                        if message.get("type") == "quote":
+                            record(message["data"].get("timestamp"), now_ms)
+        except Exception:
+            pass
+        finally:
+            await ws.close()
+
+    tasks = [asyncio.create_task(client()) for _ in range(count)]
+    await asyncio.sleep(args.warmup)
+    measuring = True
+    started = time.monotonic()
+    await asyncio.sleep(args.duration)
+    measuring = False
+    elapsed = time.monotonic() - started
+    await asyncio.get_running_loop().run_in_executor(None, done.wait)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {**stats, "elapsed": elapsed, "latencies": latencies}
+
+def client_process(args: argparse.Namespace, count: int, seed: int, done: Any, results: multiprocessing.Queue):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    results.put(asyncio.run(run_clients(args, count, seed, done)))
+
+def read_process_usage(pid: int) -> Dict[str, Optional[float]]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open(f"/proc/{pid}/status") as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        return {"cpu_seconds": cpu_seconds, "rss_mb": rss_kb / 1024}
+    except (OSError, StopIteration):
+        return {"cpu_seconds": None, "rss_mb": None}
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def wait_for_server(port: int, timeout: float = 120.0):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Benchmark server did not start on port {port}")
+
+def fetch_server_stats(port: int) -> Optional[Dict[str, Any]]:
+    import httpx
+    from backend.core.security import create_access_token
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+    try:
+        stats = httpx.get(f"http://127.0.0.1:{port}/ws/stats", headers=headers, timeout=30).json()
+    except Exception:
+        return None
+    stats.pop("per_connection", None)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket fan-out load test for WebSocketManager")
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--symbols", type=int, default=2000)
+    parser.add_argument("--subscriptions", type=int, default=10, help="symbols per connection")
+    parser.add_argument("--rate", type=int, default=50000, help="synthetic feed ticks per second")
+    parser.add_argument("--feed-batch", type=int, default=100, help="ticks per synthetic feed frame")
+    parser.add_argument("--encoding", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=10.0)
+    parser.add_argument("--client-procs", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--max-samples", type=int, default=200000, help="latency samples kept per client process")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", type=str, default=None, help="write JSON results to this file")
+    args = parser.parse_args()
+
+    server = multiprocessing.Process(target=run_server, args=(args,), daemon=True)
+    server.start()
+    wait_for_server(args.port)
+
+    done = multiprocessing.Event()
+    results: multiprocessing.Queue = multiprocessing.Queue()
+    per_proc = [args.connections // args.client_procs] * args.client_procs
+    per_proc[0] += args.connections - sum(per_proc)
+    clients = [
+        multiprocessing.Process(target=client_process, args=(args, count, seed, done, results))
+        for seed, count in enumerate(per_proc)
+    ]
+    for proc in clients:
+        proc.start()
+
+    time.sleep(args.warmup)
+    usage_start = read_process_usage(server.pid)
+    time.sleep(args.duration)
+    usage_end = read_process_usage(server.pid)
+    server_stats = fetch_server_stats(args.port)
+    done.set()
+
+    outcomes = [results.get() for _ in clients]
+    for proc in clients:
+        proc.join()
+    server.terminate()
+    server.join()
+
+    latencies = sorted(value for outcome in outcomes for value in outcome["latencies"])
+    elapsed = max(outcome["elapsed"] for outcome in outcomes)
+    messages = sum(outcome["messages"] for outcome in outcomes)
+    cpu_percent = None
+    if usage_start["cpu_seconds"] is not None and usage_end["cpu_seconds"] is not None:
+        cpu_percent = (usage_end["cpu_seconds"] - usage_start["cpu_seconds"]) / args.duration * 100
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "clients": {
+            "requested": args.connections,
+            "connected": sum(outcome["connected"] for outcome in outcomes),
+            "errors": sum(outcome["errors"] for outcome in outcomes),
+        },
+        "throughput": {
+            "messages_per_second": messages / elapsed if elapsed else 0.0,
+            "frames_per_second": sum(outcome["frames"] for outcome in outcomes) / elapsed if elapsed else 0.0,
+            "bytes_per_second": sum(outcome["bytes"] for outcome in outcomes) / elapsed if elapsed else 0.0,
+        },
+        "latency_ms": {
+            "samples": len(latencies),
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "p999": percentile(latencies, 99.9),
+            "max": latencies[-1] if latencies else None,
+        },
+        "server": {
+            "rss_mb": usage_end["rss_mb"],
+            "cpu_percent": cpu_percent,
+            "dropped": server_stats.get("dropped") if server_stats else None,
+            "conflated": server_stats.get("conflated") if server_stats else None,
+            "stats": server_stats,
+        },
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
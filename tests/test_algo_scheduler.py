@@ -0,0 +1,50 @@
+import asyncio
+from backend.services.algo_scheduler import AlgoScheduler
+
+class FakeEngine:
+    def __init__(self):
+        self.children = []
+        self.closed = {}
+
+    async def submit_child_order(self, parent, qty, index):
+        child = {"client_order_id": f"{parent['client_order_id']}-{index}", "qty": qty, "filled_qty": 0.0, "status": "filled"}
+        self.children.append(child)
+        return child
+
+    def record_algo_progress(self, parent):
+        if parent["client_order_id"] == "bad":
+            raise TimeoutError("broker throttle timed out")
+
+    async def close_algo_order(self, parent, status):
+        self.scheduler.remove(parent["client_order_id"])
+        parent["status"] = status
+        self.closed[parent["client_order_id"]] = status
+
+def parent(order_id: str):
+    return {
+        "client_order_id": order_id,
+        "symbol": "AAPL",
+        "qty": 4.0,
+        "side": "buy",
+        "type": "twap",
+        "status": "accepted",
+        "filled_qty": 0.0
+    }
+
+async def test_failing_slice_only_fails_its_own_order():
+    engine = FakeEngine()
+    scheduler = engine.scheduler = AlgoScheduler(engine, tick=0.01)
+    orders = [parent("bad"), parent("good")]
+    for order_data in orders:
+        scheduler.prepare(order_data, {"duration": 0.2, "interval": 0.05})
+        scheduler.add(order_data)
+
+    await scheduler.start()
+    await asyncio.sleep(0.3)
+    await scheduler.stop()
+
+    assert engine.closed["bad"] == "rejected"
+    assert "broker throttle timed out" in orders[0]["reject_reason"]
+    assert orders[1]["algo"]["slices_sent"] >= 3
+    assert "good" not in engine.closed or engine.closed["good"] == "expired"
+    assert scheduler.stats["slice_errors"] == 1
@@ -0,0 +1,128 @@
+import asyncio
+import fakeredis
+import msgpack
+import orjson
+import pytest
+from backend.core.backplane import RedisBackplane
+from backend.core.config import settings
+from backend.core.events import WebSocketManager
+
+class FakeStreamer:
+    def __init__(self, node: str):
+        self.node = node
+        self.running = False
+
+    async def start(self):
+        self.running = True
+
+    async def stop(self):
+        self.running = False
+
+    async def subscribe(self, symbols):
+        pass
+
+    async def unsubscribe(self, symbols):
+        pass
+
+    async def get_updated_quotes(self):
+        return {"AAPL": {"symbol": "AAPL", "bid": 1.0, "ask": 1.1, "node": self.node}}
+
+def backplane(client, ttl: float = 0.3) -> RedisBackplane:
+    node = RedisBackplane(client=client)
+    node.leader_ttl_ms = int(ttl * 1000)
+    return node
+
+async def test_lease_fails_over_without_extending_the_new_leader():
+    client = fakeredis.FakeAsyncRedis()
+    first, second = backplane(client, 0.1), backplane(client, 5.0)
+
+    assert await first.acquire_leadership()
+    assert not await second.acquire_leadership()
+    assert await first.acquire_leadership()
+
+    await asyncio.sleep(0.15)
+    assert not first.holds_lease()
+    assert await second.acquire_leadership()
+    assert not await first.acquire_leadership()
+    assert await client.pttl(first.leader_key) > 1000
+
+    await first.release_leadership()
+    assert (await client.get(second.leader_key)).decode() == second.node_id
+
+async def manager(client) -> WebSocketManager:
+    node = WebSocketManager()
+    node.backplane = backplane(client)
+    node.streamer_factory = lambda: FakeStreamer(node.backplane.node_id)
+    await node.start()
+    return node
+
+async def test_only_the_leader_publishes_quotes(monkeypatch):
+    monkeypatch.setattr(settings, "WEBSOCKET_LEADER_TTL", 0.3)
+    monkeypatch.setattr(settings, "WEBSOCKET_FLUSH_INTERVAL_MS", 10)
+    client = fakeredis.FakeAsyncRedis()
+    nodes = [await manager(client) for _ in range(3)]
+    try:
+        await asyncio.sleep(0.2)
+        leaders = [node for node in nodes if node.is_leader]
+        assert len(leaders) == 1
+        assert all(node.data_streamer is None for node in nodes if not node.is_leader)
+
+        seen = []
+        for node in nodes:
+            node.add_quote_listener(lambda updates: _record(seen, updates))
+        await asyncio.sleep(0.1)
+        assert seen and {quote["node"] for quote in seen} == {leaders[0].backplane.node_id}
+
+        await leaders[0].stop()
+        nodes.remove(leaders[0])
+        await asyncio.sleep(0.3)
+        followers = [node for node in nodes if node.is_leader]
+        assert len(followers) == 1
+        seen.clear()
+        await asyncio.sleep(0.1)
+        assert seen and {quote["node"] for quote in seen} == {followers[0].backplane.node_id}
+    finally:
+        for node in nodes:
+            await node.stop()
+
+async def _record(seen, updates):
+    seen.extend(updates.values())
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def accept(self):
+        pass
+
+    async def send_bytes(self, frame):
+        self.frames.append(frame)
+
+    async def send_text(self, frame):
+        self.frames.append(frame)
+
+    async def close(self):
+        pass
+
+async def test_channel_messages_are_packed_once_per_broadcast(monkeypatch):
+    node = WebSocketManager()
+    sockets = [FakeWebSocket(), FakeWebSocket(), FakeWebSocket()]
+    await node.connect(sockets[0], "signals", "msgpack")
+    await node.connect(sockets[1], "signals", "msgpack")
+    await node.connect(sockets[2], "signals")
+    await asyncio.sleep(0.01)
+    for websocket in sockets:
+        websocket.frames.clear()
+
+    packs = []
+    packb = msgpack.packb
+    monkeypatch.setattr(msgpack, "packb", lambda obj: packs.append(obj) or packb(obj))
+    await node._on_backplane_message("signals", orjson.dumps({"type": "signal", "symbol": "AAPL"}))
+    await asyncio.sleep(0.01)
+
+    assert len(packs) == 1
+    assert sockets[0].frames == sockets[1].frames
+    assert msgpack.unpackb(sockets[0].frames[0]) == [{"type": "signal", "symbol": "AAPL"}]
+    assert orjson.loads(sockets[2].frames[0]) == {"type": "signal", "symbol": "AAPL"}
+    for websocket in sockets:
+        await node.disconnect(websocket, "signals")
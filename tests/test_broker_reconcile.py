@@ -0,0 +1,175 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import time
+import pytest
+from alpaca.common.exceptions import APIError
+from backend.core.config import settings
+from backend.services.broker_throttle import BrokerThrottle
+from backend.services.execution_engine import BROKER_BOOK, ExecutionEngine
+from backend.services.position_keeper import PositionKeeper
+
+class FakeAlpaca:
+    def __init__(self):
+        self.cash = "25000"
+        self.positions = [
+            SimpleNamespace(symbol="AAPL", qty="10", side="long", avg_entry_price="150", current_price="160"),
+            SimpleNamespace(symbol="TSLA", qty="-5", side="short", avg_entry_price="200", current_price="190")
+        ]
+        self.submitted = []
+        self.order_requests = []
+
+    def get_account(self):
+        return SimpleNamespace(cash=self.cash, buying_power="50000", last_equity="25500", initial_margin="1200")
+
+    def get_all_positions(self):
+        return list(self.positions)
+
+    def get_orders(self, request):
+        self.order_requests.append(request)
+        return [broker_order("remote-2", 12), broker_order("local-1", 11), broker_order("remote-1", 10)]
+
+    def submit_order(self, request):
+        self.submitted.append(request)
+        return SimpleNamespace(id="broker-1", status=SimpleNamespace(value="accepted"))
+
+def broker_order(client_order_id: str, minute: int):
+    return SimpleNamespace(
+        id=f"broker-{client_order_id}",
+        client_order_id=client_order_id,
+        symbol="AAPL",
+        qty="1",
+        side=SimpleNamespace(value="buy"),
+        order_type=SimpleNamespace(value="market"),
+        status=SimpleNamespace(value="filled"),
+        filled_qty="1",
+        filled_avg_price="150",
+        limit_price=None,
+        stop_price=None,
+        created_at=datetime(2026, 1, 2, 15, minute, tzinfo=timezone.utc),
+        updated_at=None
+    )
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = ExecutionEngine()
+    engine.alpaca = FakeAlpaca()
+    engine.throttles["alpaca"] = BrokerThrottle("alpaca", 1000.0)
+    engine.position_keeper = PositionKeeper(shared_account=BROKER_BOOK)
+    engine.risk_gate.keeper = engine.position_keeper
+    monkeypatch.setattr(engine, "_sync_symbol_watch", _noop)
+    yield engine
+    engine.broker_executor.shutdown(wait=False)
+
+async def _noop(symbol):
+    pass
+
+async def test_reconcile_seeds_broker_positions_and_cash(engine):
+    await engine.reconcile_broker()
+
+    account = engine.position_keeper.get_account("u1")
+    assert account["cash"] == 25000
+    assert account["market_value"] == pytest.approx(10 * 160 - 5 * 190)
+    positions = {position["symbol"]: position for position in await engine.get_positions("u2")}
+    assert positions["AAPL"]["qty"] == 10
+    assert positions["TSLA"]["qty"] == -5
+    assert positions["AAPL"]["unrealized_pl"] == pytest.approx(100)
+
+    engine.alpaca.positions.pop()
+    engine.alpaca.cash = "24000"
+    await engine.reconcile_broker()
+    assert [position["symbol"] for position in await engine.get_positions("u1")] == ["AAPL"]
+    assert engine.position_keeper.get_account("u1")["cash"] == 24000
+
+async def test_close_position_held_before_startup(engine):
+    await engine.reconcile_broker()
+    await engine.close_position("TSLA", "u1")
+
+    request = engine.alpaca.submitted[0]
+    assert request.symbol == "TSLA"
+    assert request.qty == 5
+    assert request.side.value == "buy"
+
+def local_order(client_order_id: str, user_id: str, minute: int, status: str = "accepted"):
+    return {
+        "id": f"broker-{client_order_id}",
+        "client_order_id": client_order_id,
+        "user_id": user_id,
+        "symbol": "AAPL",
+        "status": status,
+        "created_at": f"2026-01-02T15:{minute:02d}:00"
+    }
+
+async def test_get_orders_lists_only_owned_broker_orders(engine):
+    engine.order_store.add(local_order("local-0", "u1", 9))
+    engine.order_store.add(local_order("local-1", "u1", 11))
+    engine.order_store.add(local_order("remote-2", "u2", 12))
+
+    orders = await engine.get_orders("u1")
+    assert [order["client_order_id"] for order in orders] == ["local-1", "local-0"]
+    assert orders[0]["status"] == "filled"
+    assert engine.order_store.get("local-1")["status"] == "accepted"
+
+    assert [order["client_order_id"] for order in await engine.get_orders("u1", status="filled")] == ["local-1"]
+    assert [order["client_order_id"] for order in await engine.get_orders("u1", status="accepted")] == ["local-0"]
+
+    orders = await engine.get_orders("u1", before="local-1")
+    assert [order["client_order_id"] for order in orders] == ["local-0"]
+    assert engine.alpaca.order_requests[-1].until == datetime(2026, 1, 2, 15, 11)
+
+    assert await engine.get_orders("u1", before="remote-2") == []
+    assert await engine.get_order("remote-2", "u1") is None
+    assert await engine.get_order("broker-remote-1", "u1") is None
+    assert (await engine.get_order("local-1", "u1"))["user_id"] == "u1"
+
+async def test_broker_statuses_are_normalised(engine):
+    engine.alpaca.submit_order = lambda request: SimpleNamespace(id="broker-1", status=SimpleNamespace(value="pending_new"))
+    order = await engine.place_order("u1", "AAPL", 1, "buy")
+    assert order["status"] == "accepted"
+    assert [order["client_order_id"] for order in await engine.get_orders("u1", status="accepted")] == [order["client_order_id"]]
+
+def not_found():
+    return APIError('{"code": 40410000, "message": "order not found"}', SimpleNamespace(response=SimpleNamespace(status_code=404)))
+
+async def test_submit_timeout_leaves_order_pending_until_resolved(engine, monkeypatch):
+    monkeypatch.setattr(settings, "BROKER_CALL_TIMEOUT", 0.05)
+    engine.alpaca.submit_order = lambda request: time.sleep(0.2)
+    order = await engine.place_order("u1", "AAPL", 1, "buy", client_order_id="slow-1")
+    assert order["status"] == "pending"
+    assert "reject_reason" not in order
+    assert await engine.place_order("u1", "AAPL", 1, "buy", client_order_id="slow-1") is order
+
+    engine.alpaca.get_order_by_client_id = lambda order_id: SimpleNamespace(id="broker-slow-1", status=SimpleNamespace(value="new"))
+    await engine.resolve_order(order)
+    assert order["status"] == "accepted"
+    assert order["id"] == "broker-slow-1"
+    assert await engine.get_order("broker-slow-1", "u1") is order
+    assert not engine.unresolved_orders
+
+async def test_submit_timeout_rejected_once_broker_has_no_order(engine, monkeypatch):
+    monkeypatch.setattr(settings, "BROKER_CALL_TIMEOUT", 0.05)
+    engine.alpaca.submit_order = lambda request: time.sleep(0.2)
+    order = await engine.place_order("u1", "AAPL", 1, "buy", client_order_id="slow-2")
+
+    def get_order_by_client_id(order_id):
+        raise not_found()
+    engine.alpaca.get_order_by_client_id = get_order_by_client_id
+    await engine.reconcile_broker()
+    assert order["status"] == "rejected"
+    assert order["reject_reason"] == "Order was not received by the broker"
+
+async def test_portfolio_summary_reads_reconciled_book(engine, monkeypatch):
+    from backend.services.risk_engine import RiskEngine
+    await engine.reconcile_broker()
+    risk_engine = RiskEngine()
+    risk_engine.execution_engine = engine
+    monkeypatch.setattr(engine.alpaca, "get_account", None)
+
+    summary = await risk_engine.get_portfolio_summary("u1")
+    assert summary["cash"] == 25000
+    assert summary["buying_power"] == 50000
+    assert summary["margin_used"] == 1200
+    assert summary["account_value"] == pytest.approx(25000 + 10 * 160 - 5 * 190)
+    assert summary["total_pl_percent"] == pytest.approx(summary["total_pl"] / 25500 * 100)
+
+    metrics = await risk_engine.calculate_risk_metrics("u1")
+    assert metrics["portfolio_value"] == summary["account_value"]
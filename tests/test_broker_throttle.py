@@ -0,0 +1,40 @@
+import asyncio
+import time
+import fakeredis
+from backend.services.broker_throttle import BrokerThrottle, RedisRateLimiter, PRIORITY_ORDER
+
+async def test_processes_share_one_redis_budget():
+    client = fakeredis.FakeAsyncRedis()
+    throttles = [
+        BrokerThrottle("alpaca", 20.0, 2, RedisRateLimiter("alpaca", 20.0, 2, client=client))
+        for _ in range(2)
+    ]
+    started = time.monotonic()
+    await asyncio.gather(*(throttles[index % 2].acquire(PRIORITY_ORDER) for index in range(8)))
+    elapsed = time.monotonic() - started
+
+    assert elapsed >= 0.25
+    assert sum(throttle.limiter.stats["taken"] for throttle in throttles) == 8
+
+async def test_redis_outage_falls_back_to_local_bucket():
+    class BrokenScript:
+        async def __call__(self, keys, args):
+            raise ConnectionError("redis down")
+
+    class BrokenRedis:
+        def register_script(self, script):
+            return BrokenScript()
+
+    throttle = BrokerThrottle("alpaca", 10.0, 1, RedisRateLimiter("alpaca", 100.0, 3, client=BrokenRedis()))
+    started = time.monotonic()
+    await asyncio.wait_for(asyncio.gather(*(throttle.acquire() for _ in range(3))), timeout=1)
+    assert time.monotonic() - started >= 0.18
+    assert throttle.limiter.stats["errors"] == 1
+
+async def test_redis_budget_is_not_capped_by_local_share():
+    client = fakeredis.FakeAsyncRedis()
+    throttle = BrokerThrottle("alpaca", 1.0, 1, RedisRateLimiter("alpaca", 100.0, 5, client=client))
+    started = time.monotonic()
+    await asyncio.wait_for(asyncio.gather(*(throttle.acquire() for _ in range(5))), timeout=1)
+    assert time.monotonic() - started < 0.5
+    assert throttle.limiter.stats["taken"] == 5
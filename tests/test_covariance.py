@@ -0,0 +1,84 @@
+import math
+import numpy as np
+import pytest
+from backend.services.covariance import CovarianceService
+
+def sampled_service(path, closes):
+    service = CovarianceService(path=path, decay=0.9, bar_seconds=60, benchmark="SPY")
+    for bar in closes:
+        service.closes.update(bar)
+        service._fresh.update(bar)
+        service.sample(now=1.0)
+    return service
+
+def test_ewma_update_decays_and_adds_the_latest_outer_product(tmp_path):
+    service = sampled_service(tmp_path / "covariance.npz", [{"SPY": 100.0, "AAPL": 50.0}])
+    assert sorted(service.symbols) == ["AAPL", "SPY"]
+    assert not service.matrix.any()
+
+    service.closes.update({"SPY": 101.0, "AAPL": 49.0})
+    service._fresh.update(["SPY", "AAPL"])
+    service.sample(now=2.0)
+    first = np.array([math.log(101 / 100), math.log(49 / 50)])
+    spy, aapl = service.index["SPY"], service.index["AAPL"]
+    expected = np.outer(first, first) * 0.1
+    assert service.matrix[np.ix_([spy, aapl], [spy, aapl])] == pytest.approx(expected)
+
+    service.closes["SPY"] = 99.0
+    service._fresh.add("SPY")
+    service.sample(now=3.0)
+    second = np.array([math.log(99 / 101), 0.0])
+    expected = expected * 0.9 + np.outer(second, second) * 0.1
+    assert service.matrix[np.ix_([spy, aapl], [spy, aapl])] == pytest.approx(expected)
+
+    snapshot = service.snapshot
+    assert snapshot.bars == 3
+    assert snapshot.updated_at == 3.0
+    assert snapshot.covariance(["SPY", "AAPL"]) == pytest.approx(expected)
+    assert snapshot.volatility("SPY") == pytest.approx(math.sqrt(expected[0, 0] * service.bars_per_year))
+    assert snapshot.betas(["AAPL"], "SPY") == pytest.approx([expected[1, 0] / expected[0, 0]])
+    assert not snapshot.matrix.flags.writeable
+
+def test_new_symbols_grow_the_matrix_without_a_spurious_return(tmp_path):
+    service = sampled_service(tmp_path / "covariance.npz", [{"SPY": 100.0}, {"SPY": 102.0}])
+    before = service.matrix.copy()
+
+    service.closes["MSFT"] = 400.0
+    service._fresh.add("MSFT")
+    service.sample(now=3.0)
+    assert service.matrix.shape == (2, 2)
+    assert service.matrix[0, 0] == pytest.approx(before[0, 0] * 0.9)
+    assert service.matrix[1].tolist() == [0.0, 0.0]
+
+    service.sample(now=4.0)
+    assert service.stats["skipped_bars"] == 1
+    assert service.bars == 3
+
+async def test_only_the_lock_holder_writes_the_cache(tmp_path):
+    path = tmp_path / "covariance.npz"
+    first = sampled_service(path, [{"SPY": 100.0}, {"SPY": 101.0}])
+    second = sampled_service(path, [{"SPY": 100.0}, {"SPY": 99.0}, {"SPY": 98.0}])
+
+    first.save()
+    second.save()
+    assert first.get_stats()["writer"] and not second.get_stats()["writer"]
+    assert second.stats["saves"] == 0
+
+    loaded = CovarianceService(path=path)
+    loaded.load()
+    assert loaded.bars == 2
+    assert [entry.name for entry in tmp_path.iterdir() if entry.suffix == ".tmp"] == []
+
+    await first.stop()
+    second.save()
+    assert second.stats["saves"] == 1
+
+async def test_stop_logs_save_failures(tmp_path, monkeypatch, capsys):
+    service = sampled_service(tmp_path / "covariance.npz", [{"SPY": 100.0}])
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(np, "savez", fail)
+    await service.stop()
+    assert "disk full" in capsys.readouterr().out
+    assert [entry.name for entry in tmp_path.iterdir() if entry.suffix == ".tmp"] == []
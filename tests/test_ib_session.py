@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+from backend.core.config import settings
+from backend.services.data_streamer import DataStreamer
+from backend.services.ib_session import ClientIdPool, IBSession
+
+class FakeEvent:
+    def __init__(self):
+        self.handlers = []
+
+    def __iadd__(self, handler):
+        self.handlers.append(handler)
+        return self
+
+    def __isub__(self, handler):
+        self.handlers.remove(handler)
+        return self
+
+    def emit(self):
+        for handler in list(self.handlers):
+            handler()
+
+class FakeTWS:
+    def __init__(self, busy_ids=()):
+        self.busy_ids = set(busy_ids)
+        self.clients = []
+
+    def factory(self):
+        client = FakeIB(self)
+        self.clients.append(client)
+        return client
+
+class FakeIB:
+    def __init__(self, tws: FakeTWS):
+        self.tws = tws
+        self.disconnectedEvent = FakeEvent()
+        self.client_id = None
+        self.tickers = {}
+        self.disconnected = False
+
+    async def connectAsync(self, host, port, clientId, timeout, readonly):
+        if clientId in self.tws.busy_ids:
+            raise ConnectionError(f"client id {clientId} already in use")
+        self.client_id = clientId
+
+    def reqMktData(self, contract, *args):
+        ticker = self.tickers[contract.symbol] = SimpleNamespace(
+            contract=contract, time=None, bid=float("nan"), ask=float("nan"), bidSize=-1, askSize=-1,
+            last=float("nan"), lastSize=-1, volume=float("nan"), vwap=float("nan"), close=float("nan")
+        )
+        return ticker
+
+    def ticker(self, contract):
+        return self.tickers.get(contract.symbol)
+
+    def cancelMktData(self, contract):
+        self.tickers.pop(contract.symbol, None)
+
+    async def reqCurrentTimeAsync(self):
+        return datetime.now(timezone.utc)
+
+    def disconnect(self):
+        self.disconnected = True
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(settings, "IB_RECONNECT_MIN_DELAY", 0.01)
+    monkeypatch.setattr(settings, "IB_CONNECT_TIMEOUT", 0.5)
+    monkeypatch.setattr(settings, "IB_MARKET_DATA_POLL_INTERVAL", 0.01)
+
+async def wait_for(predicate, timeout=1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.005)
+
+async def test_busy_client_id_is_skipped_and_returned_to_pool():
+    tws = FakeTWS(busy_ids={1})
+    pool = ClientIdPool([1, 2, 3])
+    session = IBSession(pool=pool, ib_factory=tws.factory)
+    await session.start()
+    try:
+        await session.get_ib()
+        assert session.client_id == 2
+        assert pool.leased == {2}
+        assert list(pool.free) == [3, 1]
+    finally:
+        await session.stop()
+    assert pool.leased == set()
+
+async def test_reconnect_restores_market_data():
+    tws = FakeTWS()
+    pool = ClientIdPool([1, 2])
+    session = IBSession(pool=pool, ib_factory=tws.factory)
+    streamer = DataStreamer(ib_session=session)
+    await streamer.start()
+    try:
+        await session.get_ib()
+        await streamer.subscribe(["AAPL"])
+        first = tws.clients[-1]
+        assert "AAPL" in first.tickers
+
+        first.disconnectedEvent.emit()
+        await wait_for(lambda: session.stats["connects"] == 2 and session.connected)
+        second = tws.clients[-1]
+        assert second is not first and first.disconnected
+        assert "AAPL" in second.tickers
+        assert session.client_id == 2 and pool.leased == {2}
+
+        ticker = second.tickers["AAPL"]
+        ticker.bid, ticker.ask, ticker.bidSize, ticker.askSize = 189.9, 190.1, 3, 4
+        ticker.time = datetime(2026, 1, 2, 15, 0, tzinfo=timezone.utc)
+        await wait_for(lambda: "AAPL" in streamer.latest_quotes)
+        updates = await streamer.get_updated_quotes()
+        assert updates["AAPL"]["bid"] == 189.9
+        assert updates["AAPL"]["last"] == 0.0
+
+        await streamer.unsubscribe(["AAPL"])
+        assert "AAPL" not in second.tickers
+        assert session.market_data == {}
+    finally:
+        await streamer.stop()
+        await session.stop()
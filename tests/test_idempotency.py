@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+from backend.services.execution_engine import ExecutionEngine
+from backend.services.idempotency import IdempotencyIndex
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = ExecutionEngine()
+    engine.risk_gate.enabled = False
+
+    async def noop(symbol):
+        pass
+    monkeypatch.setattr(engine, "_sync_symbol_watch", noop)
+    yield engine
+    engine.broker_executor.shutdown(wait=False)
+
+def counting_submit(calls, result="order", delay=0.05):
+    async def submit():
+        calls.append(result)
+        await asyncio.sleep(delay)
+        return {"id": result}
+    return submit
+
+async def test_in_flight_duplicates_are_coalesced():
+    index = IdempotencyIndex(ttl=60.0)
+    calls = []
+    first, second, third = await asyncio.gather(*(index.run(("u1", "c1"), counting_submit(calls)) for _ in range(3)))
+
+    assert calls == ["order"]
+    assert first is second is third
+    assert index.get_stats()["submitted"] == 1
+    assert index.get_stats()["coalesced"] == 2
+
+    assert await index.run(("u1", "c1"), counting_submit(calls)) is first
+    assert index.stats["replayed"] == 1
+    assert await index.run(("u2", "c1"), counting_submit(calls, "other")) == {"id": "other"}
+
+async def test_completed_entries_are_evicted_after_the_ttl():
+    index = IdempotencyIndex(ttl=0.05)
+    calls = []
+    await index.run(("u1", "c1"), counting_submit(calls, delay=0))
+    assert index.get(("u1", "c1")) is not None
+
+    await asyncio.sleep(0.06)
+    assert index.get(("u1", "c1")) is None
+    assert index.stats["evicted"] == 1
+    await index.run(("u1", "c1"), counting_submit(calls, delay=0))
+    assert len(calls) == 2
+
+async def test_in_flight_entries_outlive_the_ttl():
+    index = IdempotencyIndex(ttl=0.01)
+    calls = []
+    pending = asyncio.ensure_future(index.run(("u1", "c1"), counting_submit(calls, delay=0.05)))
+    await asyncio.sleep(0.03)
+    assert index.get(("u1", "c1")) is not None
+    assert await index.run(("u1", "c1"), counting_submit(calls)) is await pending
+    assert calls == ["order"]
+
+async def test_failed_submissions_are_not_replayed():
+    index = IdempotencyIndex(ttl=60.0)
+
+    async def fail():
+        raise Exception("broker down")
+    with pytest.raises(Exception, match="broker down"):
+        await index.run(("u1", "c1"), fail)
+    assert len(index) == 0
+    assert await index.run(("u1", "c1"), counting_submit([], delay=0)) == {"id": "order"}
+
+def slow_submit(engine, monkeypatch, delay=0.05):
+    calls = []
+    submit_order = engine._submit_order
+
+    async def submit(user_id, *args):
+        calls.append(user_id)
+        await asyncio.sleep(delay)
+        return await submit_order(user_id, *args)
+    monkeypatch.setattr(engine, "_submit_order", submit)
+    return calls
+
+async def test_other_user_cannot_take_an_in_flight_client_order_id(engine, monkeypatch):
+    calls = slow_submit(engine, monkeypatch)
+    first = asyncio.create_task(engine.place_order("u1", "AAPL", 1, "buy", client_order_id="dup"))
+    await asyncio.sleep(0)
+    with pytest.raises(Exception, match="already in use"):
+        await engine.place_order("u2", "AAPL", 5, "sell", client_order_id="dup")
+
+    order = await first
+    assert calls == ["u1"]
+    assert engine.order_store.get("dup") is order
+    assert order["user_id"] == "u1"
+    assert engine.order_store.list_orders("u2") == []
+    with pytest.raises(Exception, match="already in use"):
+        engine.order_store.add({**order, "user_id": "u2"})
+
+async def test_failed_submission_releases_the_reservation(engine, monkeypatch):
+    async def fail(*args):
+        raise Exception("broker down")
+    submit_order = engine._submit_order
+    monkeypatch.setattr(engine, "_submit_order", fail)
+    with pytest.raises(Exception, match="broker down"):
+        await engine.place_order("u1", "AAPL", 1, "buy", client_order_id="retry")
+
+    monkeypatch.setattr(engine, "_submit_order", submit_order)
+    order = await engine.place_order("u2", "AAPL", 1, "buy", client_order_id="retry")
+    assert order["user_id"] == "u2"
@@ -0,0 +1,156 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+import asyncio
+import time
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.api import market_data
+from backend.core.config import settings
+from backend.core.events import websocket_manager
+from backend.core.security import get_current_user
+from backend.services.data_streamer import DataStreamer
+from backend.services.options_pricing import option_price, years_to_expiry
+
+EXPIRY = date.today() + timedelta(days=60)
+
+def option_snapshot(strike: float, is_call: bool, volatility: float):
+    price = float(option_price(100.0, strike, years_to_expiry(EXPIRY), volatility, is_call, settings.RISK_FREE_RATE))
+    kind = "C" if is_call else "P"
+    return SimpleNamespace(
+        details=SimpleNamespace(
+            ticker=f"O:AAPL{EXPIRY:%y%m%d}{kind}{int(strike * 1000):08d}",
+            contract_type="call" if is_call else "put",
+            expiration_date=EXPIRY.isoformat(),
+            strike_price=strike
+        ),
+        last_quote=SimpleNamespace(bid=price - 0.01, ask=price + 0.01),
+        last_trade=SimpleNamespace(price=price),
+        day=SimpleNamespace(volume=12, close=price),
+        open_interest=340,
+        underlying_asset=SimpleNamespace(price=99.0)
+    )
+
+class FakeRest:
+    def __init__(self):
+        self.calls = []
+
+    def list_snapshot_options_chain(self, underlying_asset, params=None):
+        self.calls.append(underlying_asset)
+        return iter([option_snapshot(100.0, True, 0.3), option_snapshot(90.0, False, 0.35)])
+
+    def get_last_quote(self, symbol):
+        self.calls.append(symbol)
+        return SimpleNamespace(
+            bid_price=10.0,
+            ask_price=10.2,
+            bid_size=1,
+            ask_size=2,
+            sip_timestamp="2026-01-02T15:00:00"
+        )
+
+def cache_quote(monkeypatch, symbol, quote, age=0.0):
+    monkeypatch.setitem(websocket_manager.latest_quotes, symbol, quote)
+    monkeypatch.setitem(websocket_manager.quote_received_at, symbol, time.time() - age)
+
+def make_client(monkeypatch):
+    rest = FakeRest()
+    monkeypatch.setattr(market_data.data_streamer, "polygon_rest", rest)
+    app = FastAPI()
+    app.include_router(market_data.router, prefix="/api/v1/market-data")
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "u1"}
+    return TestClient(app), rest
+
+def test_quote_served_from_live_cache(monkeypatch):
+    client, rest = make_client(monkeypatch)
+    cache_quote(monkeypatch, "AAPL", {
+        "symbol": "AAPL",
+        "bid": 190.0,
+        "ask": 190.1,
+        "bid_size": 3,
+        "ask_size": 4,
+        "timestamp": "2026-01-02T15:00:00"
+    })
+
+    response = client.get("/api/v1/market-data/quote/AAPL")
+    assert response.status_code == 200
+    assert response.json()["bid"] == 190.0
+    assert rest.calls == []
+
+def test_stale_quote_falls_back_to_rest(monkeypatch):
+    client, rest = make_client(monkeypatch)
+    cache_quote(monkeypatch, "AAPL", {
+        "symbol": "AAPL",
+        "bid": 190.0,
+        "ask": 190.1,
+        "bid_size": 3,
+        "ask_size": 4,
+        "timestamp": "2026-01-02T15:00:00"
+    }, age=settings.MARKET_DATA_QUOTE_MAX_AGE + 1)
+
+    response = client.get("/api/v1/market-data/quote/AAPL")
+    assert response.json()["bid"] == 10.0
+    assert rest.calls == ["AAPL"]
+
+async def test_unwatched_symbols_are_evicted(monkeypatch):
+    cache_quote(monkeypatch, "ZZZZ", {"symbol": "ZZZZ", "bid": 1.0})
+    monkeypatch.setattr(websocket_manager, "backplane", None)
+    await websocket_manager.watch_symbols(["ZZZZ"])
+    await websocket_manager.unwatch_symbols(["ZZZZ"])
+    assert "ZZZZ" not in websocket_manager.latest_quotes
+    assert "ZZZZ" not in websocket_manager.quote_received_at
+
+def test_cold_symbol_falls_back_to_rest(monkeypatch):
+    client, rest = make_client(monkeypatch)
+    monkeypatch.delitem(websocket_manager.latest_quotes, "MSFT", raising=False)
+
+    response = client.get("/api/v1/market-data/quotes", params={"symbols": ["MSFT"]})
+    assert response.status_code == 200
+    assert [quote["ask"] for quote in response.json()] == [10.2]
+    assert rest.calls == ["MSFT"]
+
+def test_option_chain_fills_volatility_and_greeks(monkeypatch):
+    client, rest = make_client(monkeypatch)
+    cache_quote(monkeypatch, "AAPL", {
+        "symbol": "AAPL",
+        "bid": 99.99,
+        "ask": 100.01,
+        "bid_size": 1,
+        "ask_size": 1,
+        "timestamp": "2026-01-02T15:00:00"
+    })
+
+    response = client.get("/api/v1/market-data/options/chain/AAPL")
+    assert response.status_code == 200
+    chain = response.json()
+    assert chain["underlying_price"] == pytest.approx(100.0)
+    call, put = chain["calls"][0], chain["puts"][0]
+    assert call["implied_volatility"] == pytest.approx(0.3, abs=1e-3)
+    assert put["implied_volatility"] == pytest.approx(0.35, abs=1e-3)
+    assert 0.5 < call["delta"] < 0.6
+    assert put["delta"] < 0
+    assert call["open_interest"] == 340
+    assert rest.calls == ["AAPL"]
+
+async def test_malformed_events_are_counted_and_skipped():
+    streamer = DataStreamer(transport_factory=lambda: None)
+    streamer._running = True
+    task = asyncio.create_task(streamer._process_loop())
+    streamer._raw_queue.put_nowait(orjson.dumps([
+        "not-an-event",
+        {"ev": "Q", "sym": "AAPL", "bp": 1.0, "ap": 1.1, "t": None},
+        {"ev": "T", "sym": "AAPL", "p": 1.05, "s": 5, "t": "late"},
+        {"ev": "T", "sym": "MSFT", "p": 300.0, "s": 5, "t": 1}
+    ]))
+    streamer._raw_queue.put_nowait(orjson.dumps([{"ev": "Q", "sym": "TSLA", "bp": 2.0, "ap": 2.1, "t": 2}]))
+    while streamer.stats["messages_processed"] < 5:
+        await asyncio.sleep(0.01)
+    assert not task.done()
+    task.cancel()
+
+    assert streamer.stats["parse_errors"] == 2
+    assert streamer.latest_quotes["AAPL"]["bid"] == 1.0
+    assert streamer.latest_quotes["MSFT"]["last"] == 300.0
+    assert streamer.latest_quotes["TSLA"]["bid"] == 2.0
+    assert await streamer.get_quote("TSLA") is streamer.latest_quotes["TSLA"]
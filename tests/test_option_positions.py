@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+import pytest
+from backend.core.events import websocket_manager
+from backend.services.execution_engine import execution_engine
+from backend.services.position_keeper import PositionKeeper
+from backend.services.risk_engine import RiskEngine
+
+EXPIRY = date.today() + timedelta(days=90)
+CALL = f"O:AAPL{EXPIRY:%y%m%d}C00100000"
+
+def quote(price: float):
+    return {"bid": price - 0.05, "ask": price + 0.05}
+
+@pytest.fixture
+def keeper(monkeypatch):
+    keeper = PositionKeeper(starting_cash=100000.0)
+    monkeypatch.setattr(execution_engine, "position_keeper", keeper)
+    monkeypatch.setitem(websocket_manager.latest_quotes, "AAPL", quote(100.0))
+    monkeypatch.setitem(websocket_manager.latest_quotes, CALL, quote(20.0))
+    return keeper
+
+async def test_option_fill_moves_cash_by_contract_value(keeper):
+    keeper.apply_fill("u1", CALL, "buy", 2, 20.0)
+    account = keeper.get_account("u1")
+    assert account["cash"] == pytest.approx(96000.0)
+    assert account["market_value"] == pytest.approx(4000.0)
+    assert account["equity"] == pytest.approx(100000.0)
+
+    keeper.apply_fill("u1", CALL, "sell", 1, 25.0)
+    account = keeper.get_account("u1")
+    assert account["cash"] == pytest.approx(98500.0)
+    assert account["realized_pl"] == pytest.approx(500.0)
+
+async def test_stress_pnl_matches_option_market_value(keeper):
+    keeper.apply_fill("u1", CALL, "buy", 2, 20.0)
+    market_value = keeper.get_account("u1")["market_value"]
+    result = await RiskEngine().run_stress_test(
+        [{"name": "wipeout", "symbols": {"AAPL": -1.0}}, {"name": "flat"}],
+        include_predefined=False
+    )
+    wipeout, flat = result["accounts"]["u1"]["pnl"]
+    assert wipeout == pytest.approx(-market_value, rel=1e-6)
+    assert flat == pytest.approx(0.0, abs=1e-6)
+
+    greeks = await RiskEngine().calculate_portfolio_greeks("u1")
+    assert greeks["positions"][0]["delta"] == pytest.approx(greeks["delta"])
+    assert 100 < greeks["delta"] < 200
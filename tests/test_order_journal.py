@@ -0,0 +1,58 @@
+from backend.services.order_journal import OrderJournal, RECORD_ORDER
+
+def order(order_id: str):
+    return {
+        "client_order_id": order_id,
+        "user_id": "u1",
+        "symbol": "AAPL",
+        "status": "accepted",
+        "filled_qty": 0.0,
+        "filled_avg_price": 0.0,
+        "updated_at": "2026-01-01T00:00:00"
+    }
+
+async def state():
+    return {"orders": [], "positions": {}}
+
+def recovered_orders(journal: OrderJournal):
+    snapshot, blocks = journal.recover()
+    orders = [order_data["client_order_id"] for order_data in snapshot.get("orders", ())]
+    for block in blocks:
+        orders.extend(record[1]["client_order_id"] for record in block if record[0] == RECORD_ORDER)
+    return orders
+
+async def test_writers_get_separate_directories(tmp_path):
+    first = OrderJournal(tmp_path)
+    second = OrderJournal(tmp_path)
+    first.recover()
+    second.recover()
+    await first.start(state)
+    await second.start(state)
+    assert first.path != second.path
+
+    first.record_order(order("a-1"))
+    await first.flush()
+    second.record_order(order("b-1"))
+    await second.flush()
+    await second.snapshot()
+    await first.stop()
+    await second.stop()
+
+    restored = OrderJournal(tmp_path)
+    assert recovered_orders(restored) == ["a-1"]
+    other = OrderJournal(tmp_path)
+    assert recovered_orders(other) == []
+    await restored.stop()
+    await other.stop()
+
+async def test_slot_is_reused_after_release(tmp_path):
+    journal = OrderJournal(tmp_path)
+    journal.recover()
+    await journal.start(state)
+    journal.record_order(order("a-1"))
+    await journal.stop()
+
+    restarted = OrderJournal(tmp_path)
+    assert recovered_orders(restarted) == ["a-1"]
+    assert restarted.path == journal.path
+    await restarted.stop()
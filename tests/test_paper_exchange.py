@@ -0,0 +1,94 @@
+import pytest
+from backend.services.paper_exchange import PaperExchange
+
+CONFIG = {"slippage_model": "none", "commission_model": "per_share", "commissions": {"stocks": 0.01}}
+
+def order(order_id: str, side: str, qty: float, order_type: str = "market", limit_price=None, stop_price=None):
+    return {
+        "client_order_id": order_id,
+        "symbol": "AAPL",
+        "side": side,
+        "qty": qty,
+        "type": order_type,
+        "limit_price": limit_price,
+        "stop_price": stop_price,
+        "filled_qty": 0
+    }
+
+def quote(bid: float, ask: float, bid_size: float = 100, ask_size: float = 100):
+    return {"bid": bid, "ask": ask, "bid_size": bid_size, "ask_size": ask_size}
+
+def fills_of(fills):
+    return [(fill["order_id"], fill["qty"], fill["price"], fill["liquidity"]) for fill in fills]
+
+def test_market_order_fills_against_displayed_size_across_quotes():
+    exchange = PaperExchange(CONFIG)
+    fills = exchange.submit(order("m1", "buy", 300), quote(99.9, 100.0, ask_size=100))
+    assert fills_of(fills) == [("m1", 100, 100.0, "taker")]
+    assert fills[0]["remaining"] == 200
+    assert fills[0]["commission"] == pytest.approx(1.0)
+
+    fills = exchange.on_quote("AAPL", quote(100.0, 100.1, ask_size=150))
+    assert fills_of(fills) == [("m1", 150, 100.1, "taker")]
+    fills = exchange.on_quote("AAPL", quote(100.0, 100.2, ask_size=500))
+    assert fills_of(fills) == [("m1", 50, 100.2, "taker")]
+    assert fills[0]["remaining"] == 0
+    assert not exchange.has_orders("AAPL")
+
+def test_displayed_size_is_shared_in_time_priority():
+    exchange = PaperExchange(CONFIG)
+    exchange.submit(order("l1", "buy", 80, "limit", limit_price=99.0), quote(98.9, 99.5))
+    exchange.submit(order("l2", "buy", 80, "limit", limit_price=99.0))
+
+    fills = exchange.on_quote("AAPL", quote(98.5, 98.8, ask_size=100))
+    assert fills_of(fills) == [("l1", 80, 99.0, "maker"), ("l2", 20, 99.0, "maker")]
+    fills = exchange.on_quote("AAPL", quote(98.5, 98.8, ask_size=100))
+    assert fills_of(fills) == [("l2", 60, 99.0, "maker")]
+
+def test_marketable_limit_gets_the_better_touch_price():
+    exchange = PaperExchange(CONFIG)
+    fills = exchange.submit(order("b1", "buy", 10, "limit", limit_price=101.0), quote(99.8, 100.0))
+    assert fills_of(fills) == [("b1", 10, 100.0, "taker")]
+
+    fills = exchange.submit(order("s1", "sell", 10, "limit", limit_price=99.0), quote(99.8, 100.0))
+    assert fills_of(fills) == [("s1", 10, 99.8, "taker")]
+
+def test_stop_orders_trigger_at_the_stop_price():
+    exchange = PaperExchange(CONFIG)
+    assert exchange.submit(order("s1", "sell", 10, "stop", stop_price=95.0), quote(96.0, 96.1)) == []
+    assert exchange.submit(order("b1", "buy", 10, "stop", stop_price=105.0)) == []
+
+    assert exchange.on_quote("AAPL", quote(95.5, 95.6)) == []
+    fills = exchange.on_quote("AAPL", quote(94.5, 94.6))
+    assert fills_of(fills) == [("s1", 10, 94.5, "taker")]
+
+    fills = exchange.on_quote("AAPL", quote(104.9, 105.0))
+    assert fills_of(fills) == [("b1", 10, 105.0, "taker")]
+    assert not exchange.has_orders("AAPL")
+
+def test_triggered_stop_limit_rests_at_its_limit():
+    exchange = PaperExchange(CONFIG)
+    exchange.submit(order("sl", "sell", 10, "stop_limit", limit_price=94.0, stop_price=95.0), quote(96.0, 96.1))
+
+    assert exchange.on_quote("AAPL", quote(93.5, 93.6)) == []
+    assert exchange.has_orders("AAPL")
+    fills = exchange.on_quote("AAPL", quote(94.2, 94.3))
+    assert fills_of(fills) == [("sl", 10, 94.0, "maker")]
+
+def test_cancel_removes_a_resting_stop():
+    exchange = PaperExchange(CONFIG)
+    exchange.submit(order("s1", "sell", 10, "stop", stop_price=95.0), quote(96.0, 96.1))
+
+    assert exchange.cancel("s1")
+    assert not exchange.has_orders("AAPL")
+    assert exchange.on_quote("AAPL", quote(90.0, 90.1)) == []
+    assert not exchange.cancel("s1")
+
+def test_cancel_of_one_stop_leaves_the_others_armed():
+    exchange = PaperExchange(CONFIG)
+    exchange.submit(order("s1", "sell", 10, "stop", stop_price=95.0), quote(96.0, 96.1))
+    exchange.submit(order("s2", "sell", 5, "stop", stop_price=95.0))
+
+    assert exchange.cancel("s1")
+    fills = exchange.on_quote("AAPL", quote(94.0, 94.1))
+    assert fills_of(fills) == [("s2", 5, 94.0, "taker")]
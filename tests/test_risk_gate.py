@@ -0,0 +1,64 @@
+from backend.services.position_keeper import PositionKeeper, utc_day
+from backend.services.risk_gate import RiskGate
+
+def losing_round_trip(keeper: PositionKeeper, day=None):
+    keeper.apply_fill("u1", "AAPL", "buy", 100, 50.0, day=day)
+    keeper.apply_fill("u1", "AAPL", "sell", 100, 35.0, day=day)
+
+def gate(keeper: PositionKeeper) -> RiskGate:
+    return RiskGate(keeper, {"max_daily_loss": 1000, "max_position_risk": 1.0, "max_portfolio_risk": 1.0})
+
+def test_losses_from_fills_before_first_check_count():
+    keeper = PositionKeeper(starting_cash=100000.0)
+    losing_round_trip(keeper)
+
+    result = gate(keeper).check("u1", "AAPL", "buy", 1, 35.0)
+    assert not result["approved"]
+    assert "Daily loss limit reached: 1500.00 >= 1000" in result["violations"]
+
+def test_daily_loss_survives_restart():
+    keeper = PositionKeeper(starting_cash=100000.0)
+    losing_round_trip(keeper)
+    restored = PositionKeeper(starting_cash=100000.0)
+    restored.load(keeper.snapshot())
+
+    assert not gate(restored).check("u1", "AAPL", "buy", 1, 35.0)["approved"]
+
+def test_previous_day_losses_do_not_count():
+    keeper = PositionKeeper(starting_cash=100000.0)
+    losing_round_trip(keeper, day="2000-01-01")
+    assert gate(keeper).check("u1", "AAPL", "buy", 1, 35.0)["approved"]
+
+    keeper.apply_fill("u1", "AAPL", "buy", 10, 35.0)
+    keeper.apply_fill("u1", "AAPL", "sell", 10, 30.0)
+    assert keeper.get_account("u1")["day"] == utc_day()
+    assert gate(keeper).check("u1", "AAPL", "buy", 1, 30.0)["approved"]
+
+def test_order_value_limit_applies_to_increasing_orders():
+    keeper = PositionKeeper(starting_cash=1000000.0)
+    risk_gate = RiskGate(keeper, {"max_order_value": 10000, "max_position_risk": 1.0, "max_portfolio_risk": 1.0})
+
+    result = risk_gate.check("u1", "AAPL", "buy", 101, 100.0)
+    assert result["violations"] == ["Order exceeds max order value: 10100.00 > 10000"]
+    assert risk_gate.check("u1", "AAPL", "buy", 100, 100.0)["approved"]
+
+    keeper.apply_fill("u1", "AAPL", "buy", 100, 100.0)
+    keeper.apply_fill("u1", "AAPL", "buy", 100, 100.0)
+    assert risk_gate.check("u1", "AAPL", "sell", 200, 100.0)["approved"]
+
+async def test_basket_legs_and_single_orders_share_the_gate(monkeypatch):
+    from backend.services.execution_engine import ExecutionEngine
+
+    async def noop(symbol):
+        pass
+    engine = ExecutionEngine()
+    monkeypatch.setattr(engine, "_sync_symbol_watch", noop)
+    engine.risk_gate = RiskGate(engine.position_keeper, {"max_order_value": 10000, "max_position_risk": 1.0, "max_portfolio_risk": 1.0})
+    leg = {"symbol": "AAPL", "qty": 101, "side": "buy", "order_type": "limit", "limit_price": 100.0}
+
+    single = await engine.place_order("u1", **leg)
+    [basket] = await engine.place_orders("u1", [leg])
+    assert single["status"] == basket["status"] == "rejected"
+    assert basket["error"] == single["reject_reason"] == "Order exceeds max order value: 10100.00 > 10000"
+    assert engine.risk_gate.stats["checks"] == 2
+    engine.broker_executor.shutdown(wait=False)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from scipy import stats
+from backend.services.var_engine import VaREngine, factor_loadings
+
+def test_historical_var_and_es_come_from_the_loss_tail():
+    returns = np.linspace(-0.05, 0.05, 101)[:, None]
+    result = VaREngine().historical(returns, np.array([100.0]), (0.95,))
+
+    var, es = result[0.95]
+    assert var[0] == pytest.approx(4.5)
+    assert es[0] == pytest.approx(4.75)
+
+def test_parametric_matches_the_normal_closed_form():
+    mean = np.array([0.001])
+    cov = np.array([[0.0004]])
+    result = VaREngine().parametric(mean, cov, np.array([1000.0]), (0.99,), horizon_days=4)
+
+    sigma = 1000.0 * 0.02 * 2
+    drift = 1000.0 * 0.001 * 4
+    var, es = result[0.99]
+    assert var[0] == pytest.approx(stats.norm.ppf(0.99) * sigma - drift)
+    assert es[0] == pytest.approx(sigma * stats.norm.pdf(stats.norm.ppf(0.99)) / 0.01 - drift)
+
+def test_monte_carlo_converges_to_parametric_for_many_portfolios():
+    cov = np.array([[0.0004, 0.0001], [0.0001, 0.0009]])
+    mean = np.zeros(2)
+    exposures = np.array([[1000.0, 0.0], [0.0, 500.0], [1000.0, -500.0]])
+    engine = VaREngine(paths=200000, seed=7)
+
+    simulated = engine.monte_carlo(mean, cov, exposures, (0.95, 0.99))
+    closed = engine.parametric(mean, cov, exposures, (0.95, 0.99))
+    for confidence in (0.95, 0.99):
+        assert simulated[confidence][0].shape == (3,)
+        assert simulated[confidence][0] == pytest.approx(closed[confidence][0], rel=0.03)
+        assert simulated[confidence][1] == pytest.approx(closed[confidence][1], rel=0.03)
+
+def test_student_t_draws_fatten_the_tail():
+    cov = np.array([[0.0004]])
+    engine = VaREngine(paths=200000, seed=11)
+    normal = engine.monte_carlo(np.zeros(1), cov, np.array([1000.0]), (0.999,))
+    fat = engine.monte_carlo(np.zeros(1), cov, np.array([1000.0]), (0.999,), df=4)
+    assert fat[0.999][1][0] > normal[0.999][1][0]
+
+    with pytest.raises(ValueError):
+        engine.monte_carlo(np.zeros(1), cov, np.array([1000.0]), df=2)
+
+def test_compute_reports_every_method():
+    rng = np.random.default_rng(3)
+    returns = rng.normal(0, 0.01, size=(500, 2))
+    result = VaREngine(paths=20000, seed=3).compute(returns, np.array([1000.0, 2000.0]))
+
+    assert set(result) == {"historical", "parametric", "monte_carlo"}
+    for method in result.values():
+        var, es = method[0.99]
+        assert es[0] >= var[0] > 0
+
+def test_factor_loadings_reproduce_a_singular_covariance():
+    cov = np.array([[1.0, 1.0], [1.0, 1.0]])
+    loadings = factor_loadings(cov)
+    assert loadings.shape == (2, 1)
+    assert loadings @ loadings.T == pytest.approx(cov)
+    assert factor_loadings(np.zeros((2, 2))).shape == (2, 1)